@@ -2,12 +2,30 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 import os
 import hashlib
+import hmac
 import re
 from datetime import datetime, timedelta
 from functools import wraps
+from jinja2 import FileSystemBytecodeCache
+
+from utils.json_utils import OrjsonProvider
+from utils.logging_utils import configure_logging
+
+configure_logging()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json_provider_class = OrjsonProvider
+app.json = OrjsonProvider(app)
+
+# Compile templates once per worker: keep a larger template cache, persist
+# compiled bytecode across restarts and skip mtime checks on every render
+app.jinja_options = {
+    **app.jinja_options,
+    'cache_size': 1000,
+    'bytecode_cache': FileSystemBytecodeCache(),
+    'auto_reload': False
+}
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
 # Configure Flask app
@@ -15,7 +33,9 @@ app.config.update(
     SECRET_KEY=app.secret_key,
     PERMANENT_SESSION_LIFETIME=timedelta(days=1),
     SESSION_COOKIE_HTTPONLY=True,
-    SESSION_COOKIE_SAMESITE='Lax'
+    SESSION_COOKIE_SAMESITE='Lax',
+    TEMPLATES_AUTO_RELOAD=False,
+    MAX_CONTENT_LENGTH=int(os.environ.get('MAX_CONTENT_LENGTH', str(100 * 1024 * 1024)))
 )
 
 # Utility functions
@@ -23,7 +43,7 @@ def generate_password_hash(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def check_password_hash(hash_value, password):
-    return hash_value == hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(hash_value or '', hashlib.sha256(password.encode()).hexdigest())
 
 def is_authenticated():
     return 'user_id' in session and session.get('user_id')
@@ -2,6 +2,7 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 import os
 import hashlib
+import hmac
 import re
 from datetime import datetime, timedelta
 from functools import wraps
@@ -23,7 +24,7 @@ def generate_password_hash(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def check_password_hash(hash_value, password):
-    return hash_value == hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(hash_value or '', hashlib.sha256(password.encode()).hexdigest())
 
 def is_authenticated():
     return 'user_id' in session and session.get('user_id')
@@ -18,6 +18,10 @@ gcloud services enable firebase.googleapis.com
 echo "🔥 Setting up Firestore database..."
 gcloud firestore databases create --region=us-central --quiet 2>/dev/null || echo "Firestore database already exists"
 
+# Deploy composite indexes for multi-field queries
+echo "📇 Deploying Firestore indexes..."
+firebase deploy --only firestore:indexes --project myprabh || echo "⚠️ Firestore index deployment skipped (firebase CLI unavailable)"
+
 # Deploy to Cloud Run with all environment variables
 echo "🚀 Deploying to Cloud Run..."
 gcloud run deploy myprabh \
@@ -0,0 +1,30 @@
+"""
+Gunicorn configuration for My Prabh
+Per-worker limits and client lifecycle hooks
+"""
+
+import os
+import sys
+
+# Worker limits (command-line flags take precedence)
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+keepalive = 2
+max_requests = 1000
+max_requests_jitter = 100
+
+# Load the app once in the master so parsed config and credentials are
+# inherited by workers; per-process clients are reset in post_fork
+preload_app = True
+
+def post_fork(server, worker):
+    """Give each worker its own Firestore client and log listener instead of the parent's"""
+    db_module = sys.modules.get('services.firestore_db')
+    if db_module is not None:
+        db_module.firestore_db.reset_client()
+    
+    # The queue listener thread does not survive fork
+    logging_module = sys.modules.get('utils.logging_utils')
+    if logging_module is not None:
+        logging_module.configure_logging()
@@ -0,0 +1,12 @@
+"""
+One-off migration for My Prabh companion contexts
+Moves contexts from the top-level collection to users/{user_id}/companion_contexts
+"""
+import logging
+
+from services.firestore_db import firestore_db
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    moved = firestore_db.migrate_companion_contexts()
+    print(f"✅ Migration complete: {moved} companion contexts moved")
@@ -0,0 +1,12 @@
+"""
+One-off migration for My Prabh chat messages
+Moves messages from the top-level collection to prabhs/{prabh_id}/messages
+"""
+import logging
+
+from services.firestore_db import firestore_db
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    moved = firestore_db.migrate_flat_messages()
+    print(f"✅ Migration complete: {moved} messages moved")
@@ -3,11 +3,25 @@ Memory Management Routes for My Prabh
 Handles memory upload, management, and retrieval endpoints
 """
 
-from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for
+from flask import (
+    Blueprint, request, jsonify, session, render_template, redirect, url_for, g,
+    make_response, current_app, Response, stream_with_context
+)
 import os
+import re
+import json
+import hashlib
+import itertools
+import logging
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
+from config.memory_config import MemoryConfig
+from utils.cache_utils import TTLCache
+from utils.rate_limit import rate_limit_check
+
+logger = logging.getLogger(__name__)
+
 # Import memory services
 try:
     from services.memory.memory_manager import MemoryManager
@@ -16,6 +30,11 @@ try:
     from services.memory.personalization_engine import PersonalizationEngine
     from services.memory.emotional_intelligence_service import EmotionalIntelligenceService
     from services.memory.memory_models import SourceType, RetentionPolicy, PrivacyLevel
+    from services.memory.data_export_service import DataExportService, invalidate_data_overview_cache
+    from services.memory.privacy_control_service import (
+        PrivacyControlService, ConsentType, PrivacyLevel as PrivacyControlLevel
+    )
+    from services.memory.lora_adapter_service import LoRAAdapterService
     from services.firestore_db import firestore_db
     
     # Initialize services
@@ -23,37 +42,183 @@ try:
     upload_service = MemoryUploadService()
     personalization_engine = PersonalizationEngine()
     emotional_service = EmotionalIntelligenceService()
+    data_export_service = DataExportService()
+    privacy_service = PrivacyControlService()
+    lora_service = LoRAAdapterService()
     
     MEMORY_SERVICES_AVAILABLE = True
-    print("✅ Memory services loaded successfully")
+    logger.info("Memory services loaded successfully")
     
 except ImportError as e:
-    print(f"⚠️ Memory services not available: {e}")
+    logger.warning("Memory services not available: %s", e)
     MEMORY_SERVICES_AVAILABLE = False
     memory_manager = None
     upload_service = None
     personalization_engine = None
     emotional_service = None
+    data_export_service = None
+    privacy_service = None
+    lora_service = None
+    firestore_db = None
 
 # Create blueprint
 memory_bp = Blueprint('memory', __name__, url_prefix='/memory')
 
+# Request validation allowlists (built once, O(1) membership checks)
+_EXPORT_TYPES = frozenset({'complete', 'memories', 'conversations', 'profile'})
+_DELETION_TYPES = frozenset({'memories', 'companions', 'complete', 'account'})
+_PRIVACY_LEVELS = frozenset({'public', 'shared', 'private', 'confidential'})
+_CONSENT_TYPES = frozenset({'analytics', 'personalization', 'research', 'marketing', 'training', 'sharing'})
+
+# Memory API requests allowed per user, per endpoint, per minute
+_RATE_LIMIT_PER_MINUTE = int(os.environ.get('RATE_LIMIT_PER_MINUTE', '60'))
+
+# Largest page of deletion history returned per admin request
+_MAX_HISTORY_PAGE_SIZE = 200
+
+# Characters not allowed in ASCII upload filenames
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9._-]')
+
+# Browser caching for the per-user companion bundle
+_COMPANIONS_BUNDLE_CACHE_CONTROL = 'private, max-age=60, stale-while-revalidate=600'
+
+# Short-lived cache for the memory stats shown on dashboard pages
+_page_data_cache = TTLCache(maxsize=2048, ttl=30)
+
+# Emotion and crisis analysis results keyed by a hash of the analyzed text
+_emotion_analysis_cache = TTLCache(maxsize=4096, ttl=300)
+
 def is_authenticated():
-    """Check if user is authenticated"""
+    """Check if user is authenticated; page routes redirect to login when not"""
     return 'user_id' in session and session.get('user_id')
 
-def require_auth():
-    """Decorator to require authentication"""
-    if not is_authenticated():
-        return jsonify({'error': 'Authentication required'}), 401
-    return None
+# Page routes handle their own login redirect instead of the API guard
+_PAGE_ENDPOINTS = frozenset({'memory.upload_page', 'memory.manage_page', 'memory.personalize_companion'})
 
-def require_memory_services():
-    """Check if memory services are available"""
+@memory_bp.before_request
+def guard_memory_api():
+    """Require authentication, memory services and rate limit once for every API request"""
+    if request.endpoint in _PAGE_ENDPOINTS:
+        return None
+    
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'Authentication required'}), 401
     if not MEMORY_SERVICES_AVAILABLE:
         return jsonify({'error': 'Memory services not available'}), 503
+    if not rate_limit_check(user_id, request.endpoint, _RATE_LIMIT_PER_MINUTE):
+        return jsonify({'error': 'Too many requests'}), 429
+    
+    g.user_id = user_id
     return None
 
+def invalidate_user_data_caches(user_id):
+    """Drop cached overview and page data after a user's memories change"""
+    invalidate_data_overview_cache(user_id)
+    _page_data_cache.pop(('memory_stats', user_id))
+
+def get_cached_user_prabhs(user_id):
+    """Get a user's companions from the precomputed companion bundle"""
+    if not firestore_db:
+        return []
+    return firestore_db.get_companions_bundle(user_id)['companions']
+
+def get_cached_memory_stats(user_id):
+    """Get a user's memory statistics, cached briefly for page renders"""
+    key = ('memory_stats', user_id)
+    memory_stats = _page_data_cache.get(key)
+    if memory_stats is None:
+        memory_stats = memory_manager.get_user_memory_stats(user_id)
+        if 'error' not in memory_stats:
+            _page_data_cache.set(key, memory_stats)
+    return memory_stats
+
+def text_cache_key(text, context=None):
+    """Hash text (and any analysis context) into a compact cache key"""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16)
+    if context:
+        digest.update(json.dumps(context, sort_keys=True, default=str).encode('utf-8'))
+        # Time-of-day context depends on the current hour
+        if 'time_context' in context:
+            digest.update(str(datetime.now().hour).encode('utf-8'))
+    return digest.hexdigest()
+
+def get_cached_emotion_analysis(text, context=None, advanced=False):
+    """Get emotion and crisis analysis for text, reusing recent results for identical input"""
+    key = ('advanced' if advanced else 'basic', text_cache_key(text, context))
+    cached = _emotion_analysis_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    if advanced:
+        emotion_analysis = emotional_service.detect_emotions_advanced(text, context)
+    else:
+        emotion_analysis = emotional_service.detect_emotions(text)
+    crisis_analysis = emotional_service.detect_crisis_indicators(text)
+    
+    result = (emotion_analysis, crisis_analysis)
+    if 'error' not in emotion_analysis and 'error' not in crisis_analysis:
+        _emotion_analysis_cache.set(key, result)
+    return result
+
+def ndjson_chunks(records):
+    """Serialize records as newline-delimited JSON, one record per chunk
+    
+    The status line is already sent, so a failure mid-stream ends the body with
+    an explicit error record rather than cutting it off.
+    """
+    dumps = current_app.json.dumps
+    try:
+        for record in records:
+            yield dumps(record) + '\n'
+    except Exception:
+        logger.exception("Error streaming export records")
+        yield dumps({'error': 'Export interrupted'}) + '\n'
+
+def _json_members(fields):
+    """Serialize a mapping's items as JSON object members, for framing streamed documents"""
+    dumps = current_app.json.dumps
+    return ', '.join(f'{dumps(key)}: {dumps(value)}' for key, value in fields.items())
+
+def export_json_chunks(header, memories):
+    """Serialize a memory export incrementally, matching the non-streamed response shape
+    
+    success is written last, so a failure mid-stream still closes the document
+    and reports success: false with an error instead of leaving invalid JSON.
+    """
+    dumps = current_app.json.dumps
+    yield '{"export_data": {' + _json_members(header) + ', "memories": ['
+    
+    total_memories = 0
+    status = {'success': True}
+    try:
+        for memory in memories:
+            yield (', ' if total_memories else '') + dumps(memory)
+            total_memories += 1
+    except Exception:
+        logger.exception("Error streaming memory export")
+        status = {'success': False, 'error': 'Export interrupted'}
+    
+    yield '], "total_memories": ' + dumps(total_memories) + '}, ' + _json_members(status) + '}'
+
+def safe_filename(filename):
+    """secure_filename with a fast path that skips unicode normalization for ASCII names"""
+    if filename.isascii():
+        cleaned = _UNSAFE_FILENAME_CHARS.sub('_', filename).strip('._')
+        if cleaned:
+            return cleaned
+    return secure_filename(filename)
+
+def now_iso():
+    """Current local time as an ISO 8601 string with second precision"""
+    return datetime.now().isoformat(timespec='seconds')
+
+def get_json_payload():
+    """Parse the JSON body once per request, treating a missing or malformed body as empty"""
+    if 'payload' not in g:
+        g.payload = request.get_json(cache=False, silent=True) or {}
+    return g.payload
+
 # ============================================================================
 # MEMORY UPLOAD ROUTES
 # ============================================================================
@@ -61,37 +226,52 @@ def require_memory_services():
 @memory_bp.route('/upload')
 def upload_page():
     """Memory upload page"""
-    auth_check = require_auth()
-    if auth_check:
+    if not is_authenticated():
         return redirect(url_for('login_page'))
     
     try:
         # Get user's companions
-        user_prabhs = []
-        if firestore_db:
-            user_prabhs = firestore_db.get_user_prabhs(session['user_id'])
+        user_prabhs = get_cached_user_prabhs(session['user_id'])
         
         return render_template('memory_upload.html', 
                              user_prabhs=user_prabhs,
                              user_name=session.get('user_name', 'User'))
     except Exception as e:
-        print(f"Error loading upload page: {e}")
+        logger.exception("Error loading upload page")
         return render_template('memory_upload.html', 
                              user_prabhs=[],
                              user_name=session.get('user_name', 'User'))
 
+@memory_bp.route('/api/companions')
+def get_companions_bundle():
+    """Serve the user's companion bundle, revalidated with its ETag"""
+    try:
+        bundle = firestore_db.get_companions_bundle(g.user_id)
+        
+        if bundle['etag'] in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = jsonify({
+                'success': True,
+                'companions': bundle['companions']
+            })
+        
+        response.set_etag(bundle['etag'])
+        response.headers['Cache-Control'] = _COMPANIONS_BUNDLE_CACHE_CONTROL
+        return response
+        
+    except Exception as e:
+        logger.exception("Error getting companions bundle")
+        return jsonify({'error': str(e)}), 500
+
 @memory_bp.route('/api/upload', methods=['POST'])
 def upload_memory():
     """Upload memory file"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
+        # Reject oversized uploads before the body is parsed
+        if request.content_length and request.content_length > MemoryConfig.MAX_MEMORY_FILE_SIZE:
+            return jsonify({'error': 'File too large'}), 413
+        
         # Check if file is present
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -109,30 +289,30 @@ def upload_memory():
             return jsonify({'error': 'Companion ID is required'}), 400
         
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found or access denied'}), 404
         
-        # Read file data
-        file_data = file.read()
         file_type = file.content_type or 'application/octet-stream'
-        filename = secure_filename(file.filename)
+        filename = safe_filename(file.filename)
         
-        # Upload and process file
-        session_id = upload_service.upload_and_process_file(
-            user_id=session['user_id'],
+        # Upload and process file straight from the request stream; the service bounds the read
+        session_id = memory_manager.upload_and_process_file(
+            user_id=g.user_id,
             companion_id=companion_id,
-            file_data=file_data,
+            file_data=file.stream,
             file_type=file_type,
             filename=filename,
             metadata={
                 'retention_policy': retention_policy,
                 'privacy_level': privacy_level,
-                'uploaded_at': datetime.now().isoformat(),
+                'uploaded_at': now_iso(),
                 'original_filename': file.filename
             }
         )
         
+        invalidate_user_data_caches(g.user_id)
+        
         return jsonify({
             'success': True,
             'session_id': session_id,
@@ -140,7 +320,7 @@ def upload_memory():
         })
         
     except Exception as e:
-        print(f"Error uploading memory: {e}")
+        logger.exception("Error uploading memory")
         return jsonify({'error': str(e)}), 500
 
 # ============================================================================
@@ -150,27 +330,24 @@ def upload_memory():
 @memory_bp.route('/manage')
 def manage_page():
     """Memory management dashboard"""
-    auth_check = require_auth()
-    if auth_check:
+    if not is_authenticated():
         return redirect(url_for('login_page'))
     
     try:
         # Get user's companions
-        user_prabhs = []
-        if firestore_db:
-            user_prabhs = firestore_db.get_user_prabhs(session['user_id'])
+        user_prabhs = get_cached_user_prabhs(session['user_id'])
         
         # Get memory statistics
         memory_stats = {}
         if MEMORY_SERVICES_AVAILABLE:
-            memory_stats = memory_manager.get_user_memory_stats(session['user_id'])
+            memory_stats = get_cached_memory_stats(session['user_id'])
         
         return render_template('memory_manage.html',
                              user_prabhs=user_prabhs,
                              memory_stats=memory_stats,
                              user_name=session.get('user_name', 'User'))
     except Exception as e:
-        print(f"Error loading memory management page: {e}")
+        logger.exception("Error loading memory management page")
         return render_template('memory_manage.html',
                              user_prabhs=[],
                              memory_stats={},
@@ -179,22 +356,14 @@ def manage_page():
 @memory_bp.route('/api/stats/<companion_id>')
 def get_memory_stats(companion_id):
     """Get memory statistics for a companion"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
         # Get memory statistics
-        stats = memory_manager.get_user_memory_stats(session['user_id'], companion_id)
+        stats = memory_manager.get_user_memory_stats(g.user_id, companion_id)
         
         return jsonify({
             'success': True,
@@ -202,23 +371,15 @@ def get_memory_stats(companion_id):
         })
         
     except Exception as e:
-        print(f"Error getting memory stats: {e}")
+        logger.exception("Error getting memory stats")
         return jsonify({'error': str(e)}), 500
 
 @memory_bp.route('/api/search', methods=['POST'])
 def search_memories():
     """Search memories by text"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
-        query = data.get('query', '').strip()
+        data = get_json_payload()
+        query = (data.get('query') or '').strip()
         companion_id = data.get('companion_id')
         limit = min(int(data.get('limit', 20)), 50)  # Max 50 results
         
@@ -229,13 +390,13 @@ def search_memories():
             return jsonify({'error': 'Companion ID is required'}), 400
         
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
         # Search memories
         results = memory_manager.search_memories_by_text(
-            user_id=session['user_id'],
+            user_id=g.user_id,
             companion_id=companion_id,
             search_text=query,
             limit=limit
@@ -249,25 +410,18 @@ def search_memories():
         })
         
     except Exception as e:
-        print(f"Error searching memories: {e}")
+        logger.exception("Error searching memories")
         return jsonify({'error': str(e)}), 500
 
 @memory_bp.route('/api/delete/<memory_id>', methods=['DELETE'])
 def delete_memory(memory_id):
     """Delete a specific memory"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Delete memory
-        success = memory_manager.delete_memory(memory_id, session['user_id'])
+        success = memory_manager.delete_memory(memory_id, g.user_id)
         
         if success:
+            invalidate_user_data_caches(g.user_id)
             return jsonify({
                 'success': True,
                 'message': 'Memory deleted successfully'
@@ -276,30 +430,23 @@ def delete_memory(memory_id):
             return jsonify({'error': 'Memory not found or access denied'}), 404
             
     except Exception as e:
-        print(f"Error deleting memory: {e}")
+        logger.exception("Error deleting memory")
         return jsonify({'error': str(e)}), 500
 
 @memory_bp.route('/api/delete-all/<companion_id>', methods=['DELETE'])
 def delete_all_memories(companion_id):
     """Delete all memories for a companion"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
         # Delete all memories
-        success = memory_manager.delete_all_user_memories(session['user_id'], companion_id)
+        success = memory_manager.delete_all_user_memories(g.user_id, companion_id)
         
         if success:
+            invalidate_user_data_caches(g.user_id)
             return jsonify({
                 'success': True,
                 'message': 'All memories deleted successfully'
@@ -308,7 +455,7 @@ def delete_all_memories(companion_id):
             return jsonify({'error': 'Failed to delete memories'}), 500
             
     except Exception as e:
-        print(f"Error deleting all memories: {e}")
+        logger.exception("Error deleting all memories")
         return jsonify({'error': str(e)}), 500
 
 # ============================================================================
@@ -318,22 +465,14 @@ def delete_all_memories(companion_id):
 @memory_bp.route('/api/personality/<companion_id>')
 def get_personality_profile(companion_id):
     """Get personality profile for a companion"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
         # Get personality profile
-        profile = personalization_engine.get_personality_profile(session['user_id'], companion_id)
+        profile = personalization_engine.get_personality_profile(g.user_id, companion_id)
         
         if profile:
             return jsonify({
@@ -348,23 +487,15 @@ def get_personality_profile(companion_id):
             })
             
     except Exception as e:
-        print(f"Error getting personality profile: {e}")
+        logger.exception("Error getting personality profile")
         return jsonify({'error': str(e)}), 500
 
 @memory_bp.route('/api/insights/<companion_id>')
 def get_personalization_insights(companion_id):
     """Get personalization insights for a companion"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
@@ -385,7 +516,7 @@ def get_personalization_insights(companion_id):
         })
         
     except Exception as e:
-        print(f"Error getting personalization insights: {e}")
+        logger.exception("Error getting personalization insights")
         return jsonify({'error': str(e)}), 500
 
 # ============================================================================
@@ -395,8 +526,7 @@ def get_personalization_insights(companion_id):
 @memory_bp.route('/personalize/<companion_id>')
 def personalize_companion(companion_id):
     """Companion personalization page"""
-    auth_check = require_auth()
-    if auth_check:
+    if not is_authenticated():
         return redirect(url_for('login_page'))
     
     try:
@@ -409,39 +539,31 @@ def personalize_companion(companion_id):
                              companion=companion,
                              user_name=session.get('user_name', 'User'))
     except Exception as e:
-        print(f"Error loading personalization page: {e}")
+        logger.exception("Error loading personalization page")
         return redirect(url_for('memory.manage_page'))
 
 @memory_bp.route('/api/personality/<companion_id>', methods=['POST'])
 def update_personality_profile(companion_id):
     """Update personality profile for a companion"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
-        data = request.get_json()
+        data = get_json_payload()
         personality_traits = data.get('personality_traits', {})
         communication_style = data.get('communication_style', 'casual')
         
         # Update personality profile
         profile_data = personalization_engine.update_personality_profile(
-            user_id=session['user_id'],
+            user_id=g.user_id,
             companion_id=companion_id,
             interactions=[{
                 'personality_update': True,
                 'personality_traits': personality_traits,
                 'communication_style': communication_style,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now_iso()
             }]
         )
         
@@ -452,63 +574,78 @@ def update_personality_profile(companion_id):
         })
         
     except Exception as e:
-        print(f"Error updating personality profile: {e}")
+        logger.exception("Error updating personality profile")
         return jsonify({'error': str(e)}), 500
 
 @memory_bp.route('/api/train/<companion_id>', methods=['POST'])
 def train_companion_model(companion_id):
     """Start training a personalized model for the companion"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
         # Check if user has premium access (for LoRA training)
-        personalization_level = personalization_engine.get_personalization_level(session['user_id'])
+        personalization_level = personalization_engine.get_personalization_level(g.user_id)
         if personalization_level != 'premium':
             return jsonify({'error': 'Premium subscription required for AI training'}), 403
         
-        # Get user memories for training
-        memories = memory_manager.search_memories_by_text(
-            user_id=session['user_id'],
-            companion_id=companion_id,
-            search_text="",  # Get all memories
-            limit=1000
-        )
+        user_id = g.user_id
         
-        if len(memories) < 10:
+        # Cheap COUNT before queueing, so too few memories is a 400 and a
+        # Firestore outage is a 500 rather than a queued job that fails later
+        if memory_manager.count_memories(user_id, companion_id) < 10:
             return jsonify({'error': 'Need at least 10 memories to start training'}), 400
         
-        # Extract memory content for training
-        training_data = [memory['content'] for memory in memories]
-        
-        # Start LoRA training (this would be async in production)
-        from services.memory.lora_adapter_service import LoRAAdapterService
-        lora_service = LoRAAdapterService()
+        def load_training_data():
+            # Runs on the training worker, not the request thread
+            memories = memory_manager.list_memories(
+                user_id=user_id,
+                companion_id=companion_id,
+                limit=1000,
+                columns=('content',)
+            )
+            training_data = [memory['content'] for memory in memories if memory.get('content')]
+            
+            if len(training_data) < 10:
+                raise ValueError('Need at least 10 memories to start training')
+            
+            return training_data
         
-        adapter_id = lora_service.train_lora_adapter(
-            user_id=session['user_id'],
+        # Queue LoRA training in the background
+        adapter_id = lora_service.submit_training_job(
+            user_id=user_id,
             companion_id=companion_id,
-            training_data=training_data
+            load_training_data=load_training_data
         )
         
         return jsonify({
             'success': True,
-            'message': 'Training started successfully',
-            'adapter_id': adapter_id
+            'message': 'Training queued successfully',
+            'adapter_id': adapter_id,
+            'status': 'queued'
+        }), 202
+        
+    except Exception as e:
+        logger.exception("Error starting training")
+        return jsonify({'error': str(e)}), 500
+
+@memory_bp.route('/api/train/<adapter_id>/status')
+def get_training_status(adapter_id):
+    """Get the status of a companion training job"""
+    try:
+        job = lora_service.get_training_status(adapter_id)
+        if not job or job.get('user_id') != g.user_id:
+            return jsonify({'error': 'Training job not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'training': job
         })
         
     except Exception as e:
-        print(f"Error starting training: {e}")
+        logger.exception("Error getting training status")
         return jsonify({'error': str(e)}), 500
 
 # ============================================================================
@@ -518,68 +655,38 @@ def train_companion_model(companion_id):
 @memory_bp.route('/api/data-overview')
 def get_data_overview():
     """Get user's data overview for privacy controls"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        from services.memory.data_export_service import DataExportService
-        data_export_service = DataExportService()
-        overview = data_export_service.get_data_overview(session['user_id'])
+        overview = data_export_service.get_data_overview(g.user_id)
         
         return jsonify(overview)
         
     except Exception as e:
-        print(f"Error getting data overview: {e}")
+        logger.exception("Error getting data overview")
         return jsonify({'error': 'Failed to get data overview'}), 500
 
 @memory_bp.route('/api/export-sizes')
 def get_export_sizes():
     """Get estimated export sizes for different data types"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        from services.memory.data_export_service import DataExportService
-        data_export_service = DataExportService()
-        sizes = data_export_service.get_export_sizes(session['user_id'])
+        sizes = data_export_service.get_export_sizes(g.user_id)
         
         return jsonify(sizes)
         
     except Exception as e:
-        print(f"Error getting export sizes: {e}")
+        logger.exception("Error getting export sizes")
         return jsonify({'error': 'Failed to get export sizes'}), 500
 
 @memory_bp.route('/api/export-data', methods=['POST'])
 def export_user_data():
     """Export user data based on selected type"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
+        data = get_json_payload()
         export_type = data.get('export_type', 'complete')
         
-        if export_type not in ['complete', 'memories', 'conversations', 'profile']:
+        if export_type not in _EXPORT_TYPES:
             return jsonify({'error': 'Invalid export type'}), 400
         
-        from services.memory.data_export_service import DataExportService
-        data_export_service = DataExportService()
-        export_data = data_export_service.export_user_data(session['user_id'], export_type)
+        export_data = data_export_service.export_user_data(g.user_id, export_type)
         
         return jsonify({
             'success': True,
@@ -588,24 +695,14 @@ def export_user_data():
         })
         
     except Exception as e:
-        print(f"Error exporting user data: {e}")
+        logger.exception("Error exporting user data")
         return jsonify({'error': 'Failed to export data'}), 500
 
 @memory_bp.route('/api/delete-all-user-memories', methods=['DELETE'])
 def delete_all_user_memories():
     """Delete all memories for the current user"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        from services.memory.data_export_service import DataExportService
-        data_export_service = DataExportService()
-        success = data_export_service.delete_all_user_memories(session['user_id'])
+        success = data_export_service.delete_all_user_memories(g.user_id)
         
         if success:
             return jsonify({'success': True, 'message': 'All memories deleted successfully'})
@@ -613,25 +710,17 @@ def delete_all_user_memories():
             return jsonify({'error': 'Failed to delete memories'}), 500
         
     except Exception as e:
-        print(f"Error deleting user memories: {e}")
+        logger.exception("Error deleting user memories")
         return jsonify({'error': 'Failed to delete memories'}), 500
 
 @memory_bp.route('/api/secure-delete', methods=['POST'])
 def secure_delete_user_data():
     """Securely delete user data with verification and audit logging"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
+        data = get_json_payload()
         deletion_type = data.get('deletion_type', 'memories')
         
-        if deletion_type not in ['memories', 'companions', 'complete', 'account']:
+        if deletion_type not in _DELETION_TYPES:
             return jsonify({'error': 'Invalid deletion type'}), 400
         
         # Additional confirmation for account deletion
@@ -640,9 +729,7 @@ def secure_delete_user_data():
             if confirmation != 'DELETE MY ACCOUNT':
                 return jsonify({'error': 'Account deletion requires explicit confirmation'}), 400
         
-        from services.memory.data_export_service import DataExportService
-        data_export_service = DataExportService()
-        result = data_export_service.secure_delete_user_data(session['user_id'], deletion_type)
+        result = data_export_service.secure_delete_user_data(g.user_id, deletion_type)
         
         if result['success']:
             # If account deletion, clear session
@@ -654,20 +741,12 @@ def secure_delete_user_data():
             return jsonify(result), 500
         
     except Exception as e:
-        print(f"Error in secure deletion: {e}")
+        logger.exception("Error in secure deletion")
         return jsonify({'error': 'Secure deletion failed'}), 500
 
 @memory_bp.route('/api/deletion-history')
 def get_deletion_history():
     """Get deletion history for the current user (admin only)"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Check if user is admin
         user_email = session.get('user_email')
@@ -681,17 +760,21 @@ def get_deletion_history():
         if not target_user_id:
             return jsonify({'error': 'User ID required'}), 400
         
-        from services.memory.data_export_service import DataExportService
-        data_export_service = DataExportService()
-        history = data_export_service.get_deletion_history(target_user_id)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), _MAX_HISTORY_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        
+        history = data_export_service.get_deletion_history(target_user_id, limit=limit, cursor=cursor)
+        if history.get('error'):
+            return jsonify({'error': history['error']}), 400
         
         return jsonify({
             'success': True,
-            'deletion_history': history
+            'deletion_history': history['deletion_history'],
+            'next_cursor': history['next_cursor']
         })
         
     except Exception as e:
-        print(f"Error getting deletion history: {e}")
+        logger.exception("Error getting deletion history")
         return jsonify({'error': 'Failed to get deletion history'}), 500
 
 # ============================================================================
@@ -701,19 +784,8 @@ def get_deletion_history():
 @memory_bp.route('/api/privacy/detailed-settings')
 def get_detailed_privacy_settings():
     """Get detailed privacy settings including memory-level controls"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        from services.memory.privacy_control_service import PrivacyControlService
-        privacy_service = PrivacyControlService()
-        
-        settings = privacy_service.get_user_privacy_settings(session['user_id'])
+        settings = privacy_service.get_user_privacy_settings(g.user_id)
         
         return jsonify({
             'success': True,
@@ -721,41 +793,30 @@ def get_detailed_privacy_settings():
         })
         
     except Exception as e:
-        print(f"Error getting detailed privacy settings: {e}")
+        logger.exception("Error getting detailed privacy settings")
         return jsonify({'error': 'Failed to get privacy settings'}), 500
 
 @memory_bp.route('/api/privacy/memory-level', methods=['POST'])
 def update_memory_privacy_level():
     """Update privacy level for specific memories"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
+        data = get_json_payload()
         memory_ids = data.get('memory_ids', [])
         privacy_level = data.get('privacy_level', 'private')
         
         if not memory_ids:
             return jsonify({'error': 'Memory IDs required'}), 400
         
-        if privacy_level not in ['public', 'shared', 'private', 'confidential']:
+        if privacy_level not in _PRIVACY_LEVELS:
             return jsonify({'error': 'Invalid privacy level'}), 400
         
-        from services.memory.privacy_control_service import PrivacyControlService, PrivacyLevel
-        privacy_service = PrivacyControlService()
-        
         # Convert string to enum
-        privacy_enum = PrivacyLevel(privacy_level)
+        privacy_enum = PrivacyControlLevel(privacy_level)
         
         if len(memory_ids) == 1:
             # Single memory update
             success = privacy_service.update_memory_privacy_level(
-                session['user_id'], memory_ids[0], privacy_enum
+                g.user_id, memory_ids[0], privacy_enum
             )
             
             if success:
@@ -768,28 +829,20 @@ def update_memory_privacy_level():
         else:
             # Bulk update
             result = privacy_service.bulk_update_memory_privacy(
-                session['user_id'], memory_ids, privacy_enum
+                g.user_id, memory_ids, privacy_enum
             )
             
             return jsonify(result)
         
     except Exception as e:
-        print(f"Error updating memory privacy level: {e}")
+        logger.exception("Error updating memory privacy level")
         return jsonify({'error': 'Failed to update memory privacy level'}), 500
 
 @memory_bp.route('/api/privacy/consent', methods=['POST'])
 def record_user_consent():
     """Record user consent for specific data processing types"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
+        data = get_json_payload()
         consent_type = data.get('consent_type')
         granted = data.get('granted', False)
         context = data.get('context', {})
@@ -797,13 +850,9 @@ def record_user_consent():
         if not consent_type:
             return jsonify({'error': 'Consent type required'}), 400
         
-        valid_consent_types = ['analytics', 'personalization', 'research', 'marketing', 'training', 'sharing']
-        if consent_type not in valid_consent_types:
+        if consent_type not in _CONSENT_TYPES:
             return jsonify({'error': 'Invalid consent type'}), 400
         
-        from services.memory.privacy_control_service import PrivacyControlService, ConsentType
-        privacy_service = PrivacyControlService()
-        
         # Convert string to enum
         consent_enum = ConsentType(consent_type)
         
@@ -814,7 +863,7 @@ def record_user_consent():
         })
         
         success = privacy_service.record_consent(
-            session['user_id'], consent_enum, granted, context
+            g.user_id, consent_enum, granted, context
         )
         
         if success:
@@ -826,25 +875,14 @@ def record_user_consent():
             return jsonify({'error': 'Failed to record consent'}), 500
         
     except Exception as e:
-        print(f"Error recording consent: {e}")
+        logger.exception("Error recording consent")
         return jsonify({'error': 'Failed to record consent'}), 500
 
 @memory_bp.route('/api/privacy/compliance-report')
 def get_privacy_compliance_report():
     """Get privacy compliance report for the current user"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        from services.memory.privacy_control_service import PrivacyControlService
-        privacy_service = PrivacyControlService()
-        
-        report = privacy_service.get_privacy_compliance_report(session['user_id'])
+        report = privacy_service.get_privacy_compliance_report(g.user_id)
         
         return jsonify({
             'success': True,
@@ -852,34 +890,23 @@ def get_privacy_compliance_report():
         })
         
     except Exception as e:
-        print(f"Error getting compliance report: {e}")
+        logger.exception("Error getting compliance report")
         return jsonify({'error': 'Failed to get compliance report'}), 500
 
 @memory_bp.route('/api/privacy/memory-permissions/<memory_id>')
 def get_memory_permissions(memory_id):
     """Get access permissions for a specific memory"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Get requester context from query params
         purpose = request.args.get('purpose', 'general')
         context = {
             'purpose': purpose,
             'requester': 'user',
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now_iso()
         }
         
-        from services.memory.privacy_control_service import PrivacyControlService
-        privacy_service = PrivacyControlService()
-        
         permissions = privacy_service.get_memory_access_permissions(
-            session['user_id'], memory_id, context
+            g.user_id, memory_id, context
         )
         
         return jsonify({
@@ -890,7 +917,7 @@ def get_memory_permissions(memory_id):
         })
         
     except Exception as e:
-        print(f"Error getting memory permissions: {e}")
+        logger.exception("Error getting memory permissions")
         return jsonify({'error': 'Failed to get memory permissions'}), 500
 
 # ============================================================================
@@ -900,30 +927,31 @@ def get_memory_permissions(memory_id):
 @memory_bp.route('/api/export/<companion_id>')
 def export_memories(companion_id):
     """Export all memories for a companion"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
         # Verify companion ownership
-        companion = firestore_db.get_prabh_by_id(companion_id, session['user_id'])
+        companion = firestore_db.get_prabh_by_id(companion_id, g.user_id)
         if not companion:
             return jsonify({'error': 'Companion not found'}), 404
         
-        # Export memories
-        export_data = memory_manager.export_user_memories(session['user_id'], companion_id)
+        # The first page is fetched before the response starts, so a failing
+        # query still gets a 500 rather than a truncated 200
+        memories = memory_manager.iter_user_memories(g.user_id, companion_id)
+        first_memory = next(memories, None)
+        if first_memory is not None:
+            memories = itertools.chain([first_memory], memories)
         
-        return jsonify({
-            'success': True,
-            'export_data': export_data
-        })
+        # Stream memories as they are fetched so large exports stay bounded in memory
+        if request.args.get('format') == 'ndjson':
+            return Response(stream_with_context(ndjson_chunks(memories)),
+                            mimetype='application/x-ndjson',
+                            headers={'Content-Disposition': f'attachment; filename=memories_{companion_id}.ndjson'})
+        
+        header = memory_manager.get_export_header(g.user_id, companion_id)
+        return Response(stream_with_context(export_json_chunks(header, memories)),
+                        mimetype='application/json')
         
     except Exception as e:
-        print(f"Error exporting memories: {e}")
+        logger.exception("Error exporting memories")
         return jsonify({'error': str(e)}), 500
 
 # ============================================================================
@@ -933,26 +961,15 @@ def export_memories(companion_id):
 @memory_bp.route('/api/emotion/analyze', methods=['POST'])
 def analyze_emotion():
     """Analyze emotion in text with basic detection"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
-        text = data.get('text', '').strip()
+        data = get_json_payload()
+        text = (data.get('text') or '').strip()
         
         if not text:
             return jsonify({'error': 'Text is required'}), 400
         
-        # Analyze emotions
-        emotion_analysis = emotional_service.detect_emotions(text)
-        
-        # Check for crisis indicators
-        crisis_analysis = emotional_service.detect_crisis_indicators(text)
+        # Analyze emotions and check for crisis indicators
+        emotion_analysis, crisis_analysis = get_cached_emotion_analysis(text)
         
         result = {
             'success': True,
@@ -962,42 +979,29 @@ def analyze_emotion():
         
         # Add support resources if crisis detected
         if crisis_analysis.get('crisis_detected'):
-            crisis_types = crisis_analysis.get('crisis_types', [])
-            resources = {}
-            for crisis_type in crisis_types:
-                resources[crisis_type] = emotional_service.get_crisis_support_resources(crisis_type)
-            result['support_resources'] = resources
+            result['support_resources'] = emotional_service.get_crisis_support_resources_for(
+                crisis_analysis.get('crisis_types', [])
+            )
         
         return jsonify(result)
         
     except Exception as e:
-        print(f"Error analyzing emotion: {e}")
+        logger.exception("Error analyzing emotion")
         return jsonify({'error': str(e)}), 500
 
 @memory_bp.route('/api/emotion/analyze-advanced', methods=['POST'])
 def analyze_emotion_advanced():
     """Advanced emotion analysis with context awareness"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
-        text = data.get('text', '').strip()
+        data = get_json_payload()
+        text = (data.get('text') or '').strip()
         context = data.get('context', {})
         
         if not text:
             return jsonify({'error': 'Text is required'}), 400
         
-        # Advanced emotion analysis
-        emotion_analysis = emotional_service.detect_emotions_advanced(text, context)
-        
-        # Check for crisis indicators
-        crisis_analysis = emotional_service.detect_crisis_indicators(text)
+        # Advanced emotion analysis and crisis indicators
+        emotion_analysis, crisis_analysis = get_cached_emotion_analysis(text, context, advanced=True)
         
         result = {
             'success': True,
@@ -1007,31 +1011,21 @@ def analyze_emotion_advanced():
         
         # Add support resources if crisis detected
         if crisis_analysis.get('crisis_detected'):
-            crisis_types = crisis_analysis.get('crisis_types', [])
-            resources = {}
-            for crisis_type in crisis_types:
-                resources[crisis_type] = emotional_service.get_crisis_support_resources(crisis_type)
-            result['support_resources'] = resources
+            result['support_resources'] = emotional_service.get_crisis_support_resources_for(
+                crisis_analysis.get('crisis_types', [])
+            )
         
         return jsonify(result)
         
     except Exception as e:
-        print(f"Error in advanced emotion analysis: {e}")
+        logger.exception("Error in advanced emotion analysis")
         return jsonify({'error': str(e)}), 500
 
 @memory_bp.route('/api/emotion/response-suggestions', methods=['POST'])
 def get_emotion_response_suggestions():
     """Get emotionally appropriate response suggestions"""
-    auth_check = require_auth()
-    if auth_check:
-        return auth_check
-    
-    services_check = require_memory_services()
-    if services_check:
-        return services_check
-    
     try:
-        data = request.get_json()
+        data = get_json_payload()
         emotion = data.get('emotion', 'neutral')
         intensity = data.get('intensity', 0.5)
         context = data.get('context', {})
@@ -1047,7 +1041,7 @@ def get_emotion_response_suggestions():
         })
         
     except Exception as e:
-        print(f"Error getting response suggestions: {e}")
+        logger.exception("Error getting response suggestions")
         return jsonify({'error': str(e)}), 500
 
 # ============================================================================
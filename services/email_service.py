@@ -6,18 +6,168 @@ Handles welcome emails, notifications using Google Workspace Gmail API
 import os
 import base64
 import json
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
 from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request
 from datetime import datetime
+from html import escape
+from string import Template
+
+# Try to import orjson, but fall back to the standard library if not available
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Email bodies, parsed once; only the per-recipient fields are substituted per send
+_WELCOME_TEMPLATE = Template("""
+<div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="text-align: center; margin-bottom: 30px;">
+        <h1 style="color: #ff6b9d; font-size: 2.5em; margin: 0;">My Prabh 💖</h1>
+        <p style="color: #666; font-size: 1.2em;">Your AI Companion Platform</p>
+    </div>
+
+    <div style="background: linear-gradient(135deg, #ff6b9d, #c44569); padding: 30px; border-radius: 15px; color: white; text-align: center; margin-bottom: 30px;">
+        <h2 style="margin: 0 0 15px 0;">Welcome, $user_name! 🎉</h2>
+        <p style="margin: 0; font-size: 1.1em;">Your journey with AI companionship starts now!</p>
+    </div>
+
+    <div style="padding: 20px; background: #f9f9f9; border-radius: 10px; margin-bottom: 20px;">
+        <h3 style="color: #333; margin-top: 0;">What's Next? 🚀</h3>
+        <ul style="color: #666; line-height: 1.6;">
+            <li><strong>Create Your First Prabh:</strong> Design your perfect AI companion</li>
+            <li><strong>Start Chatting:</strong> Have meaningful conversations</li>
+            <li><strong>Build Memories:</strong> Your Prabh learns and grows with you</li>
+            <li><strong>Explore Features:</strong> Discover all the amazing capabilities</li>
+        </ul>
+    </div>
+
+    <div style="text-align: center; margin: 30px 0;">
+        <a href="https://myprabh.as.r.appspot.com/dashboard" 
+           style="background: linear-gradient(135deg, #ff6b9d, #c44569); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; display: inline-block;">
+            Start Your Journey 💖
+        </a>
+    </div>
+
+    <div style="text-align: center; color: #999; font-size: 0.9em; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
+        <p>Need help? Reply to this email or contact us at support@aiprabh.com</p>
+        <p>© 2024 My Prabh. Made with 💖 for meaningful AI relationships.</p>
+    </div>
+</div>
+""")
+
+_EARLY_ACCESS_TEMPLATE = Template("""
+<div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="text-align: center; margin-bottom: 30px;">
+        <h1 style="color: #ff6b9d; font-size: 2.5em; margin: 0;">My Prabh 💖</h1>
+        <p style="color: #666; font-size: 1.2em;">AI Companion Platform</p>
+    </div>
+
+    <div style="background: linear-gradient(135deg, #ff6b9d, #c44569); padding: 30px; border-radius: 15px; color: white; text-align: center; margin-bottom: 30px;">
+        <h2 style="margin: 0 0 15px 0;">Welcome to Early Access! 🚀</h2>
+        <p style="margin: 0; font-size: 1.1em;">${greeting}You're now part of our exclusive early access community!</p>
+    </div>
+
+    <div style="padding: 20px; background: #f9f9f9; border-radius: 10px; margin-bottom: 20px;">
+        <h3 style="color: #333; margin-top: 0;">What's Coming? ✨</h3>
+        <ul style="color: #666; line-height: 1.6;">
+            <li><strong>Personalized AI Companions:</strong> Create unique personalities</li>
+            <li><strong>Emotional Intelligence:</strong> AI that truly understands you</li>
+            <li><strong>Memory & Growth:</strong> Companions that evolve with you</li>
+            <li><strong>Early Access Features:</strong> Be first to try new capabilities</li>
+        </ul>
+    </div>
+
+    <div style="text-align: center; color: #999; font-size: 0.9em; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
+        <p>We'll notify you as soon as My Prabh is ready for you!</p>
+        <p>© 2024 My Prabh. Building the future of AI companionship.</p>
+    </div>
+</div>
+""")
+
+_SUBSCRIPTION_TEMPLATE = Template("""
+<div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="text-align: center; margin-bottom: 30px;">
+        <h1 style="color: #ff6b9d; font-size: 2.5em; margin: 0;">My Prabh 💖</h1>
+        <p style="color: #666; font-size: 1.2em;">AI Companion Platform</p>
+    </div>
+
+    <div style="background: linear-gradient(135deg, #ff6b9d, #c44569); padding: 30px; border-radius: 15px; color: white; text-align: center; margin-bottom: 30px;">
+        <h2 style="margin: 0 0 15px 0;">Subscription Activated! 🚀</h2>
+        <p style="margin: 0; font-size: 1.1em;">Hi $name! Your $plan_name is now active and ready to use!</p>
+    </div>
+
+    <div style="padding: 20px; background: #f9f9f9; border-radius: 10px; margin-bottom: 20px;">
+        <h3 style="color: #333; margin-top: 0;">Your $plan_name Features:</h3>
+        <ul style="color: #666; line-height: 1.6;">
+            <li><strong>Enhanced AI Companions:</strong> Create more personalized Prabhs</li>
+            <li><strong>Unlimited Conversations:</strong> Chat as much as you want</li>
+            <li><strong>Advanced Memory:</strong> Your Prabh remembers everything</li>
+            <li><strong>Priority Support:</strong> Get help when you need it</li>
+            <li><strong>Premium Features:</strong> Access to latest capabilities</li>
+        </ul>
+    </div>
+
+    <div style="text-align: center; margin: 30px 0;">
+        <a href="https://myprabh.as.r.appspot.com/dashboard" 
+           style="background: linear-gradient(135deg, #ff6b9d, #c44569); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; display: inline-block;">
+            Start Using Premium Features 💖
+        </a>
+    </div>
+
+    <div style="text-align: center; color: #999; font-size: 0.9em; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
+        <p>Questions? Reply to this email or contact support@aiprabh.com</p>
+        <p>© 2024 My Prabh. Thank you for choosing premium AI companionship.</p>
+    </div>
+</div>
+""")
+
+# Timeout for Gmail API requests, in seconds
+GMAIL_HTTP_TIMEOUT = 10
+
+# Service account credentials, parsed once per process and refreshed in place
+_gmail_credentials = None
+_gmail_credentials_lock = threading.Lock()
+
+def load_gmail_credentials(creds_json, subject):
+    """Parse service account credentials once, delegated to the sending mailbox"""
+    global _gmail_credentials
+    with _gmail_credentials_lock:
+        if _gmail_credentials is None:
+            creds_info = orjson.loads(creds_json) if ORJSON_AVAILABLE else json.loads(creds_json)
+            credentials = service_account.Credentials.from_service_account_info(
+                creds_info,
+                scopes=['https://www.googleapis.com/auth/gmail.send']
+            )
+            _gmail_credentials = credentials.with_subject(subject)
+        return _gmail_credentials
+
+def encode_header(value):
+    """Make a header value safe for a raw message: single line, RFC 2047 encoded if non-ASCII"""
+    value = ' '.join(str(value).splitlines())
+    if value.isascii():
+        return value
+    return f"=?utf-8?B?{base64.b64encode(value.encode('utf-8')).decode('ascii')}?="
+
+# Attempts per email before giving up, with exponential backoff between them
+EMAIL_SEND_ATTEMPTS = 3
 
 class EmailService:
     """Email service using Google Workspace Gmail API"""
     
+    # Sends run off the request thread; Gmail API calls take 200-1000ms
+    _email_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='email')
+    
     def __init__(self):
         self.from_email = os.getenv('WORKSPACE_EMAIL', 'noreply@aiprabh.com')
+        self._credentials = None
+        self._http_local = threading.local()
         self.service = self._initialize_gmail_service()
     
     def _initialize_gmail_service(self):
@@ -27,15 +177,11 @@ class EmailService:
             creds_json = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
             
             if creds_json:
-                # Parse JSON credentials
-                creds_info = json.loads(creds_json)
-                credentials = service_account.Credentials.from_service_account_info(
-                    creds_info,
-                    scopes=['https://www.googleapis.com/auth/gmail.send']
-                )
+                # Parse JSON credentials (shared by every EmailService in this process)
+                self._credentials = load_gmail_credentials(creds_json, self.from_email)
                 
-                # Build Gmail service
-                service = build('gmail', 'v1', credentials=credentials)
+                # Build Gmail service on a keep-alive connection, skipping the discovery cache
+                service = build('gmail', 'v1', http=self._authorized_http(), cache_discovery=False)
                 print("✅ Gmail API service initialized")
                 return service
             else:
@@ -46,29 +192,47 @@ class EmailService:
             print(f"⚠️ Gmail API initialization error: {e}")
             return None
     
+    def _authorized_http(self):
+        """Keep-alive HTTP client for the current thread (httplib2 is not thread-safe)"""
+        http = getattr(self._http_local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=GMAIL_HTTP_TIMEOUT))
+            self._http_local.http = http
+        return http
+    
     def _send_email(self, to_email, subject, html_content):
-        """Send email using Gmail API"""
+        """Queue an email for sending; returns False if email is not configured"""
         if not self.service:
             print("⚠️ Gmail API not configured, skipping email")
             return False
         
+        self._email_executor.submit(self._send_email_with_retry, to_email, subject, html_content)
+        return True
+    
+    def _send_email_with_retry(self, to_email, subject, html_content):
+        """Send an email on the worker pool, retrying with exponential backoff"""
+        for attempt in range(EMAIL_SEND_ATTEMPTS):
+            if self._send_email_sync(to_email, subject, html_content):
+                return True
+            if attempt < EMAIL_SEND_ATTEMPTS - 1:
+                time.sleep(2 ** attempt)
+        
+        print(f"Giving up on email to {to_email} after {EMAIL_SEND_ATTEMPTS} attempts")
+        return False
+    
+    def _send_email_sync(self, to_email, subject, html_content):
+        """Send email using Gmail API"""
         try:
-            # Create message
-            message = MIMEMultipart('alternative')
-            message['to'] = to_email
-            message['from'] = self.from_email
-            message['subject'] = subject
-            
-            # Add HTML content
-            html_part = MIMEText(html_content, 'html')
-            message.attach(html_part)
-            
-            # Encode message
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+            # Build the RFC 5322 message directly; the body is a single HTML part
+            raw_message = base64.urlsafe_b64encode(
+                self._build_raw_message(to_email, subject, html_content)
+            ).decode('utf-8')
             
             # Send email
             send_message = {'raw': raw_message}
-            result = self.service.users().messages().send(userId='me', body=send_message).execute()
+            result = self.service.users().messages().send(userId='me', body=send_message).execute(
+                http=self._authorized_http()
+            )
             
             print(f"✅ Email sent to {to_email} (Message ID: {result['id']})")
             return True
@@ -77,80 +241,34 @@ class EmailService:
             print(f"Error sending email to {to_email}: {e}")
             return False
     
+    def _build_raw_message(self, to_email, subject, html_content):
+        """Build a base64-encoded HTML email as raw RFC 5322 bytes"""
+        body = base64.encodebytes(html_content.encode('utf-8')).decode('ascii').replace('\n', '\r\n')
+        return (
+            f"To: {encode_header(to_email)}\r\n"
+            f"From: {encode_header(self.from_email)}\r\n"
+            f"Subject: {encode_header(subject)}\r\n"
+            "MIME-Version: 1.0\r\n"
+            "Content-Type: text/html; charset=utf-8\r\n"
+            "Content-Transfer-Encoding: base64\r\n"
+            "\r\n"
+            f"{body}"
+        ).encode('ascii')
+    
     def send_welcome_email(self, user_email, user_name):
         """Send welcome email to new users"""
         subject = "Welcome to My Prabh! 💖 Your AI Companion Journey Begins"
         
-        html_content = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="text-align: center; margin-bottom: 30px;">
-                    <h1 style="color: #ff6b9d; font-size: 2.5em; margin: 0;">My Prabh 💖</h1>
-                    <p style="color: #666; font-size: 1.2em;">Your AI Companion Platform</p>
-                </div>
-                
-                <div style="background: linear-gradient(135deg, #ff6b9d, #c44569); padding: 30px; border-radius: 15px; color: white; text-align: center; margin-bottom: 30px;">
-                    <h2 style="margin: 0 0 15px 0;">Welcome, {user_name}! 🎉</h2>
-                    <p style="margin: 0; font-size: 1.1em;">Your journey with AI companionship starts now!</p>
-                </div>
-                
-                <div style="padding: 20px; background: #f9f9f9; border-radius: 10px; margin-bottom: 20px;">
-                    <h3 style="color: #333; margin-top: 0;">What's Next? 🚀</h3>
-                    <ul style="color: #666; line-height: 1.6;">
-                        <li><strong>Create Your First Prabh:</strong> Design your perfect AI companion</li>
-                        <li><strong>Start Chatting:</strong> Have meaningful conversations</li>
-                        <li><strong>Build Memories:</strong> Your Prabh learns and grows with you</li>
-                        <li><strong>Explore Features:</strong> Discover all the amazing capabilities</li>
-                    </ul>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="https://myprabh.as.r.appspot.com/dashboard" 
-                       style="background: linear-gradient(135deg, #ff6b9d, #c44569); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; display: inline-block;">
-                        Start Your Journey 💖
-                    </a>
-                </div>
-                
-                <div style="text-align: center; color: #999; font-size: 0.9em; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
-                    <p>Need help? Reply to this email or contact us at support@aiprabh.com</p>
-                    <p>© 2024 My Prabh. Made with 💖 for meaningful AI relationships.</p>
-                </div>
-            </div>
-            """
+        html_content = _WELCOME_TEMPLATE.substitute(user_name=escape(user_name or ''))
         
         return self._send_email(user_email, subject, html_content)
     
     def send_early_access_confirmation(self, email, name=""):
         """Send early access signup confirmation"""
         subject = "You're on the List! 🎉 My Prabh Early Access"
-            
-            html_content = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="text-align: center; margin-bottom: 30px;">
-                    <h1 style="color: #ff6b9d; font-size: 2.5em; margin: 0;">My Prabh 💖</h1>
-                    <p style="color: #666; font-size: 1.2em;">AI Companion Platform</p>
-                </div>
-                
-                <div style="background: linear-gradient(135deg, #ff6b9d, #c44569); padding: 30px; border-radius: 15px; color: white; text-align: center; margin-bottom: 30px;">
-                    <h2 style="margin: 0 0 15px 0;">Welcome to Early Access! 🚀</h2>
-                    <p style="margin: 0; font-size: 1.1em;">{"Hi " + name + "! " if name else ""}You're now part of our exclusive early access community!</p>
-                </div>
-                
-                <div style="padding: 20px; background: #f9f9f9; border-radius: 10px; margin-bottom: 20px;">
-                    <h3 style="color: #333; margin-top: 0;">What's Coming? ✨</h3>
-                    <ul style="color: #666; line-height: 1.6;">
-                        <li><strong>Personalized AI Companions:</strong> Create unique personalities</li>
-                        <li><strong>Emotional Intelligence:</strong> AI that truly understands you</li>
-                        <li><strong>Memory & Growth:</strong> Companions that evolve with you</li>
-                        <li><strong>Early Access Features:</strong> Be first to try new capabilities</li>
-                    </ul>
-                </div>
-                
-                <div style="text-align: center; color: #999; font-size: 0.9em; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
-                    <p>We'll notify you as soon as My Prabh is ready for you!</p>
-                    <p>© 2024 My Prabh. Building the future of AI companionship.</p>
-                </div>
-            </div>
-            """
+        
+        greeting = f"Hi {escape(name)}! " if name else ""
+        html_content = _EARLY_ACCESS_TEMPLATE.substitute(greeting=greeting)
         
         return self._send_email(email, subject, html_content)
     
@@ -166,42 +284,7 @@ class EmailService:
         
         plan_name = plan_names.get(plan_type, 'Premium Plan')
         
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <h1 style="color: #ff6b9d; font-size: 2.5em; margin: 0;">My Prabh 💖</h1>
-                <p style="color: #666; font-size: 1.2em;">AI Companion Platform</p>
-            </div>
-            
-            <div style="background: linear-gradient(135deg, #ff6b9d, #c44569); padding: 30px; border-radius: 15px; color: white; text-align: center; margin-bottom: 30px;">
-                <h2 style="margin: 0 0 15px 0;">Subscription Activated! 🚀</h2>
-                <p style="margin: 0; font-size: 1.1em;">Hi {name}! Your {plan_name} is now active and ready to use!</p>
-            </div>
-            
-            <div style="padding: 20px; background: #f9f9f9; border-radius: 10px; margin-bottom: 20px;">
-                <h3 style="color: #333; margin-top: 0;">Your {plan_name} Features:</h3>
-                <ul style="color: #666; line-height: 1.6;">
-                    <li><strong>Enhanced AI Companions:</strong> Create more personalized Prabhs</li>
-                    <li><strong>Unlimited Conversations:</strong> Chat as much as you want</li>
-                    <li><strong>Advanced Memory:</strong> Your Prabh remembers everything</li>
-                    <li><strong>Priority Support:</strong> Get help when you need it</li>
-                    <li><strong>Premium Features:</strong> Access to latest capabilities</li>
-                </ul>
-            </div>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="https://myprabh.as.r.appspot.com/dashboard" 
-                   style="background: linear-gradient(135deg, #ff6b9d, #c44569); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; display: inline-block;">
-                    Start Using Premium Features 💖
-                </a>
-            </div>
-            
-            <div style="text-align: center; color: #999; font-size: 0.9em; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
-                <p>Questions? Reply to this email or contact support@aiprabh.com</p>
-                <p>© 2024 My Prabh. Thank you for choosing premium AI companionship.</p>
-            </div>
-        </div>
-        """
+        html_content = _SUBSCRIPTION_TEMPLATE.substitute(name=escape(name or ''), plan_name=plan_name)
         
         return self._send_email(email, subject, html_content)
 
@@ -5,25 +5,99 @@ Handles Google Auth, user management, and email notifications
 
 import os
 import json
+import logging
+import queue
+import threading
+import time
 import firebase_admin
 from firebase_admin import credentials, auth, firestore
 from flask import session, request
 import requests
 from datetime import datetime
 
+from services.firestore_db import firestore_db
+
+logger = logging.getLogger(__name__)
+
+# Firestore allows at most 500 writes per batch
+WRITE_BATCH_SIZE = 500
+
+# How often buffered user updates are flushed, in seconds
+WRITE_FLUSH_INTERVAL = 0.2
+
+class BufferedUserWriter:
+    """Collects fire-and-forget document updates and commits them in batches off the request path"""
+    
+    def __init__(self, db):
+        self.db = db
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+    
+    def put(self, doc_ref, updates):
+        """Queue an update without waiting for Firestore"""
+        self._ensure_worker()
+        self._queue.put((doc_ref, updates))
+    
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='user_write_buffer', daemon=True)
+                self._worker.start()
+    
+    def _run(self):
+        while True:
+            ops = [self._queue.get()]
+            time.sleep(WRITE_FLUSH_INTERVAL)
+            while len(ops) < WRITE_BATCH_SIZE:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.flush(ops)
+    
+    def flush(self, ops):
+        """Commit queued updates, merging repeated updates to the same document"""
+        merged = {}
+        for doc_ref, updates in ops:
+            entry = merged.setdefault(doc_ref.path, [doc_ref, {}])
+            entry[1].update(updates)
+        
+        try:
+            batch = self.db.batch()
+            for doc_ref, updates in merged.values():
+                batch.update(doc_ref, updates)
+            batch.commit()
+        except Exception as e:
+            # One missing document fails the whole batch; retry individually
+            logger.warning("Batched user update failed, retrying individually: %s", e)
+            for doc_ref, updates in merged.values():
+                try:
+                    doc_ref.update(updates)
+                except Exception as update_error:
+                    logger.exception("Error updating user %s", doc_ref.id)
+        
+        # Cached copies are dropped once the writes have landed, so a read in
+        # between can't re-cache the old document
+        for doc_ref, _ in merged.values():
+            firestore_db.invalidate_user(doc_ref.id)
+
 class FirebaseAuth:
     """Firebase Authentication and user management"""
     
     def __init__(self):
         self._initialize_firebase()
         self.db = firestore.client()
+        self._write_buffer = BufferedUserWriter(self.db)
     
     def _initialize_firebase(self):
         """Initialize Firebase Admin SDK"""
         try:
             # Check if Firebase is already initialized
             firebase_admin.get_app()
-            print("✅ Firebase already initialized")
+            logger.info("Firebase already initialized")
         except ValueError:
             # Initialize Firebase with default credentials (Google Cloud Run)
             try:
@@ -32,9 +106,9 @@ class FirebaseAuth:
                 firebase_admin.initialize_app(cred, {
                     'projectId': 'myprabh'
                 })
-                print("✅ Firebase initialized with default credentials")
+                logger.info("Firebase initialized with default credentials")
             except Exception as e:
-                print(f"⚠️ Firebase initialization warning: {e}")
+                logger.warning("Firebase initialization warning: %s", e)
                 # Initialize without credentials for local development
                 firebase_admin.initialize_app()
     
@@ -44,7 +118,7 @@ class FirebaseAuth:
             decoded_token = auth.verify_id_token(id_token)
             return decoded_token
         except Exception as e:
-            print(f"Token verification error: {e}")
+            logger.warning("Token verification error: %s", e)
             return None
     
     def create_user_record(self, email, name, uid=None, phone_number=None, provider='google'):
@@ -68,33 +142,33 @@ class FirebaseAuth:
             # Save to Firestore
             doc_ref = self.db.collection('users').document(uid or email)
             doc_ref.set(user_data)
+            firestore_db.invalidate_user(uid or email, email)
             
-            print(f"✅ User record created: {email}")
+            logger.info("User record created: %s", email)
             return user_data
             
         except Exception as e:
-            print(f"Error creating user record: {e}")
+            logger.exception("Error creating user record")
             return None
     
     def get_user_by_uid(self, uid):
         """Get user by Firebase UID"""
         try:
-            doc = self.db.collection('users').document(uid).get()
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            # Served from the user cache firestore_db keeps for every user read
+            return firestore_db.get_user_by_id(uid)
         except Exception as e:
-            print(f"Error getting user: {e}")
+            logger.exception("Error getting user")
             return None
     
     def update_last_login(self, uid):
         """Update user's last login time"""
         try:
-            self.db.collection('users').document(uid).update({
-                'last_login': datetime.now()
+            # Non-blocking: committed with other buffered updates
+            self._write_buffer.put(self.db.collection('users').document(uid), {
+                'last_login': firestore.SERVER_TIMESTAMP
             })
         except Exception as e:
-            print(f"Error updating last login: {e}")
+            logger.exception("Error updating last login")
     
     def update_user_phone(self, uid, phone_number):
         """Update user's phone number"""
@@ -104,10 +178,11 @@ class FirebaseAuth:
                 'phone_verified': True,
                 'updated_at': datetime.now()
             })
-            print(f"✅ Phone number updated for user {uid}")
+            firestore_db.invalidate_user(uid)
+            logger.info("Phone number updated for user %s", uid)
             return True
         except Exception as e:
-            print(f"Error updating phone number: {e}")
+            logger.exception("Error updating phone number")
             return False
     
     def verify_user_email(self, uid):
@@ -117,9 +192,10 @@ class FirebaseAuth:
                 'email_verified': True,
                 'updated_at': datetime.now()
             })
+            firestore_db.invalidate_user(uid)
             return True
         except Exception as e:
-            print(f"Error verifying email: {e}")
+            logger.exception("Error verifying email")
             return False
 
 # Global instance
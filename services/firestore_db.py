@@ -4,87 +4,364 @@ Simple and efficient NoSQL database operations
 """
 
 import os
+import hashlib
+import itertools
+import json
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from google.cloud import firestore
-from datetime import datetime
-import uuid
+from google.api_core import exceptions as gcp_exceptions
+from google.api_core import retry as gcp_retry
+from datetime import datetime, timezone
+
+from utils.cache_utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Fields shipped in the per-user companion bundle used by dashboard pages
+COMPANION_BUNDLE_FIELDS = ['id', 'prabh_name', 'is_trained']
+
+# Fields fetched for list views; full documents are loaded by id when needed
+USER_LIST_FIELDS = ['user_id', 'name', 'email', 'created_at']
+PRABH_LIST_FIELDS = ['id', 'prabh_name', 'user_id', 'is_trained', 'created_at']
+MESSAGE_LIST_FIELDS = ['id', 'prabh_id', 'user_id', 'user_message', 'timestamp']
+
+# Flags only written once they become true; documents without them read back as False
+USER_FIELD_DEFAULTS = {'is_admin': False}
+PRABH_FIELD_DEFAULTS = {'is_trained': False}
+
+# Mutations committed per WriteBatch on bulk write paths
+WRITE_BATCH_SIZE = 40
+
+# Concurrent batch commits per bulk write call
+WRITE_POOL_SIZE = 10
+
+# Backoff (with jitter) for writes failing on contention or transient unavailability
+WRITE_RETRY = gcp_retry.Retry(
+    predicate=gcp_retry.if_exception_type(
+        gcp_exceptions.Aborted,
+        gcp_exceptions.Conflict,
+        gcp_exceptions.ServiceUnavailable,
+        gcp_exceptions.InternalServerError,
+        gcp_exceptions.TooManyRequests
+    ),
+    initial=0.1,
+    multiplier=2,
+    maximum=5,
+    deadline=30
+)
+
+# Documents per page when scanning large result sets (also the WriteBatch limit)
+SCAN_PAGE_SIZE = 500
+
+# Concurrent COUNT aggregations when seeding the statistics counters
+STATS_QUERY_WORKERS = 8
+
+# Shards per counter document in 'stats'; each write increments one at random
+STATS_COUNTER_SHARDS = 10
+
+# Times the counter seed is recomputed when writes land while it is being counted
+STATS_SEED_ATTEMPTS = 3
+
+# Collections stored per companion, under prabhs/{prabh_id}/<name>
+COMPANION_SUBCOLLECTIONS = ('messages',)
+
+# Counters kept alongside writes: collection -> (total field, daily field, timestamp field)
+COLLECTION_COUNTERS = {
+    'users': ('total_users', 'new_users', 'created_at'),
+    'prabhs': ('total_prabhs', 'new_prabhs', 'created_at'),
+    'messages': ('total_messages', 'messages', 'timestamp'),
+    'early_access': ('early_signups', None, None)
+}
+
+# Firestore clients (each with its own gRPC channel) per worker process;
+# request threads are spread across them to avoid queueing on one connection
+FIRESTORE_CHANNEL_POOL_SIZE = max(1, int(os.environ.get('FIRESTORE_CHANNEL_POOL_SIZE', '4')))
+
+# User documents, keyed by ('id', user_id) and ('email', email)
+_user_cache = TTLCache(maxsize=10000, ttl=60)
+
+# Companion documents, checked for ownership on every companion-scoped request
+_prabh_cache = TTLCache(maxsize=10000, ttl=60)
+
+# Dashboard statistics, recomputed at most every 30 seconds per worker
+_stats_cache = TTLCache(maxsize=64, ttl=30)
+
+# Precomputed companion bundles, rebuilt on the first read after a companion changes
+_companions_bundle_cache = TTLCache(maxsize=4096, ttl=600)
 
 class FirestoreDB:
     """Firestore database service for My Prabh"""
     
     def __init__(self):
+        # Firestore clients are created lazily, per worker process
+        self._clients = []
+        self._client_pid = None
+        self._client_lock = threading.Lock()
+        self._client_slots = itertools.count()
+        self._thread_state = threading.local()
+        
+        # Callbacks run with (user_id, prabh_id) after chat messages are saved
+        self._message_listeners = []
+        
+        self._ensure_database_setup()
+    
+    @property
+    def db(self):
+        """Firestore client owned by the current process, pinned per thread"""
+        pid = os.getpid()
+        if self._client_pid != pid:
+            with self._client_lock:
+                if self._client_pid != pid:
+                    self._clients = [None] * FIRESTORE_CHANNEL_POOL_SIZE
+                    self._client_pid = pid
+        
+        # Each thread keeps one slot so its requests stay on the same channel
+        state = self._thread_state
+        if getattr(state, 'pid', None) != pid:
+            state.slot = next(self._client_slots) % FIRESTORE_CHANNEL_POOL_SIZE
+            state.pid = pid
+        
+        client = self._clients[state.slot]
+        if client is None:
+            with self._client_lock:
+                client = self._clients[state.slot]
+                if client is None:
+                    client = self._create_client()
+                    self._clients[state.slot] = client
+        return client
+    
+    def _collection(self, name):
+        """CollectionReference on this thread's client, resolved once per thread"""
+        client = self.db
+        state = self._thread_state
+        if getattr(state, 'client', None) is not client:
+            state.client = client
+            state.collections = {}
+        
+        collection = state.collections.get(name)
+        if collection is None:
+            collection = client.collection(name)
+            state.collections[name] = collection
+        return collection
+    
+    def _create_client(self):
+        """Create a Firestore client; its gRPC channel is shared by the threads pinned to it"""
         # Initialize Firestore client with admin privileges
         from config.secure_config import config
         project_id = config.firebase_project_id
         
         try:
             # Try to initialize with service account (for admin access)
-            self.db = firestore.Client(project=project_id)
-            print(f"✅ Connected to Firestore project: {project_id}")
+            client = firestore.Client(project=project_id)
+            logger.info(f"✅ Connected to Firestore project: {project_id}")
         except Exception as e:
-            print(f"⚠️ Firestore connection warning: {e}")
+            logger.warning(f"⚠️ Firestore connection warning: {e}")
             # Fallback initialization
-            self.db = firestore.Client(project=project_id)
-            
-        self._ensure_database_setup()
+            client = firestore.Client(project=project_id)
+        
+        return client
+    
+    def reset_client(self):
+        """Drop the current clients so the next access opens fresh channels (e.g. after fork)"""
+        with self._client_lock:
+            self._clients = [None] * FIRESTORE_CHANNEL_POOL_SIZE
+            self._client_pid = None
     
     def _ensure_database_setup(self):
         """Ensure database collections exist"""
         try:
             # Test database connection and create initial collections if needed
-            collections = ['users', 'prabhs', 'messages', 'memories', 'early_access']
+            collections = ['users', 'prabhs', 'memories', 'early_access']
+            db = self.db
             
-            for collection_name in collections:
-                # Check if collection exists by trying to get a document
-                try:
-                    docs = list(self.db.collection(collection_name).limit(1).stream())
-                    print(f"✅ Collection '{collection_name}' exists")
-                except Exception:
-                    # Collection doesn't exist, create it with a placeholder document
-                    self.db.collection(collection_name).document('_init').set({
+            # Probe all collections concurrently over the shared channel
+            with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+                probes = {name: executor.submit(self._collection_exists, db, name) for name in collections}
+            
+            missing = []
+            for collection_name, probe in probes.items():
+                if probe.result():
+                    logger.info(f"✅ Collection '{collection_name}' exists")
+                else:
+                    missing.append(collection_name)
+            
+            if missing:
+                # Create missing collections with placeholder documents in one commit
+                batch = db.batch()
+                for collection_name in missing:
+                    batch.set(db.collection(collection_name).document('_init'), {
                         'initialized': True,
                         'created_at': datetime.now(),
                         'collection': collection_name
-                    })
-                    print(f"✅ Created collection '{collection_name}'")
+                    }, merge=True)
+                batch.commit(retry=WRITE_RETRY)
+                
+                for collection_name in missing:
+                    logger.info(f"✅ Created collection '{collection_name}'")
+            
+            self._seed_counters(db)
                     
         except Exception as e:
-            print(f"⚠️ Database setup warning: {e}")
+            logger.warning(f"⚠️ Database setup warning: {e}")
             # Continue anyway - collections will be created when first used
     
+    def _collection_exists(self, db, collection_name):
+        """Check if a collection can be read by fetching at most one document"""
+        try:
+            next(iter(db.collection(collection_name).limit(1).stream()), None)
+            return True
+        except Exception:
+            return False
+    
+    def _new_id(self, collection_name):
+        """Generate a random Firestore auto-ID for a new document, without a round trip"""
+        return self._collection(collection_name).document().id
+    
+    def _seed_counters(self, db):
+        """Seed the statistics counters from COUNT aggregations the first time they are used
+        
+        Seeds go in their own '-seed' documents, which increments never touch, and hold
+        only the part of each count the shards don't already cover. The shards are read
+        before and after counting, and the count is retried if any write landed between.
+        """
+        stats = db.collection('stats')
+        if stats.document('global-seed').get().exists:
+            return
+        
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        day = f"{today:%Y-%m-%d}"
+        queries = {}
+        for collection_name, (total_field, daily_field, timestamp_field) in COLLECTION_COUNTERS.items():
+            if collection_name in COMPANION_SUBCOLLECTIONS:
+                collection = db.collection_group(collection_name)
+            else:
+                collection = db.collection(collection_name)
+            queries[total_field] = collection
+            if daily_field:
+                queries[daily_field] = collection.where(timestamp_field, '>=', today)
+        
+        for _ in range(STATS_SEED_ATTEMPTS):
+            shards_before = self._read_counters('global', day)
+            counts = self._count_many(queries)
+            shards_after = self._read_counters('global', day)
+            if shards_before == shards_after:
+                break
+        else:
+            logger.warning("Counters kept changing while seeding; totals may be off by the writes in between")
+        totals, daily = shards_after
+        
+        # create() fails if another worker seeded first, leaving its seed in place
+        batch = db.batch()
+        batch.create(stats.document('global-seed'), {
+            total_field: counts[total_field] - totals.get(total_field, 0)
+            for total_field, _, _ in COLLECTION_COUNTERS.values()
+        })
+        batch.create(stats.document(f"{day}-seed"), {
+            daily_field: counts[daily_field] - daily.get(daily_field, 0)
+            for _, daily_field, _ in COLLECTION_COUNTERS.values() if daily_field
+        })
+        try:
+            batch.commit()
+            logger.info("✅ Seeded statistics counters")
+        except (gcp_exceptions.AlreadyExists, gcp_exceptions.Conflict):
+            pass
+    
+    def _bump_counters(self, db, batch, collection_name, amount=1):
+        """Add counter increments for new documents in a collection to a write batch"""
+        total_field, daily_field, _ = COLLECTION_COUNTERS[collection_name]
+        stats = db.collection('stats')
+        shard = random.randrange(STATS_COUNTER_SHARDS)
+        
+        batch.set(stats.document(f'global-{shard}'), {total_field: firestore.Increment(amount)}, merge=True)
+        if daily_field and amount > 0:
+            batch.set(stats.document(f"{datetime.now():%Y-%m-%d}-{shard}"),
+                      {daily_field: firestore.Increment(amount)}, merge=True)
+    
+    def record_deletions(self, collection_name, count):
+        """Decrement the global counter after documents are deleted outside this service"""
+        if count <= 0 or collection_name not in COLLECTION_COUNTERS:
+            return
+        
+        try:
+            batch = self.db.batch()
+            self._bump_counters(self.db, batch, collection_name, -count)
+            batch.commit(retry=WRITE_RETRY)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to update counters for '{collection_name}': {e}")
+    
+    def _read_counters(self, *names):
+        """Sum the shards and seed of each named counter document in a single read"""
+        stats = self._collection('stats')
+        suffixes = [*range(STATS_COUNTER_SHARDS), 'seed']
+        refs = [stats.document(f'{name}-{suffix}') for name in names for suffix in suffixes]
+        
+        totals = {name: {} for name in names}
+        for snapshot in self.db.get_all(refs):
+            counters = totals[snapshot.id.rsplit('-', 1)[0]]
+            for field, value in (snapshot.to_dict() or {}).items():
+                counters[field] = counters.get(field, 0) + value
+        return [totals[name] for name in names]
+    
     # User Management
     def create_user(self, email, name, password_hash):
         """Create a new user"""
-        user_id = str(uuid.uuid4())
+        user_id = self._new_id('users')
         user_data = {
             'user_id': user_id,
             'email': email,
             'name': name,
             'password_hash': password_hash,
-            'created_at': datetime.now(),
-            'is_admin': False
+            'created_at': firestore.SERVER_TIMESTAMP
         }
         
-        self.db.collection('users').document(user_id).set(user_data)
+        batch = self.db.batch()
+        batch.set(self._collection('users').document(user_id), user_data)
+        self._bump_counters(self.db, batch, 'users')
+        batch.commit(retry=WRITE_RETRY)
+        self.invalidate_user(user_id, email)
         return user_id
     
     def get_user_by_email(self, email):
         """Get user by email"""
-        users = self.db.collection('users').where('email', '==', email).limit(1).stream()
-        for user in users:
-            return user.to_dict()
-        return None
+        user_data = _user_cache.get(('email', email))
+        if user_data is None:
+            users = self._collection('users').where('email', '==', email).limit(1).stream()
+            for user in users:
+                user_data = user.to_dict()
+                break
+            if user_data is None:
+                return None
+            _user_cache.set(('email', email), user_data)
+            if user_data.get('user_id'):
+                _user_cache.set(('id', user_data['user_id']), user_data)
+        return {**USER_FIELD_DEFAULTS, **user_data}
     
     def get_user_by_id(self, user_id):
         """Get user by ID"""
-        doc = self.db.collection('users').document(user_id).get()
-        if doc.exists:
-            return doc.to_dict()
-        return None
+        user_data = _user_cache.get(('id', user_id))
+        if user_data is None:
+            doc = self._collection('users').document(user_id).get()
+            if not doc.exists:
+                return None
+            user_data = doc.to_dict()
+            _user_cache.set(('id', user_id), user_data)
+        return {**USER_FIELD_DEFAULTS, **user_data}
+    
+    def invalidate_user(self, user_id, email=None):
+        """Drop cached copies of a user document after it is written"""
+        cached = _user_cache.pop(('id', user_id))
+        if email is None and cached is not None:
+            email = cached.get('email')
+        if email is not None:
+            _user_cache.pop(('email', email))
     
     # Prabh Management
     def create_prabh(self, user_id, prabh_name, character_description, story_content, character_tags="", personality_traits=""):
         """Create a new Prabh companion"""
-        prabh_id = str(uuid.uuid4())
+        prabh_id = self._new_id('prabhs')
         prabh_data = {
             'id': prabh_id,
             'user_id': user_id,
@@ -93,73 +370,236 @@ class FirestoreDB:
             'story_content': story_content,
             'character_tags': character_tags,
             'personality_traits': personality_traits,
-            'created_at': datetime.now(),
-            'is_trained': False
+            'created_at': firestore.SERVER_TIMESTAMP
         }
         
-        self.db.collection('prabhs').document(prabh_id).set(prabh_data)
+        batch = self.db.batch()
+        batch.set(self._collection('prabhs').document(prabh_id), prabh_data)
+        self._bump_counters(self.db, batch, 'prabhs')
+        batch.commit(retry=WRITE_RETRY)
+        _prabh_cache.pop(prabh_id)
+        self.invalidate_companions_bundle(user_id)
         return prabh_id
     
     def get_user_prabhs(self, user_id):
-        """Get all Prabhs for a user"""
-        prabhs = self.db.collection('prabhs').where('user_id', '==', user_id).stream()
-        return [prabh.to_dict() for prabh in prabhs]
+        """Get all Prabhs for a user (list fields only; use get_prabh_by_id for the full story)"""
+        prabhs = (self._collection('prabhs')
+                 .where('user_id', '==', user_id)
+                 .select(PRABH_LIST_FIELDS)
+                 .stream())
+        return [{**PRABH_FIELD_DEFAULTS, **prabh.to_dict()} for prabh in prabhs]
+    
+    def get_companions_bundle(self, user_id):
+        """Get the user's companion list with an ETag, built once and served from cache"""
+        bundle = _companions_bundle_cache.get(user_id)
+        if bundle is not None:
+            return bundle
+        
+        prabhs = (self._collection('prabhs')
+                 .where('user_id', '==', user_id)
+                 .select(COMPANION_BUNDLE_FIELDS)
+                 .stream())
+        companions = [{**PRABH_FIELD_DEFAULTS, **prabh.to_dict()} for prabh in prabhs]
+        
+        payload = json.dumps(companions, sort_keys=True, default=str)
+        bundle = {
+            'companions': companions,
+            'etag': hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        }
+        _companions_bundle_cache.set(user_id, bundle)
+        return bundle
+    
+    def invalidate_companions_bundle(self, user_id):
+        """Drop the cached companion bundle after a user's companions change"""
+        _companions_bundle_cache.pop(user_id)
     
     def get_prabh_by_id(self, prabh_id, user_id):
         """Get specific Prabh by ID"""
-        doc = self.db.collection('prabhs').document(prabh_id).get()
-        if doc.exists:
+        prabh_data = _prabh_cache.get(prabh_id)
+        if prabh_data is None:
+            doc = self._collection('prabhs').document(prabh_id).get()
+            if not doc.exists:
+                return None
             prabh_data = doc.to_dict()
-            if prabh_data.get('user_id') == user_id:
-                return prabh_data
+            _prabh_cache.set(prabh_id, prabh_data)
+        
+        if prabh_data.get('user_id') == user_id:
+            return {**PRABH_FIELD_DEFAULTS, **prabh_data}
         return None
     
     # Chat Messages
     def save_chat_message(self, prabh_id, user_id, user_message, ai_response):
         """Save chat message"""
-        message_id = str(uuid.uuid4())
-        message_data = {
-            'id': message_id,
+        return self.save_chat_messages_bulk([{
             'prabh_id': prabh_id,
             'user_id': user_id,
             'user_message': user_message,
-            'ai_response': ai_response,
-            'timestamp': datetime.now()
-        }
+            'ai_response': ai_response
+        }])[0]
+    
+    def save_chat_messages_bulk(self, items):
+        """Save many chat messages using batched commits"""
+        messages = self._collection('messages')
+        records = []
+        for item in items:
+            records.append({
+                'id': messages.document().id,
+                'prabh_id': item['prabh_id'],
+                'user_id': item['user_id'],
+                'user_message': item['user_message'],
+                'ai_response': item['ai_response'],
+                'timestamp': firestore.SERVER_TIMESTAMP
+            })
+        
+        self._write_batched('messages', records)
         
-        self.db.collection('messages').document(message_id).set(message_data)
-        return message_id
+        # Caches built from a companion's conversation drop their copy once it changes
+        for user_id, prabh_id in {(record['user_id'], record['prabh_id']) for record in records}:
+            for listener in self._message_listeners:
+                listener(user_id, prabh_id)
+        return [record['id'] for record in records]
+    
+    def add_message_listener(self, listener):
+        """Register listener(user_id, prabh_id) to run after chat messages are saved"""
+        self._message_listeners.append(listener)
     
     def get_chat_history(self, prabh_id, user_id, limit=10):
         """Get recent chat history"""
-        messages = (self.db.collection('messages')
-                   .where('prabh_id', '==', prabh_id)
-                   .where('user_id', '==', user_id)
+        # Messages live under the companion, so ownership is checked on the companion itself
+        if self.get_prabh_by_id(prabh_id, user_id) is None:
+            return []
+        
+        messages = (self.companion_messages(prabh_id)
                    .order_by('timestamp', direction=firestore.Query.DESCENDING)
                    .limit(limit)
                    .stream())
         
         return [msg.to_dict() for msg in messages]
     
+    def companion_messages(self, prabh_id):
+        """Chat messages subcollection of a companion"""
+        return self._collection('prabhs').document(prabh_id).collection('messages')
+    
+    def all_messages(self):
+        """Collection-group query across every companion's chat messages"""
+        return self.db.collection_group('messages')
+    
+    def migrate_flat_messages(self, batch_size=WRITE_BATCH_SIZE):
+        """Move messages from the legacy top-level collection under their companions"""
+        moved = 0
+        
+        for docs in self.iter_pages(self._collection('messages'), batch_size):
+            # Copy and delete in the same batch so a message is never lost or duplicated;
+            # messages without a companion are left where they are
+            batch = self.db.batch()
+            batch_moved = 0
+            for doc in docs:
+                message_data = doc.to_dict()
+                if not message_data.get('prabh_id'):
+                    continue
+                batch.set(self.companion_messages(message_data['prabh_id']).document(doc.id), message_data)
+                batch.delete(doc.reference)
+                batch_moved += 1
+            
+            if batch_moved:
+                batch.commit(retry=WRITE_RETRY)
+                moved += batch_moved
+                logger.info(f"✅ Migrated {moved} messages")
+        
+        return moved
+    
+    def companion_contexts(self, user_id):
+        """Saved companion contexts subcollection of a user, keyed by companion id"""
+        return self._collection('users').document(user_id).collection('companion_contexts')
+    
+    def legacy_companion_contexts(self):
+        """Top-level companion contexts keyed {user_id}_{companion_id}, read until migrated"""
+        return self._collection('companion_contexts')
+    
+    def get_companion_context(self, user_id, companion_id):
+        """Saved context snapshot for a companion
+        
+        Falls back to the legacy top-level document until migrate_companion_contexts has run.
+        """
+        snapshot = self.companion_contexts(user_id).document(companion_id).get()
+        if snapshot.exists:
+            return snapshot
+        legacy = self.legacy_companion_contexts().document(f"{user_id}_{companion_id}").get()
+        return legacy if legacy.exists else snapshot
+    
+    def archive_index(self, user_id):
+        """Per-user summary of archived companions, keyed by archive id"""
+        return self._collection('users').document(user_id).collection('meta').document('archive_index')
+    
+    def _with_context_timestamps(self, data):
+        """Convert a legacy context's ISO time strings to timestamps so range queries match them"""
+        for field in ('last_updated', 'saved_at'):
+            value = data.get(field)
+            if isinstance(value, str):
+                try:
+                    # Legacy strings were written from naive local datetime.now()
+                    data[field] = datetime.fromisoformat(value).astimezone(timezone.utc)
+                except ValueError:
+                    pass
+        return data
+    
+    def migrate_companion_contexts(self, batch_size=WRITE_BATCH_SIZE):
+        """Move companion contexts from the legacy top-level collection under their users"""
+        moved = 0
+        
+        for docs in self.iter_pages(self.legacy_companion_contexts(), batch_size):
+            contexts = [(doc, self._with_context_timestamps(doc.to_dict())) for doc in docs]
+            contexts = [(doc, data) for doc, data in contexts
+                        if data.get('user_id') and data.get('companion_id')]
+            if not contexts:
+                continue
+            
+            # Contexts saved since the move already live under the user and are newer
+            targets = [self.companion_contexts(data['user_id']).document(data['companion_id'])
+                       for _, data in contexts]
+            existing = {snapshot.reference.path for snapshot in self.db.get_all(targets) if snapshot.exists}
+            
+            batch = self.db.batch()
+            for (doc, data), target in zip(contexts, targets):
+                if target.path not in existing:
+                    batch.set(target, data)
+                batch.delete(doc.reference)
+            batch.commit(retry=WRITE_RETRY)
+            moved += len(contexts)
+            logger.info(f"✅ Migrated {moved} companion contexts")
+        
+        return moved
+    
     # Memory System
     def save_memory(self, prabh_id, user_id, memory_text, memory_type="general"):
         """Save user memory"""
-        memory_id = str(uuid.uuid4())
-        memory_data = {
-            'id': memory_id,
+        return self.save_memories_bulk([{
             'prabh_id': prabh_id,
             'user_id': user_id,
             'memory_text': memory_text,
-            'memory_type': memory_type,
-            'created_at': datetime.now()
-        }
+            'memory_type': memory_type
+        }])[0]
+    
+    def save_memories_bulk(self, items):
+        """Save many user memories using batched commits"""
+        memories = self._collection('memories')
+        records = []
+        for item in items:
+            records.append({
+                'id': memories.document().id,
+                'prabh_id': item['prabh_id'],
+                'user_id': item['user_id'],
+                'memory_text': item['memory_text'],
+                'memory_type': item.get('memory_type', 'general'),
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
         
-        self.db.collection('memories').document(memory_id).set(memory_data)
-        return memory_id
+        self._write_batched('memories', records)
+        return [record['id'] for record in records]
     
     def get_memories(self, prabh_id, user_id, limit=10):
         """Get user memories"""
-        memories = (self.db.collection('memories')
+        memories = (self._collection('memories')
                    .where('prabh_id', '==', prabh_id)
                    .where('user_id', '==', user_id)
                    .order_by('created_at', direction=firestore.Query.DESCENDING)
@@ -168,43 +608,80 @@ class FirestoreDB:
         
         return [memory.to_dict() for memory in memories]
     
+    def _write_batched(self, collection_name, records):
+        """Write records keyed by their 'id' in WriteBatch chunks committed concurrently"""
+        if not records:
+            return
+        
+        db = self.db
+        chunks = [records[i:i + WRITE_BATCH_SIZE] for i in range(0, len(records), WRITE_BATCH_SIZE)]
+        
+        if len(chunks) == 1:
+            self._commit_chunk(db, collection_name, chunks[0])
+            return
+        
+        with ThreadPoolExecutor(max_workers=min(WRITE_POOL_SIZE, len(chunks))) as executor:
+            futures = [executor.submit(self._commit_chunk, db, collection_name, chunk) for chunk in chunks]
+            for future in futures:
+                future.result()
+    
+    def _document_ref(self, db, collection_name, record):
+        """Document reference for a record, nesting companion-scoped collections"""
+        if collection_name in COMPANION_SUBCOLLECTIONS:
+            parent = db.collection('prabhs').document(record['prabh_id'])
+            return parent.collection(collection_name).document(record['id'])
+        return db.collection(collection_name).document(record['id'])
+    
+    def _commit_chunk(self, db, collection_name, chunk):
+        """Commit one chunk of writes, retrying transient failures with backoff"""
+        batch = db.batch()
+        for record in chunk:
+            batch.set(self._document_ref(db, collection_name, record), record)
+        if collection_name in COLLECTION_COUNTERS:
+            self._bump_counters(db, batch, collection_name, len(chunk))
+        batch.commit(retry=WRITE_RETRY)
+    
     # Early Access Signups
     def save_early_access_signup(self, email, name=""):
         """Save early access signup"""
-        signup_id = str(uuid.uuid4())
+        signup_id = self._new_id('early_access')
         signup_data = {
             'id': signup_id,
             'email': email,
             'name': name,
-            'signup_date': datetime.now(),
+            'signup_date': firestore.SERVER_TIMESTAMP,
             'status': 'pending'
         }
         
-        self.db.collection('early_access').document(signup_id).set(signup_data)
+        batch = self.db.batch()
+        batch.set(self._collection('early_access').document(signup_id), signup_data)
+        self._bump_counters(self.db, batch, 'early_access')
+        batch.commit(retry=WRITE_RETRY)
         return signup_id
     
     # Subscription Management
     def create_subscription(self, subscription_data):
         """Create user subscription"""
-        subscription_id = str(uuid.uuid4())
+        subscription_id = self._new_id('subscriptions')
         subscription_data['id'] = subscription_id
-        subscription_data['created_at'] = datetime.now()
+        subscription_data['created_at'] = firestore.SERVER_TIMESTAMP
         
-        self.db.collection('subscriptions').document(subscription_id).set(subscription_data)
+        self._collection('subscriptions').document(subscription_id).set(subscription_data, retry=WRITE_RETRY)
         
         # Update user subscription status
-        self.db.collection('users').document(subscription_data['user_id']).update({
+        self._collection('users').document(subscription_data['user_id']).update({
             'subscription_status': 'active',
             'subscription_plan': subscription_data['plan_type'],
             'subscription_end': subscription_data['end_date']
-        })
+        }, retry=WRITE_RETRY)
+        self.invalidate_user(subscription_data['user_id'])
         
         return subscription_id
     
     def get_user_subscription(self, user_id):
         """Get user's active subscription"""
         try:
-            subscriptions = (self.db.collection('subscriptions')
+            subscriptions = (self._collection('subscriptions')
                            .where('user_id', '==', user_id)
                            .where('status', '==', 'active')
                            .order_by('created_at', direction=firestore.Query.DESCENDING)
@@ -215,38 +692,64 @@ class FirestoreDB:
                 return sub.to_dict()
             return None
         except Exception as e:
-            print(f"Error getting subscription: {e}")
+            logger.error(f"Error getting subscription: {e}")
             return None
     
     # Enhanced Analytics
+    def count_documents(self, query):
+        """Count matching documents with a server-side COUNT aggregation"""
+        return query.count().get()[0][0].value
+    
+    def exists(self, query):
+        """Check whether a query matches any document, reading at most one"""
+        return next(iter(query.limit(1).stream()), None) is not None
+    
+    def iter_pages(self, query, page_size=SCAN_PAGE_SIZE):
+        """Yield a query's documents in pages ordered by id, holding one page at a time"""
+        query = query.order_by(firestore.FieldPath.document_id()).limit(page_size)
+        
+        last_doc = None
+        while True:
+            page = query.start_after(last_doc) if last_doc is not None else query
+            docs = list(page.stream())
+            if docs:
+                yield docs
+            
+            if len(docs) < page_size:
+                return
+            last_doc = docs[-1]
+    
+    def _count_many(self, queries):
+        """Run independent COUNT aggregations concurrently, returning counts by name"""
+        counts = {}
+        with ThreadPoolExecutor(max_workers=min(STATS_QUERY_WORKERS, len(queries))) as executor:
+            futures = {executor.submit(self.count_documents, query): name for name, query in queries.items()}
+            for future in as_completed(futures):
+                counts[futures[future]] = future.result()
+        return counts
+    
+    def _platform_stats(self, totals):
+        """Platform statistics from the global counters plus active subscriptions"""
+        stats = {total_field: totals.get(total_field, 0) for total_field, _, _ in COLLECTION_COUNTERS.values()}
+        
+        # Subscriptions change status after creation, so these are still counted
+        stats['active_subscriptions'] = self.count_documents(self._collection('subscriptions')
+                                                             .where('status', '==', 'active'))
+        return stats
+    
     def get_stats(self):
         """Get platform statistics"""
+        stats = _stats_cache.get('stats')
+        if stats is not None:
+            return dict(stats)
+        
         try:
-            # Count users
-            users_count = len(list(self.db.collection('users').stream()))
-            
-            # Count Prabhs
-            prabhs_count = len(list(self.db.collection('prabhs').stream()))
-            
-            # Count messages
-            messages_count = len(list(self.db.collection('messages').stream()))
-            
-            # Count early access signups
-            early_signups_count = len(list(self.db.collection('early_access').stream()))
-            
-            # Count active subscriptions
-            active_subs = len(list(self.db.collection('subscriptions')
-                                 .where('status', '==', 'active').stream()))
-            
-            return {
-                'total_users': users_count,
-                'total_prabhs': prabhs_count,
-                'total_messages': messages_count,
-                'early_signups': early_signups_count,
-                'active_subscriptions': active_subs
-            }
+            totals, = self._read_counters('global')
+            stats = self._platform_stats(totals)
+            _stats_cache.set('stats', stats)
+            return dict(stats)
         except Exception as e:
-            print(f"Error getting stats: {e}")
+            logger.error(f"Error getting stats: {e}")
             return {
                 'total_users': 0,
                 'total_prabhs': 0,
@@ -257,99 +760,111 @@ class FirestoreDB:
     
     def get_admin_stats(self):
         """Get comprehensive admin statistics"""
+        stats = _stats_cache.get('admin_stats')
+        if stats is not None:
+            return dict(stats)
+        
         try:
-            # Basic stats
-            stats = self.get_stats()
-            
-            # Today's activity
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            # New users today
-            new_users_today = len(list(self.db.collection('users')
-                                     .where('created_at', '>=', today).stream()))
-            
-            # New Prabhs today
-            new_prabhs_today = len(list(self.db.collection('prabhs')
-                                      .where('created_at', '>=', today).stream()))
-            
-            # Messages today
-            messages_today = len(list(self.db.collection('messages')
-                                    .where('timestamp', '>=', today).stream()))
+            # Totals and today's activity come from the counter shards in one read
+            totals, today = self._read_counters('global', datetime.now().strftime('%Y-%m-%d'))
+            stats = self._platform_stats(totals)
             
             stats.update({
-                'new_users_today': new_users_today,
-                'new_prabhs_today': new_prabhs_today,
-                'messages_today': messages_today,
+                'new_users_today': today.get('new_users', 0),
+                'new_prabhs_today': today.get('new_prabhs', 0),
+                'messages_today': today.get('messages', 0),
                 'revenue_today': 0,  # Calculate from subscriptions
-                'active_users_today': new_users_today  # Simplified
+                'active_users_today': today.get('new_users', 0)  # Simplified
             })
             
-            return stats
+            _stats_cache.set('admin_stats', stats)
+            return dict(stats)
         except Exception as e:
-            print(f"Error getting admin stats: {e}")
+            logger.error(f"Error getting admin stats: {e}")
             return self.get_stats()
     
     def get_recent_users(self, limit=10):
         """Get recently registered users"""
         try:
-            users = (self.db.collection('users')
+            users = (self._collection('users')
                     .order_by('created_at', direction=firestore.Query.DESCENDING)
+                    .select(USER_LIST_FIELDS)
                     .limit(limit)
                     .stream())
             
             return [user.to_dict() for user in users]
         except Exception as e:
-            print(f"Error getting recent users: {e}")
+            logger.error(f"Error getting recent users: {e}")
             return []
     
     def get_recent_prabhs(self, limit=10):
         """Get recently created Prabhs"""
         try:
-            prabhs = (self.db.collection('prabhs')
+            prabhs = (self._collection('prabhs')
                      .order_by('created_at', direction=firestore.Query.DESCENDING)
+                     .select(PRABH_LIST_FIELDS)
                      .limit(limit)
                      .stream())
             
-            return [prabh.to_dict() for prabh in prabhs]
+            return [{**PRABH_FIELD_DEFAULTS, **prabh.to_dict()} for prabh in prabhs]
         except Exception as e:
-            print(f"Error getting recent prabhs: {e}")
+            logger.error(f"Error getting recent prabhs: {e}")
             return []
     
     def get_recent_messages(self, limit=20):
         """Get recent chat messages"""
         try:
-            messages = (self.db.collection('messages')
+            messages = (self.all_messages()
                        .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                       .select(MESSAGE_LIST_FIELDS)
                        .limit(limit)
                        .stream())
             
             return [msg.to_dict() for msg in messages]
         except Exception as e:
-            print(f"Error getting recent messages: {e}")
+            logger.error(f"Error getting recent messages: {e}")
             return []
     
+    def get_admin_dashboard(self):
+        """Load admin statistics and recent activity lists concurrently"""
+        loaders = {
+            'stats': self.get_admin_stats,
+            'recent_users': self.get_recent_users,
+            'recent_prabhs': self.get_recent_prabhs,
+            'recent_messages': self.get_recent_messages
+        }
+        
+        with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+            futures = {name: executor.submit(loader) for name, loader in loaders.items()}
+        return {name: future.result() for name, future in futures.items()}
+    
     def get_growth_stats(self, start_date, end_date):
         """Get growth statistics for date range"""
+        cache_key = ('growth', start_date, end_date)
+        growth = _stats_cache.get(cache_key)
+        if growth is not None:
+            return dict(growth)
+        
         try:
             # Users in date range
-            users_growth = len(list(self.db.collection('users')
-                                  .where('created_at', '>=', start_date)
-                                  .where('created_at', '<', end_date)
-                                  .stream()))
+            users_growth = self.count_documents(self._collection('users')
+                                       .where('created_at', '>=', start_date)
+                                       .where('created_at', '<', end_date))
             
             # Prabhs in date range
-            prabhs_growth = len(list(self.db.collection('prabhs')
-                                   .where('created_at', '>=', start_date)
-                                   .where('created_at', '<', end_date)
-                                   .stream()))
+            prabhs_growth = self.count_documents(self._collection('prabhs')
+                                        .where('created_at', '>=', start_date)
+                                        .where('created_at', '<', end_date))
             
-            return {
+            growth = {
                 'new_users': users_growth,
                 'new_prabhs': prabhs_growth,
                 'period': f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
             }
+            _stats_cache.set(cache_key, growth)
+            return dict(growth)
         except Exception as e:
-            print(f"Error getting growth stats: {e}")
+            logger.error(f"Error getting growth stats: {e}")
             return {'new_users': 0, 'new_prabhs': 0}
 
 # Global instance
@@ -1,25 +1,137 @@
 """
 Companion Context Management Service for My Prabh
 Handles seamless switching between companions with isolated contexts
+
+Firestore access goes through firestore_db's clients; collaborators share
+them rather than opening channels of their own.
 """
 
 from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
-import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import copy
+import logging
+from google.cloud import firestore
 
 from services.firestore_db import firestore_db
 from services.memory.memory_manager import MemoryManager
 from services.memory.personalization_engine import PersonalizationEngine
 from config.memory_config import MemoryConfig
+from utils.cache_utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Configuration is read from the environment once per process
+_CONFIG = MemoryConfig()
+
+# Verified CompanionInfo, keyed by (user_id, companion_id)
+_companion_info_cache = TTLCache(maxsize=4096, ttl=30)
+
+# Full companion context served to repeated UI polls, keyed by (user_id, companion_id);
+# entries are private deep copies, so callers can't mutate what later polls receive
+_companion_context_cache = TTLCache(maxsize=1024, ttl=10)
+
+# Built queries reused across calls; keyed by the owning client so a query never
+# outlives its process's connection
+_query_cache = TTLCache(maxsize=256, ttl=300)
+
+# Context summaries shown in the companion switcher, keyed by (user_id, companion_id)
+_context_summary_cache = TTLCache(maxsize=4096, ttl=5)
+
+# Independent reads issued together when loading a companion's context
+CONTEXT_LOAD_WORKERS = 4
+
+# Most recent assigned memories included in a companion's context
+RECENT_MEMORY_LIMIT = 5
+
+# Context summaries fetched together when the switcher asks for them
+SUMMARY_FETCH_WORKERS = 10
+
+# Seconds a query stream may take before the request gives up on it
+QUERY_TIMEOUT = 10.0
+
+# Contexts cleaned per batch; each costs two writes and a batch holds at most 500
+CLEANUP_PAGE_SIZE = 250
+
+def invalidate_companion_context(user_id: str, companion_id: str) -> None:
+    """Drop the cached context of a companion after its conversation changes"""
+    _companion_context_cache.pop((user_id, companion_id))
+
+firestore_db.add_message_listener(invalidate_companion_context)
+
+@dataclass(frozen=True)
+class CompanionInfo:
+    """Verified companion details returned to callers switching context"""
+    id: str
+    name: Optional[str]
+    personality: Optional[str]
+    description: Optional[str]
+    avatar: Optional[str]
+    created_at: Any
+    memory_based: bool
+    status: str
+    
+    @classmethod
+    def from_firestore(cls, companion_id: str, companion_data: Dict[str, Any]) -> 'CompanionInfo':
+        return cls(
+            id=companion_id,
+            name=companion_data.get('name'),
+            personality=companion_data.get('personality'),
+            description=companion_data.get('description'),
+            avatar=companion_data.get('avatar'),
+            created_at=companion_data.get('created_at'),
+            memory_based=companion_data.get('memory_based', False),
+            status=companion_data.get('status', 'active')
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'personality': self.personality,
+            'description': self.description,
+            'avatar': self.avatar,
+            'created_at': self.created_at,
+            'memory_based': self.memory_based,
+            'status': self.status
+        }
+
+def _prepared_query(key, build):
+    """Reuse an immutable Query for key, building it on first use"""
+    query = _query_cache.get(key)
+    if query is None:
+        query = build()
+        _query_cache.set(key, query)
+    return query
+
+@lru_cache(maxsize=1)
+def _shared_memory_manager() -> MemoryManager:
+    """MemoryManager shared by context services that don't bring their own"""
+    return MemoryManager()
+
+@lru_cache(maxsize=1)
+def _shared_personalization_engine() -> PersonalizationEngine:
+    """PersonalizationEngine shared by context services that don't bring their own"""
+    return PersonalizationEngine()
 
 class CompanionContextService:
     """Service for managing companion contexts and seamless switching"""
     
-    def __init__(self):
-        self.config = MemoryConfig()
-        self.memory_manager = MemoryManager()
-        self.personalization_engine = PersonalizationEngine()
-        print("✅ Companion Context Service initialized")
+    def __init__(self, db=None, memory_manager: MemoryManager = None,
+                 personalization_engine: PersonalizationEngine = None):
+        self.config = _CONFIG
+        self._db = db
+        if memory_manager is None:
+            memory_manager = MemoryManager(db=db) if db is not None else _shared_memory_manager()
+        self.memory_manager = memory_manager
+        self.personalization_engine = personalization_engine or _shared_personalization_engine()
+    
+    @property
+    def db(self):
+        """Firestore client, defaulting to the shared firestore_db client"""
+        return self._db if self._db is not None else firestore_db.db
     
     def switch_companion_context(self, user_id: str, from_companion_id: str, 
                                 to_companion_id: str, session_data: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -36,9 +148,15 @@ class CompanionContextService:
             Dictionary with switch results and new context
         """
         try:
+            # One clock read per switch, shared by the loaded context and the response
+            now_iso = datetime.now().isoformat()
+            
+            # Context save, activity update and switch log are committed together
+            batch = self.db.batch()
+            
             # Save current context if switching from an existing companion
             if from_companion_id:
-                save_result = self._save_companion_context(user_id, from_companion_id, session_data)
+                save_result = self._save_companion_context(user_id, from_companion_id, session_data, batch=batch)
                 if not save_result['success']:
                     return {
                         'success': False,
@@ -48,37 +166,49 @@ class CompanionContextService:
             # Verify target companion exists and belongs to user
             target_companion = self._get_companion_info(user_id, to_companion_id)
             if not target_companion['success']:
+                self._commit_context_writes(batch)
                 return {
                     'success': False,
                     'error': target_companion['error']
                 }
             
             # Load target companion context
-            context_result = self._load_companion_context(user_id, to_companion_id)
+            context_result = self._load_companion_context(user_id, to_companion_id, now_iso=now_iso)
             if not context_result['success']:
+                self._commit_context_writes(batch)
                 return {
                     'success': False,
                     'error': f"Failed to load target context: {context_result['error']}"
                 }
             
             # Update companion activity
-            self._update_companion_activity(user_id, to_companion_id)
+            self._update_companion_activity(user_id, to_companion_id, batch=batch)
             
             # Log context switch
-            self._log_context_switch(user_id, from_companion_id, to_companion_id)
+            self._log_context_switch(user_id, from_companion_id, to_companion_id, batch=batch)
             
-            return {
+            commit_result = self._commit_context_writes(batch)
+            if not commit_result['success']:
+                return {
+                    'success': False,
+                    'error': f"Failed to save current context: {commit_result['error']}"
+                }
+            
+            # The context just loaded is what the UI polls for next
+            context = {
                 'success': True,
                 'companion_info': target_companion['companion'],
                 'context': context_result['context'],
                 'conversation_history': context_result['conversation_history'],
                 'personality_context': context_result['personality_context'],
-                'memory_context': context_result['memory_context'],
-                'switch_timestamp': datetime.now().isoformat()
+                'memory_context': context_result['memory_context']
             }
+            _companion_context_cache.set((user_id, to_companion_id), copy.deepcopy(context))
+            
+            return dict(context, switch_timestamp=now_iso)
             
         except Exception as e:
-            print(f"Error switching companion context: {e}")
+            logger.exception("Error switching companion context")
             return {
                 'success': False,
                 'error': str(e)
@@ -86,6 +216,10 @@ class CompanionContextService:
     
     def get_companion_context(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Get complete context for a companion without switching"""
+        cached = _companion_context_cache.get((user_id, companion_id))
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
         try:
             # Verify companion ownership
             companion_info = self._get_companion_info(user_id, companion_id)
@@ -97,7 +231,7 @@ class CompanionContextService:
             if not context_result['success']:
                 return context_result
             
-            return {
+            result = {
                 'success': True,
                 'companion_info': companion_info['companion'],
                 'context': context_result['context'],
@@ -105,9 +239,11 @@ class CompanionContextService:
                 'personality_context': context_result['personality_context'],
                 'memory_context': context_result['memory_context']
             }
+            _companion_context_cache.set((user_id, companion_id), copy.deepcopy(result))
+            return result
             
         except Exception as e:
-            print(f"Error getting companion context: {e}")
+            logger.exception("Error getting companion context")
             return {
                 'success': False,
                 'error': str(e)
@@ -127,7 +263,7 @@ class CompanionContextService:
                 'user_id': user_id,
                 'companion_id': companion_id,
                 'conversation_state': conversation_state,
-                'last_updated': datetime.now().isoformat(),
+                'last_updated': firestore.SERVER_TIMESTAMP,
                 'session_id': conversation_state.get('session_id'),
                 'last_message_timestamp': conversation_state.get('last_message_timestamp'),
                 'conversation_turn': conversation_state.get('conversation_turn', 0),
@@ -136,10 +272,16 @@ class CompanionContextService:
                 'topic_context': conversation_state.get('topic_context', [])
             }
             
-            # Save to Firestore
-            firestore_db.db.collection('companion_contexts').document(
-                f"{user_id}_{companion_id}"
-            ).set(state_data, merge=True)
+            # Save state and the switcher's denormalized turn count together
+            batch = self.db.batch()
+            batch.set(firestore_db.companion_contexts(user_id).document(companion_id), state_data, merge=True)
+            batch.update(self.db.collection('companions').document(companion_id), {
+                'conversation_turn': state_data['conversation_turn']
+            })
+            batch.commit()
+            _companion_info_cache.pop((user_id, companion_id))
+            _context_summary_cache.pop((user_id, companion_id))
+            _companion_context_cache.pop((user_id, companion_id))
             
             return {
                 'success': True,
@@ -147,29 +289,39 @@ class CompanionContextService:
             }
             
         except Exception as e:
-            print(f"Error saving conversation state: {e}")
+            logger.exception("Error saving conversation state")
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def get_active_companions(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get list of recently active companions for quick switching"""
+    def get_active_companions(self, user_id: str, limit: int = 10, after: Optional[str] = None,
+                              include_summary: bool = False) -> Dict[str, Any]:
+        """Get a page of recently active companions for quick switching
+        
+        Pass the returned next_cursor as after to fetch the following page.
+        Turn count and last message preview come from the companion document;
+        include_summary additionally fetches each full context summary.
+        """
         try:
             # Get companions ordered by last activity
-            companions_query = firestore_db.db.collection('companions').where(
-                'user_id', '==', user_id
-            ).order_by('last_activity', direction='DESCENDING').limit(limit)
+            db = self.db
+            companions_query = _prepared_query(
+                (db, 'active_companions', user_id, limit),
+                lambda: db.collection('companions').where(
+                    'user_id', '==', user_id
+                ).order_by('last_activity', direction='DESCENDING').limit(limit)
+            )
             
-            companion_docs = list(companions_query.stream())
+            if after:
+                cursor = db.collection('companions').document(after).get()
+                if cursor.exists:
+                    companions_query = companions_query.start_after(cursor)
             
             active_companions = []
-            for doc in companion_docs:
+            for doc in companions_query.stream(timeout=QUERY_TIMEOUT):
                 companion_data = doc.to_dict()
                 
-                # Get context summary
-                context_summary = self._get_context_summary(user_id, doc.id)
-                
                 companion_info = {
                     'id': doc.id,
                     'name': companion_data.get('name'),
@@ -179,31 +331,47 @@ class CompanionContextService:
                     'interaction_count': companion_data.get('interaction_count', 0),
                     'memory_based': companion_data.get('memory_based', False),
                     'status': companion_data.get('status', 'active'),
-                    'context_summary': context_summary
+                    'conversation_turn': companion_data.get('conversation_turn', 0),
+                    'last_message_preview': companion_data.get('last_message_preview')
                 }
                 
                 active_companions.append(companion_info)
             
-            return active_companions
+            if include_summary and active_companions:
+                # Summaries are independent per companion, so fetch them together
+                workers = min(SUMMARY_FETCH_WORKERS, len(active_companions))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    summaries = executor.map(
+                        lambda companion: self._get_context_summary(user_id, companion['id']),
+                        active_companions
+                    )
+                    for companion_info, context_summary in zip(active_companions, summaries):
+                        companion_info['context_summary'] = context_summary
+            
+            return {
+                'companions': active_companions,
+                'next_cursor': active_companions[-1]['id'] if len(active_companions) == limit else None
+            }
             
         except Exception as e:
-            print(f"Error getting active companions: {e}")
-            return []
+            logger.exception("Error getting active companions")
+            return {'companions': [], 'next_cursor': None}
     
     def get_context_isolation_status(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Check context isolation status for a companion"""
         try:
-            # Check conversation isolation
-            conversation_isolation = self._check_conversation_isolation(user_id, companion_id)
-            
-            # Check memory context isolation
-            memory_isolation = self._check_memory_context_isolation(user_id, companion_id)
-            
-            # Check personality context isolation
-            personality_isolation = self._check_personality_context_isolation(user_id, companion_id)
-            
-            # Check session isolation
-            session_isolation = self._check_session_isolation(user_id, companion_id)
+            # Conversation, memory, personality and session checks are independent
+            # reads; the shared Firestore client is thread-safe, so run them together
+            with ThreadPoolExecutor(max_workers=CONTEXT_LOAD_WORKERS) as executor:
+                conversation_future = executor.submit(self._check_conversation_isolation, user_id, companion_id)
+                memory_future = executor.submit(self._check_memory_context_isolation, user_id, companion_id)
+                personality_future = executor.submit(self._check_personality_context_isolation, user_id, companion_id)
+                session_future = executor.submit(self._check_session_isolation, user_id, companion_id)
+            
+            conversation_isolation = conversation_future.result()
+            memory_isolation = memory_future.result()
+            personality_isolation = personality_future.result()
+            session_isolation = session_future.result()
             
             # Calculate overall isolation score
             isolation_components = [
@@ -229,7 +397,7 @@ class CompanionContextService:
             }
             
         except Exception as e:
-            print(f"Error checking context isolation: {e}")
+            logger.exception("Error checking context isolation")
             return {
                 'success': False,
                 'error': str(e)
@@ -238,67 +406,111 @@ class CompanionContextService:
     def cleanup_inactive_contexts(self, user_id: str, days_inactive: int = 30) -> Dict[str, Any]:
         """Clean up contexts for companions inactive for specified days"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days_inactive)
-            cutoff_iso = cutoff_date.isoformat()
-            
-            # Find inactive companion contexts
-            contexts_query = firestore_db.db.collection('companion_contexts').where(
-                'user_id', '==', user_id
-            ).where('last_updated', '<', cutoff_iso)
-            
-            context_docs = list(contexts_query.stream())
+            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_inactive)
+            # Legacy contexts stored last_updated as a naive local ISO string, and
+            # strings only compare against strings in a range filter
+            cutoff_iso = (datetime.now() - timedelta(days=days_inactive)).isoformat()
+            
+            contexts = firestore_db.companion_contexts(user_id)
+            inactive_queries = [
+                contexts.where('last_updated', '<', cutoff_date),
+                # Contexts moved under the user before their timestamps were converted
+                contexts.where('last_updated', '<', cutoff_iso),
+                # Top-level contexts still read as a fallback until migrated
+                firestore_db.legacy_companion_contexts().where(
+                    'user_id', '==', user_id
+                ).where('last_updated', '<', cutoff_iso)
+            ]
             
-            cleaned_count = 0
             archived_contexts = []
-            
-            for doc in context_docs:
-                context_data = doc.to_dict()
-                companion_id = context_data.get('companion_id')
-                
-                # Check if companion still exists and is active
-                companion_doc = firestore_db.db.collection('companions').document(companion_id).get()
-                
-                if not companion_doc.exists or companion_doc.to_dict().get('status') == 'archived':
-                    # Archive context data before deletion
-                    archived_context = {
-                        'companion_id': companion_id,
-                        'archived_at': datetime.now().isoformat(),
-                        'context_data': context_data
-                    }
-                    
-                    firestore_db.db.collection('archived_companion_contexts').add(archived_context)
-                    archived_contexts.append(companion_id)
-                    
-                    # Delete the active context
-                    doc.reference.delete()
-                    cleaned_count += 1
+            for query in inactive_queries:
+                archived_contexts.extend(self._archive_inactive_contexts(query))
             
             return {
                 'success': True,
-                'cleaned_count': cleaned_count,
+                'cleaned_count': len(archived_contexts),
                 'archived_contexts': archived_contexts,
-                'cutoff_date': cutoff_iso
+                'cutoff_date': cutoff_date.isoformat()
             }
             
         except Exception as e:
-            print(f"Error cleaning up inactive contexts: {e}")
+            logger.exception("Error cleaning up inactive contexts")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def _archive_inactive_contexts(self, inactive_query) -> List[str]:
+        """Archive and delete the contexts an inactivity query matches, one page at a time"""
+        contexts_query = inactive_query.order_by('last_updated').limit(CLEANUP_PAGE_SIZE)
+        archived_contexts = []
+        
+        last_doc = None
+        while True:
+            page = contexts_query.start_after(last_doc) if last_doc is not None else contexts_query
+            context_docs = list(page.stream(timeout=QUERY_TIMEOUT))
+            if not context_docs:
+                break
+            
+            # Check which companions still exist and are active in a single read
+            companion_ids = {doc.to_dict().get('companion_id') for doc in context_docs}
+            companion_refs = [self.db.collection('companions').document(companion_id)
+                              for companion_id in companion_ids if companion_id]
+            active_companions = {
+                snapshot.id for snapshot in self.db.get_all(companion_refs)
+                if snapshot.exists and snapshot.to_dict().get('status') != 'archived'
+            } if companion_refs else set()
+            
+            batch = self.db.batch()
+            archived_collection = self.db.collection('archived_companion_contexts')
+            for doc in context_docs:
+                context_data = doc.to_dict()
+                companion_id = context_data.get('companion_id')
+                if companion_id in active_companions:
+                    continue
+                
+                # Archive context data before deletion
+                batch.set(archived_collection.document(), {
+                    'companion_id': companion_id,
+                    'archived_at': firestore.SERVER_TIMESTAMP,
+                    'context_data': context_data
+                })
+                batch.delete(doc.reference)
+                archived_contexts.append(companion_id)
+            batch.commit()
+            
+            if len(context_docs) < CLEANUP_PAGE_SIZE:
+                break
+            last_doc = context_docs[-1]
+        
+        return archived_contexts
+    
+    def _commit_context_writes(self, batch) -> Dict[str, Any]:
+        """Commit writes queued during a context switch"""
+        try:
+            batch.commit()
+            return {'success': True}
+        except Exception as e:
+            logger.exception("Error committing context writes")
+            return {'success': False, 'error': str(e)}
+    
     def _save_companion_context(self, user_id: str, companion_id: str, 
-                               session_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Save current companion context"""
+                               session_data: Dict[str, Any], batch=None) -> Dict[str, Any]:
+        """Save current companion context, queued on batch when given"""
         try:
             if not session_data:
                 return {'success': True, 'message': 'No session data to save'}
             
+            # Only the owner's companion may receive the denormalized switcher fields
+            companion_info = self._get_companion_info(user_id, companion_id)
+            if not companion_info['success']:
+                return companion_info
+            
             context_data = {
                 'user_id': user_id,
                 'companion_id': companion_id,
                 'session_data': session_data,
-                'saved_at': datetime.now().isoformat(),
+                'saved_at': firestore.SERVER_TIMESTAMP,
                 'conversation_turn': session_data.get('conversation_turn', 0),
                 'last_message': session_data.get('last_message', ''),
                 'context_summary': session_data.get('context_summary', ''),
@@ -306,64 +518,79 @@ class CompanionContextService:
                 'active_topics': session_data.get('active_topics', [])
             }
             
-            # Save context
-            firestore_db.db.collection('companion_contexts').document(
-                f"{user_id}_{companion_id}"
-            ).set(context_data, merge=True)
+            # Save context, denormalizing what the companion switcher shows
+            context_ref = firestore_db.companion_contexts(user_id).document(companion_id)
+            companion_ref = self.db.collection('companions').document(companion_id)
+            switcher_fields = {'conversation_turn': context_data['conversation_turn']}
+            if context_data['last_message']:
+                switcher_fields['last_message_preview'] = context_data['last_message'][:50] + '...'
+            
+            write_batch = batch if batch is not None else self.db.batch()
+            write_batch.set(context_ref, context_data, merge=True)
+            write_batch.update(companion_ref, switcher_fields)
+            if batch is None:
+                write_batch.commit()
+            _context_summary_cache.pop((user_id, companion_id))
+            _companion_context_cache.pop((user_id, companion_id))
             
             return {'success': True}
             
         except Exception as e:
-            print(f"Error saving companion context: {e}")
+            logger.exception("Error saving companion context")
             return {'success': False, 'error': str(e)}
     
-    def _load_companion_context(self, user_id: str, companion_id: str) -> Dict[str, Any]:
+    def _load_companion_context(self, user_id: str, companion_id: str,
+                                now_iso: str = None) -> Dict[str, Any]:
         """Load companion context and related data"""
         try:
-            # Load saved context
-            context_doc = firestore_db.db.collection('companion_contexts').document(
-                f"{user_id}_{companion_id}"
-            ).get()
-            
+            # Saved context, conversation history, personality and memories are
+            # independent reads, so issue them together instead of one after another
+            with ThreadPoolExecutor(max_workers=CONTEXT_LOAD_WORKERS) as executor:
+                context_future = executor.submit(firestore_db.get_companion_context, user_id, companion_id)
+                history_future = executor.submit(self._load_conversation_history, user_id, companion_id)
+                personality_future = executor.submit(self._load_personality_context, user_id, companion_id)
+                memory_future = executor.submit(self._load_memory_context, user_id, companion_id, now_iso)
+            
+            context_doc = context_future.result()
             context_data = context_doc.to_dict() if context_doc.exists else {}
             
-            # Load conversation history
-            conversation_history = self._load_conversation_history(user_id, companion_id)
-            
-            # Load personality context
-            personality_context = self._load_personality_context(user_id, companion_id)
-            
-            # Load memory context
-            memory_context = self._load_memory_context(user_id, companion_id)
-            
             return {
                 'success': True,
                 'context': context_data,
-                'conversation_history': conversation_history,
-                'personality_context': personality_context,
-                'memory_context': memory_context
+                'conversation_history': history_future.result(),
+                'personality_context': personality_future.result(),
+                'memory_context': memory_future.result()
             }
             
         except Exception as e:
-            print(f"Error loading companion context: {e}")
+            logger.exception("Error loading companion context")
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def _load_conversation_history(self, user_id: str, companion_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """Load recent conversation history for companion"""
+    def _load_conversation_history(self, user_id: str, companion_id: str, limit: int = 20,
+                                   summary_only: bool = False) -> List[Dict[str, Any]]:
+        """Load recent conversation history for companion
+        
+        summary_only skips per-message metadata for callers that just need the text.
+        """
+        def build():
+            query = firestore_db.companion_messages(companion_id).where('user_id', '==', user_id)
+            if summary_only:
+                query = query.select(['user_message', 'ai_response', 'timestamp'])
+            return query.order_by('timestamp', direction='DESCENDING').limit(limit)
+        
         try:
-            messages_query = firestore_db.db.collection('messages').where(
-                'user_id', '==', user_id
-            ).where('prabh_id', '==', companion_id).order_by(
-                'timestamp', direction='DESCENDING'
-            ).limit(limit)
+            messages_query = _prepared_query(
+                (firestore_db.db, 'history', user_id, companion_id, limit, summary_only), build
+            )
             
-            message_docs = list(messages_query.stream())
+            message_docs = list(messages_query.stream(timeout=QUERY_TIMEOUT))
             
+            # Newest-first from the query; build the history in chronological order
             conversation_history = []
-            for doc in message_docs:
+            for doc in reversed(message_docs):
                 message_data = doc.to_dict()
                 conversation_history.append({
                     'id': doc.id,
@@ -373,11 +600,10 @@ class CompanionContextService:
                     'metadata': message_data.get('metadata', {})
                 })
             
-            # Reverse to get chronological order
-            return list(reversed(conversation_history))
+            return conversation_history
             
         except Exception as e:
-            print(f"Error loading conversation history: {e}")
+            logger.exception("Error loading conversation history")
             return []
     
     def _load_personality_context(self, user_id: str, companion_id: str) -> Dict[str, Any]:
@@ -398,21 +624,30 @@ class CompanionContextService:
                 return {}
                 
         except Exception as e:
-            print(f"Error loading personality context: {e}")
+            logger.exception("Error loading personality context")
             return {}
     
-    def _load_memory_context(self, user_id: str, companion_id: str) -> Dict[str, Any]:
+    def _load_memory_context(self, user_id: str, companion_id: str,
+                             now_iso: str = None) -> Dict[str, Any]:
         """Load memory context for companion"""
         try:
-            # Get assigned memories count
-            memories_query = firestore_db.db.collection('memories').where(
+            memories_query = self.db.collection('memories').where(
                 'assigned_companion_id', '==', companion_id
             )
-            memory_docs = list(memories_query.stream())
+            recent_query = memories_query.order_by(
+                'timestamp', direction='DESCENDING'
+            ).limit(RECENT_MEMORY_LIMIT)
+            
+            # Count assigned memories server-side while fetching only the most recent ones
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                count_future = executor.submit(firestore_db.count_documents, memories_query)
+                recent_future = executor.submit(lambda: list(recent_query.stream(timeout=QUERY_TIMEOUT)))
+                total_assigned = count_future.result()
+                memory_docs = recent_future.result()
             
             # Get recent memory interactions
             recent_memories = []
-            for doc in memory_docs[-5:]:  # Last 5 memories
+            for doc in memory_docs:
                 memory_data = doc.to_dict()
                 recent_memories.append({
                     'id': doc.id,
@@ -422,20 +657,24 @@ class CompanionContextService:
                 })
             
             return {
-                'total_assigned_memories': len(memory_docs),
+                'total_assigned_memories': total_assigned,
                 'recent_memories': recent_memories,
                 'memory_assignment_type': 'assigned',  # Could be enhanced with actual assignment type
-                'last_memory_access': datetime.now().isoformat()
+                'last_memory_access': now_iso or datetime.now().isoformat()
             }
             
         except Exception as e:
-            print(f"Error loading memory context: {e}")
+            logger.exception("Error loading memory context")
             return {}
     
     def _get_companion_info(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Get basic companion information with ownership verification"""
+        cached = _companion_info_cache.get((user_id, companion_id))
+        if cached is not None:
+            return {'success': True, 'companion': cached.to_dict()}
+        
         try:
-            companion_doc = firestore_db.db.collection('companions').document(companion_id).get()
+            companion_doc = self.db.collection('companions').document(companion_id).get()
             
             if not companion_doc.exists:
                 return {'success': False, 'error': 'Companion not found'}
@@ -445,80 +684,90 @@ class CompanionContextService:
             if companion_data.get('user_id') != user_id:
                 return {'success': False, 'error': 'Access denied'}
             
+            companion = CompanionInfo.from_firestore(companion_id, companion_data)
+            _companion_info_cache.set((user_id, companion_id), companion)
+            
             return {
                 'success': True,
-                'companion': {
-                    'id': companion_id,
-                    'name': companion_data.get('name'),
-                    'personality': companion_data.get('personality'),
-                    'description': companion_data.get('description'),
-                    'avatar': companion_data.get('avatar'),
-                    'created_at': companion_data.get('created_at'),
-                    'memory_based': companion_data.get('memory_based', False),
-                    'status': companion_data.get('status', 'active')
-                }
+                'companion': companion.to_dict()
             }
             
         except Exception as e:
-            print(f"Error getting companion info: {e}")
+            logger.exception("Error getting companion info")
             return {'success': False, 'error': str(e)}
     
-    def _update_companion_activity(self, user_id: str, companion_id: str) -> None:
-        """Update companion's last activity timestamp"""
+    def _update_companion_activity(self, user_id: str, companion_id: str, batch=None) -> None:
+        """Update companion's last activity timestamp, queued on batch when given
+        
+        Write-only: activity fields are not part of CompanionInfo, so the cached
+        info stays valid and the next switch does not re-read the companion.
+        """
         try:
-            firestore_db.db.collection('companions').document(companion_id).update({
-                'last_activity': datetime.now().isoformat(),
+            companion_ref = self.db.collection('companions').document(companion_id)
+            activity = {
+                'last_activity': firestore.SERVER_TIMESTAMP,
                 'last_accessed_by': user_id
-            })
+            }
+            if batch is not None:
+                batch.update(companion_ref, activity)
+            else:
+                companion_ref.update(activity)
         except Exception as e:
-            print(f"Error updating companion activity: {e}")
+            logger.exception("Error updating companion activity")
     
     def _get_context_summary(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Get summary of companion's current context"""
+        cached = _context_summary_cache.get((user_id, companion_id))
+        if cached is not None:
+            return dict(cached)
+        
         try:
             # Get last message
-            last_message_query = firestore_db.db.collection('messages').where(
-                'user_id', '==', user_id
-            ).where('prabh_id', '==', companion_id).order_by(
-                'timestamp', direction='DESCENDING'
-            ).limit(1)
+            last_message_query = _prepared_query(
+                (firestore_db.db, 'last_message', user_id, companion_id),
+                lambda: firestore_db.companion_messages(companion_id).where(
+                    'user_id', '==', user_id
+                ).select(['ai_response', 'timestamp']).order_by(
+                    'timestamp', direction='DESCENDING'
+                ).limit(1)
+            )
             
-            last_message_docs = list(last_message_query.stream())
+            last_message_doc = next(iter(last_message_query.stream(timeout=QUERY_TIMEOUT)), None)
             last_message = None
-            if last_message_docs:
-                last_message_data = last_message_docs[0].to_dict()
+            if last_message_doc is not None:
+                last_message_data = last_message_doc.to_dict()
                 last_message = {
                     'preview': last_message_data.get('ai_response', '')[:50] + '...',
                     'timestamp': last_message_data.get('timestamp')
                 }
             
             # Get context data
-            context_doc = firestore_db.db.collection('companion_contexts').document(
-                f"{user_id}_{companion_id}"
-            ).get()
+            context_doc = firestore_db.get_companion_context(user_id, companion_id)
             
             context_data = context_doc.to_dict() if context_doc.exists else {}
             
-            return {
+            summary = {
                 'last_message': last_message,
                 'conversation_turn': context_data.get('conversation_turn', 0),
                 'emotional_state': context_data.get('emotional_state', {}),
                 'active_topics': context_data.get('active_topics', []),
                 'context_summary': context_data.get('context_summary', '')
             }
+            _context_summary_cache.set((user_id, companion_id), summary)
+            return summary
             
         except Exception as e:
-            print(f"Error getting context summary: {e}")
+            logger.exception("Error getting context summary")
             return {}
     
     def _check_conversation_isolation(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Check if companion's conversations are isolated"""
         try:
-            # Get conversations for this companion
-            companion_messages = firestore_db.db.collection('messages').where(
-                'prabh_id', '==', companion_id
+            # Count this user's conversations with the companion server-side
+            companion_messages = firestore_db.companion_messages(companion_id).where(
+                'user_id', '==', user_id
             )
-            companion_message_count = len(list(companion_messages.stream()))
+            companion_message_count = firestore_db.count_documents(companion_messages)
             
             # Check for cross-companion references (simplified check)
             isolated = True  # Assume isolated unless proven otherwise
@@ -530,17 +779,17 @@ class CompanionContextService:
             }
             
         except Exception as e:
-            print(f"Error checking conversation isolation: {e}")
+            logger.exception("Error checking conversation isolation")
             return {'isolated': False, 'error': str(e)}
     
     def _check_memory_context_isolation(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Check if companion's memory context is isolated"""
         try:
             # Get memories assigned to this companion
-            assigned_memories = firestore_db.db.collection('memories').where(
+            assigned_memories = self.db.collection('memories').where(
                 'assigned_companion_id', '==', companion_id
             )
-            assigned_count = len(list(assigned_memories.stream()))
+            assigned_count = firestore_db.count_documents(assigned_memories)
             
             # Check for shared memories (simplified)
             isolated = True  # Assume isolated for now
@@ -552,7 +801,7 @@ class CompanionContextService:
             }
             
         except Exception as e:
-            print(f"Error checking memory context isolation: {e}")
+            logger.exception("Error checking memory context isolation")
             return {'isolated': False, 'error': str(e)}
     
     def _check_personality_context_isolation(self, user_id: str, companion_id: str) -> Dict[str, Any]:
@@ -567,16 +816,14 @@ class CompanionContextService:
             }
             
         except Exception as e:
-            print(f"Error checking personality context isolation: {e}")
+            logger.exception("Error checking personality context isolation")
             return {'isolated': False, 'error': str(e)}
     
     def _check_session_isolation(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Check if companion's session context is isolated"""
         try:
             # Check if companion has its own context document
-            context_doc = firestore_db.db.collection('companion_contexts').document(
-                f"{user_id}_{companion_id}"
-            ).get()
+            context_doc = firestore_db.get_companion_context(user_id, companion_id)
             
             has_context = context_doc.exists
             
@@ -587,7 +834,7 @@ class CompanionContextService:
             }
             
         except Exception as e:
-            print(f"Error checking session isolation: {e}")
+            logger.exception("Error checking session isolation")
             return {'isolated': False, 'error': str(e)}
     
     def _get_isolation_recommendations(self, conversation_isolation: Dict[str, Any],
@@ -614,18 +861,24 @@ class CompanionContextService:
         
         return recommendations
     
-    def _log_context_switch(self, user_id: str, from_companion_id: str, to_companion_id: str) -> None:
-        """Log context switch for analytics and debugging"""
+    def _log_context_switch(self, user_id: str, from_companion_id: str, to_companion_id: str,
+                            batch=None) -> None:
+        """Log context switch for analytics and debugging, queued on batch when given"""
         try:
             log_entry = {
                 'user_id': user_id,
                 'from_companion_id': from_companion_id,
                 'to_companion_id': to_companion_id,
-                'switch_timestamp': datetime.now().isoformat(),
+                'switch_timestamp': firestore.SERVER_TIMESTAMP,
                 'action': 'context_switch'
             }
             
-            firestore_db.db.collection('companion_switch_logs').add(log_entry)
+            # A pre-generated id lets the log entry join a batch
+            log_ref = self.db.collection('companion_switch_logs').document()
+            if batch is not None:
+                batch.set(log_ref, log_entry)
+            else:
+                log_ref.set(log_entry)
             
         except Exception as e:
-            print(f"Error logging context switch: {e}")
\ No newline at end of file
+            logger.exception("Error logging context switch")
\ No newline at end of file
@@ -4,26 +4,190 @@ Handles companion archiving, modification, and lifecycle management
 """
 
 from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 import json
+import logging
+import os
 import uuid
 
+from google.cloud import firestore
+
+# Try to import orjson, but fall back to stdlib json if not available
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try to import Cloud Storage, but keep archive packages in Firestore if not available
+try:
+    from google.cloud import storage
+    STORAGE_AVAILABLE = True
+except ImportError:
+    STORAGE_AVAILABLE = False
+
 from services.firestore_db import firestore_db
 from services.memory.memory_manager import MemoryManager
 from services.memory.personalization_engine import PersonalizationEngine
 from services.memory.companion_context_service import CompanionContextService
 from config.memory_config import MemoryConfig
+from utils.cache_utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Threads shared by every lifecycle action for independent archive, restore and history reads
+LIFECYCLE_WORKERS = 8
+
+# Writes queued per batch; Firestore allows 500, leaving headroom for the caller's own writes
+BATCH_WRITE_LIMIT = 450
+
+# Most recent lifecycle logs and backups returned with a companion's history
+HISTORY_PAGE_SIZE = 50
+
+# Modification sections in the order they are applied, with the method applying each
+MODIFICATION_HANDLERS = {
+    'basic_properties': '_modify_basic_properties',
+    'personality': '_modify_personality',
+    'memory_assignment': '_modify_memory_assignment'
+}
+
+# Longest companion name accepted by modify_companion
+MAX_COMPANION_NAME_LENGTH = 100
+
+# Bucket holding archive packages; when unset packages stay inline in the archive record
+ARCHIVE_BUCKET = os.environ.get('GOOGLE_CLOUD_STORAGE_BUCKET', '')
+
+_storage_client = None
+
+# Companion lookups shared within one lifecycle action, keyed by companion id;
+# unset outside an action so nothing is reused across requests or users
+_companion_lookups: ContextVar[Optional[Dict[str, Any]]] = ContextVar('companion_lookups', default=None)
+
+# Archive listings per user; archive records only change on archive, restore and delete
+_archived_companions_cache = TTLCache(maxsize=1024, ttl=60)
+
+# Archive fields shown in listings, leaving the package itself on the server
+ARCHIVE_LISTING_FIELDS = [
+    'companion_id', 'original_companion_data.name', 'original_companion_data.personality',
+    'archived_at', 'archive_reason', 'archive_options', 'restored_at',
+    'restored_companion_id', 'archive_package_size'
+]
+
+@contextmanager
+def _companion_lookup_scope():
+    """Share companion lookups for the duration of one lifecycle action"""
+    if _companion_lookups.get() is not None:
+        yield
+        return
+    token = _companion_lookups.set({})
+    try:
+        yield
+    finally:
+        _companion_lookups.reset(token)
+
+def _forget_companion(companion_id: str) -> None:
+    """Drop a companion lookup after writing to it within the current action"""
+    lookups = _companion_lookups.get()
+    if lookups is not None:
+        lookups.pop(companion_id, None)
+
+def _json_default(obj: Any) -> Any:
+    """Fallback for values orjson does not serialize natively"""
+    # Firestore returns DatetimeWithNanoseconds, which orjson does not treat as a datetime
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+def _archive_index_entry(archive_id: str, archive_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Listing summary of an archive record, as kept in the per-user archive index"""
+    original_companion = archive_data.get('original_companion_data', {})
+    return {
+        'archive_id': archive_id,
+        'companion_id': archive_data.get('companion_id'),
+        'name': original_companion.get('name'),
+        'personality': original_companion.get('personality'),
+        'archived_at': archive_data.get('archived_at'),
+        'archive_reason': archive_data.get('archive_reason'),
+        'archive_options': archive_data.get('archive_options', {}),
+        'restored_at': archive_data.get('restored_at'),
+        'restored_companion_id': archive_data.get('restored_companion_id'),
+        'archive_size': archive_data.get('archive_package_size')
+    }
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize an archive package; timestamps become ISO strings"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+def _loads(data: bytes) -> Any:
+    """Deserialize an archive package"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _archive_bucket():
+    """Bucket for archive packages, or None when blob storage is not configured"""
+    global _storage_client
+    if not (STORAGE_AVAILABLE and ARCHIVE_BUCKET):
+        return None
+    if _storage_client is None:
+        _storage_client = storage.Client()
+    return _storage_client.bucket(ARCHIVE_BUCKET)
+
+def _upload_archive_package(user_id: str, archive_id: str, payload: bytes) -> Optional[str]:
+    """Write a serialized package to blob storage and return its gs:// URI"""
+    bucket = _archive_bucket()
+    if bucket is None:
+        return None
+    blob = bucket.blob(f"companion_archives/{user_id}/{archive_id}.json")
+    blob.upload_from_string(payload, content_type='application/json')
+    return f"gs://{bucket.name}/{blob.name}"
+
+def _archive_blob(uri: str):
+    """Blob handle for a gs:// archive URI"""
+    global _storage_client
+    if _storage_client is None:
+        _storage_client = storage.Client()
+    return storage.Blob.from_string(uri, client=_storage_client)
+
+def _download_archive_package(uri: str) -> Dict[str, Any]:
+    """Read an archive package back from blob storage"""
+    return _loads(_archive_blob(uri).download_as_bytes())
+
+def _parse_archived_timestamp(value: Any) -> Any:
+    """Turn an ISO string from a serialized package back into a datetime
+    
+    Only for message timestamps: messages are written with SERVER_TIMESTAMP and
+    restored ones are ordered alongside them, so they must not come back as
+    strings. Memory timestamps are stored as ISO strings and are kept that way.
+    """
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
 
 class CompanionLifecycleService:
     """Service for managing companion lifecycle, archiving, and modifications"""
     
+    # One bounded pool for all requests, so concurrent archives and restores can't multiply threads
+    _lifecycle_executor = ThreadPoolExecutor(max_workers=LIFECYCLE_WORKERS, thread_name_prefix='companion_lifecycle')
+    
     def __init__(self):
         self.config = MemoryConfig()
         self.memory_manager = MemoryManager()
         self.personalization_engine = PersonalizationEngine()
-        self.context_service = CompanionContextService()
-        print("✅ Companion Lifecycle Service initialized")
+        self.context_service = CompanionContextService(
+            memory_manager=self.memory_manager,
+            personalization_engine=self.personalization_engine
+        )
     
+    @_companion_lookup_scope()
     def archive_companion(self, user_id: str, companion_id: str, 
                          archive_options: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -73,34 +237,88 @@ class CompanionLifecycleService:
             
             # Save archive to dedicated collection
             archive_id = str(uuid.uuid4())
+            package = archive_package['package']
+            now_iso = datetime.now().isoformat()
             archive_record = {
                 'archive_id': archive_id,
                 'user_id': user_id,
                 'companion_id': companion_id,
                 'original_companion_data': companion_data,
-                'archive_package': archive_package['package'],
+                'archive_package_size': archive_package['size'],
+                'memories_count': package.get('memories', {}).get('total_memories', 0),
+                'conversations_count': package.get('conversations', {}).get('total_messages', 0),
                 'archive_options': archive_options,
-                'archived_at': datetime.now().isoformat(),
+                'archived_at': now_iso,
                 'archived_by': user_id,
                 'archive_reason': archive_options.get('reason', 'user_requested'),
                 'archive_version': '1.0'
             }
             
-            firestore_db.db.collection('archived_companions').document(archive_id).set(archive_record)
+            # Large packages live in blob storage; Firestore keeps only the pointer and
+            # counts. The upload runs while cleanup reads the memories it has to unassign
+            upload_future = None
+            if archive_package.get('payload') is not None:
+                upload_future = self._lifecycle_executor.submit(
+                    _upload_archive_package, user_id, archive_id, archive_package['payload']
+                )
+            
+            # Archive record, status change and cleanup are committed together
+            batch = firestore_db.db.batch()
             
             # Update companion status to archived
-            firestore_db.db.collection('companions').document(companion_id).update({
+            batch.update(companion_info['companion_ref'], {
                 'status': 'archived',
-                'archived_at': datetime.now().isoformat(),
+                'archived_at': firestore.SERVER_TIMESTAMP,
                 'archive_id': archive_id,
                 'archived_by': user_id
             })
             
-            # Clean up active data if not preserving
+            # Clean up active data if not preserving; memory updates that don't fit
+            # are committed only once the archive itself exists
+            spill_batches = []
             cleanup_result = self._cleanup_archived_companion_data(
-                user_id, companion_id, archive_options
+                user_id, companion_id, archive_options, batch=batch, spill_batches=spill_batches
             )
             
+            blob_uri = upload_future.result() if upload_future is not None else None
+            if blob_uri:
+                archive_record['archive_blob_uri'] = blob_uri
+            else:
+                archive_record['archive_package'] = package
+            batch.set(firestore_db.db.collection('archived_companions').document(archive_id), archive_record)
+            batch.set(firestore_db.archive_index(user_id), {
+                'entries': {archive_id: _archive_index_entry(archive_id, archive_record)}
+            }, merge=True)
+            
+            try:
+                batch.commit()
+            except Exception:
+                # Don't leave a package behind for an archive that was never recorded
+                if blob_uri:
+                    _archive_blob(blob_uri).delete()
+                raise
+            
+            # Spilled batches touch disjoint memories, so they commit side by side. The
+            # archive is recorded by now, so a spill that fails again on retry is
+            # reported in the cleanup result instead of failing the archive
+            spill_futures = [self._lifecycle_executor.submit(spill_batch.commit) for spill_batch in spill_batches]
+            failed_spills = 0
+            for spill_batch, spill_future in zip(spill_batches, spill_futures):
+                try:
+                    spill_future.result()
+                except Exception:
+                    try:
+                        spill_batch.commit()
+                    except Exception:
+                        logger.exception("Error unassigning memories of archived companion %s", companion_id)
+                        failed_spills += 1
+            if failed_spills:
+                cleanup_result['memories_error'] = (
+                    f"{failed_spills} of {len(spill_batches)} memory update batches failed"
+                )
+            _forget_companion(companion_id)
+            _archived_companions_cache.pop(user_id)
+            
             # Log archiving action
             self._log_companion_action(user_id, companion_id, 'archived', {
                 'archive_id': archive_id,
@@ -113,12 +331,12 @@ class CompanionLifecycleService:
                 'archive_id': archive_id,
                 'companion_name': companion_data.get('name'),
                 'archived_at': archive_record['archived_at'],
-                'archive_package_size': len(json.dumps(archive_package['package'])),
+                'archive_package_size': archive_record['archive_package_size'],
                 'cleanup_result': cleanup_result
             }
             
         except Exception as e:
-            print(f"Error archiving companion: {e}")
+            logger.exception("Error archiving companion")
             return {
                 'success': False,
                 'error': str(e)
@@ -168,6 +386,7 @@ class CompanionLifecycleService:
             
             # Generate new companion ID
             new_companion_id = str(uuid.uuid4())
+            now_iso = datetime.now().isoformat()
             
             # Restore companion data
             original_companion = archive_data['original_companion_data']
@@ -175,7 +394,7 @@ class CompanionLifecycleService:
                 **original_companion,
                 'id': new_companion_id,
                 'status': 'active',
-                'restored_at': datetime.now().isoformat(),
+                'restored_at': now_iso,
                 'restored_from_archive': archive_id,
                 'original_companion_id': archive_data['companion_id']
             }
@@ -184,21 +403,31 @@ class CompanionLifecycleService:
             if restore_options.get('new_companion_name'):
                 restored_companion['name'] = restore_options['new_companion_name']
             
-            # Create restored companion
-            firestore_db.db.collection('companions').document(new_companion_id).set(restored_companion)
+            # Companion record and archive bookkeeping commit together while the package restores
+            restore_update = {
+                'restored_at': now_iso,
+                'restored_companion_id': new_companion_id,
+                'restore_options': restore_options
+            }
+            batch = firestore_db.db.batch()
+            batch.set(firestore_db.db.collection('companions').document(new_companion_id), restored_companion)
+            batch.update(firestore_db.db.collection('archived_companions').document(archive_id), restore_update)
+            batch.set(firestore_db.archive_index(user_id), {
+                'entries': {archive_id: _archive_index_entry(archive_id, {**archive_data, **restore_update})}
+            }, merge=True)
+            
+            commit_future = self._lifecycle_executor.submit(batch.commit)
             
             # Restore data from archive package
-            archive_package = archive_data['archive_package']
+            if archive_data.get('archive_blob_uri'):
+                archive_package = _download_archive_package(archive_data['archive_blob_uri'])
+            else:
+                archive_package = archive_data['archive_package']
             restoration_result = self._restore_from_archive_package(
                 user_id, new_companion_id, archive_package, restore_options
             )
-            
-            # Update archive record
-            firestore_db.db.collection('archived_companions').document(archive_id).update({
-                'restored_at': datetime.now().isoformat(),
-                'restored_companion_id': new_companion_id,
-                'restore_options': restore_options
-            })
+            commit_future.result()
+            _archived_companions_cache.pop(user_id)
             
             # Log restoration action
             self._log_companion_action(user_id, new_companion_id, 'restored', {
@@ -217,12 +446,13 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error restoring companion: {e}")
+            logger.exception("Error restoring companion")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    @_companion_lookup_scope()
     def modify_companion(self, user_id: str, companion_id: str, 
                         modifications: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -259,41 +489,28 @@ class CompanionLifecycleService:
                     'error': validation_result['error']
                 }
             
+            now_iso = datetime.now().isoformat()
+            
             # Create backup before modification
             backup_result = self._create_modification_backup(user_id, companion_id)
             
             # Apply modifications
-            modification_results = {}
-            
-            # Basic property modifications
-            if 'basic_properties' in modifications:
-                basic_result = self._modify_basic_properties(
-                    user_id, companion_id, modifications['basic_properties']
-                )
-                modification_results['basic_properties'] = basic_result
-            
-            # Personality modifications
-            if 'personality' in modifications:
-                personality_result = self._modify_personality(
-                    user_id, companion_id, modifications['personality']
-                )
-                modification_results['personality'] = personality_result
-            
-            # Memory assignment modifications
-            if 'memory_assignment' in modifications:
-                memory_result = self._modify_memory_assignment(
-                    user_id, companion_id, modifications['memory_assignment']
-                )
-                modification_results['memory_assignment'] = memory_result
+            modification_results = {
+                mod_type: getattr(self, handler)(user_id, companion_id, modifications[mod_type])
+                for mod_type, handler in MODIFICATION_HANDLERS.items()
+                if mod_type in modifications
+            }
             
             # Update companion record
             update_data = {
-                'last_modified': datetime.now().isoformat(),
+                'last_modified': now_iso,
                 'modified_by': user_id,
-                'modification_count': companion_data.get('modification_count', 0) + 1
+                # Server-side increment so concurrent modifications are all counted
+                'modification_count': firestore.Increment(1)
             }
             
-            firestore_db.db.collection('companions').document(companion_id).update(update_data)
+            companion_info['companion_ref'].update(update_data)
+            _forget_companion(companion_id)
             
             # Log modification action
             self._log_companion_action(user_id, companion_id, 'modified', {
@@ -311,14 +528,16 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error modifying companion: {e}")
+            logger.exception("Error modifying companion")
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def get_companion_lifecycle_history(self, user_id: str, companion_id: str) -> Dict[str, Any]:
-        """Get complete lifecycle history for a companion"""
+    @_companion_lookup_scope()
+    def get_companion_lifecycle_history(self, user_id: str, companion_id: str,
+                                        limit: int = HISTORY_PAGE_SIZE) -> Dict[str, Any]:
+        """Get recent lifecycle history for a companion, with totals across all of it"""
         try:
             # Verify companion ownership
             companion_info = self._get_companion_info(user_id, companion_id)
@@ -328,11 +547,28 @@ class CompanionLifecycleService:
             # Get lifecycle logs
             logs_query = firestore_db.db.collection('companion_lifecycle_logs').where(
                 'user_id', '==', user_id
-            ).where('companion_id', '==', companion_id).order_by(
-                'timestamp', direction='DESCENDING'
+            ).where('companion_id', '==', companion_id)
+            
+            # Get modification backups
+            backups_query = firestore_db.db.collection('companion_modification_backups').where(
+                'companion_id', '==', companion_id
+            )
+            
+            # Pages and server-side counts are independent, so request all four together
+            executor = self._lifecycle_executor
+            logs_future = executor.submit(
+                lambda: list(logs_query.order_by('timestamp', direction='DESCENDING').limit(limit).stream())
             )
+            backups_future = executor.submit(
+                lambda: list(backups_query.order_by('created_at', direction='DESCENDING').select(
+                    ['created_at', 'backup_type', 'modifications_applied']
+                ).limit(limit).stream())
+            )
+            total_actions_future = executor.submit(firestore_db.count_documents, logs_query)
+            total_backups_future = executor.submit(firestore_db.count_documents, backups_query)
             
-            log_docs = list(logs_query.stream())
+            log_docs = logs_future.result()
+            backup_docs = backups_future.result()
             
             lifecycle_history = []
             for doc in log_docs:
@@ -344,13 +580,6 @@ class CompanionLifecycleService:
                     'user_id': log_data.get('user_id')
                 })
             
-            # Get modification backups
-            backups_query = firestore_db.db.collection('companion_modification_backups').where(
-                'companion_id', '==', companion_id
-            ).order_by('created_at', direction='DESCENDING')
-            
-            backup_docs = list(backups_query.stream())
-            
             modification_backups = []
             for doc in backup_docs:
                 backup_data = doc.to_dict()
@@ -366,12 +595,12 @@ class CompanionLifecycleService:
                 'companion_id': companion_id,
                 'lifecycle_history': lifecycle_history,
                 'modification_backups': modification_backups,
-                'total_actions': len(lifecycle_history),
-                'total_backups': len(modification_backups)
+                'total_actions': total_actions_future.result(),
+                'total_backups': total_backups_future.result()
             }
             
         except Exception as e:
-            print(f"Error getting lifecycle history: {e}")
+            logger.exception("Error getting lifecycle history")
             return {
                 'success': False,
                 'error': str(e)
@@ -380,36 +609,38 @@ class CompanionLifecycleService:
     def list_archived_companions(self, user_id: str) -> List[Dict[str, Any]]:
         """List all archived companions for a user"""
         try:
-            archives_query = firestore_db.db.collection('archived_companions').where(
-                'user_id', '==', user_id
-            ).order_by('archived_at', direction='DESCENDING')
-            
-            archive_docs = list(archives_query.stream())
-            
-            archived_companions = []
-            for doc in archive_docs:
-                archive_data = doc.to_dict()
-                original_companion = archive_data.get('original_companion_data', {})
-                
-                archived_companion = {
-                    'archive_id': doc.id,
-                    'companion_id': archive_data.get('companion_id'),
-                    'name': original_companion.get('name'),
-                    'personality': original_companion.get('personality'),
-                    'archived_at': archive_data.get('archived_at'),
-                    'archive_reason': archive_data.get('archive_reason'),
-                    'archive_options': archive_data.get('archive_options', {}),
-                    'restored_at': archive_data.get('restored_at'),
-                    'restored_companion_id': archive_data.get('restored_companion_id'),
-                    'archive_size': len(json.dumps(archive_data.get('archive_package', {})))
-                }
+            cached = _archived_companions_cache.get(user_id)
+            if cached is not None:
+                return [dict(archived_companion) for archived_companion in cached]
+            
+            # One read when the index is complete; older accounts are backfilled from the full query
+            index_doc = firestore_db.archive_index(user_id).get()
+            index_data = index_doc.to_dict() if index_doc.exists else {}
+            
+            if index_data.get('complete'):
+                archived_companions = sorted(
+                    index_data.get('entries', {}).values(),
+                    key=lambda entry: entry.get('archived_at') or '',
+                    reverse=True
+                )
+            else:
+                archives_query = firestore_db.db.collection('archived_companions').where(
+                    'user_id', '==', user_id
+                ).order_by('archived_at', direction='DESCENDING').select(ARCHIVE_LISTING_FIELDS)
                 
-                archived_companions.append(archived_companion)
+                archived_companions = [
+                    _archive_index_entry(doc.id, doc.to_dict()) for doc in archives_query.stream()
+                ]
+                firestore_db.archive_index(user_id).set({
+                    'entries': {entry['archive_id']: entry for entry in archived_companions},
+                    'complete': True
+                }, merge=True)
             
-            return archived_companions
+            _archived_companions_cache.set(user_id, archived_companions)
+            return [dict(archived_companion) for archived_companion in archived_companions]
             
         except Exception as e:
-            print(f"Error listing archived companions: {e}")
+            logger.exception("Error listing archived companions")
             return []
     
     def delete_archived_companion(self, user_id: str, archive_id: str) -> Dict[str, Any]:
@@ -448,6 +679,12 @@ class CompanionLifecycleService:
             
             # Delete the archive
             archive_doc.reference.delete()
+            firestore_db.archive_index(user_id).set({
+                'entries': {archive_id: firestore.DELETE_FIELD}
+            }, merge=True)
+            _archived_companions_cache.pop(user_id)
+            if archive_data.get('archive_blob_uri'):
+                _archive_blob(archive_data['archive_blob_uri']).delete()
             
             # Log deletion action
             self._log_companion_action(user_id, archive_data.get('companion_id'), 'archive_deleted', {
@@ -463,7 +700,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error deleting archived companion: {e}")
+            logger.exception("Error deleting archived companion")
             return {
                 'success': False,
                 'error': str(e)
@@ -472,23 +709,31 @@ class CompanionLifecycleService:
     def _get_companion_info(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Get companion information with ownership verification"""
         try:
-            companion_doc = firestore_db.db.collection('companions').document(companion_id).get()
-            
-            if not companion_doc.exists:
-                return {'success': False, 'error': 'Companion not found'}
-            
-            companion_data = companion_doc.to_dict()
+            lookups = _companion_lookups.get()
+            cached = lookups.get(companion_id) if lookups is not None else None
+            if cached is None:
+                companion_doc = firestore_db.db.collection('companions').document(companion_id).get()
+                
+                if not companion_doc.exists:
+                    return {'success': False, 'error': 'Companion not found'}
+                
+                cached = (companion_doc.reference, companion_doc.to_dict())
+                if lookups is not None:
+                    lookups[companion_id] = cached
             
+            companion_ref, companion_data = cached
             if companion_data.get('user_id') != user_id:
                 return {'success': False, 'error': 'Access denied'}
             
+            # Callers write through companion_ref rather than rebuilding the path
             return {
                 'success': True,
-                'companion': companion_data
+                'companion': dict(companion_data),
+                'companion_ref': companion_ref
             }
             
         except Exception as e:
-            print(f"Error getting companion info: {e}")
+            logger.exception("Error getting companion info")
             return {'success': False, 'error': str(e)}
     
     def _create_archive_package(self, user_id: str, companion_id: str, 
@@ -502,33 +747,33 @@ class CompanionLifecycleService:
                 'archive_version': '1.0'
             }
             
-            # Archive memories if requested
-            if archive_options.get('preserve_memories', True):
-                memories_result = self._archive_companion_memories(user_id, companion_id)
-                archive_package['memories'] = memories_result
-            
-            # Archive conversations if requested
-            if archive_options.get('preserve_conversations', True):
-                conversations_result = self._archive_companion_conversations(user_id, companion_id)
-                archive_package['conversations'] = conversations_result
-            
-            # Archive personality if requested
-            if archive_options.get('preserve_personality', True):
-                personality_result = self._archive_companion_personality(user_id, companion_id)
-                archive_package['personality'] = personality_result
+            # Memories, conversations, personality and context are independent reads
+            parts = {
+                'memories': ('preserve_memories', self._archive_companion_memories),
+                'conversations': ('preserve_conversations', self._archive_companion_conversations),
+                'personality': ('preserve_personality', self._archive_companion_personality),
+                'context': ('preserve_context', self._archive_companion_context)
+            }
+            futures = {
+                key: self._lifecycle_executor.submit(archive_part, user_id, companion_id)
+                for key, (option, archive_part) in parts.items()
+                if archive_options.get(option, True)
+            }
             
-            # Archive context if requested
-            if archive_options.get('preserve_context', True):
-                context_result = self._archive_companion_context(user_id, companion_id)
-                archive_package['context'] = context_result
+            for key, future in futures.items():
+                archive_package[key] = future.result()
             
+            # Serialized once here; the bytes are uploaded as-is and their length stored
+            payload = _dumps(archive_package)
             return {
                 'success': True,
-                'package': archive_package
+                'package': archive_package,
+                'payload': payload,
+                'size': len(payload)
             }
             
         except Exception as e:
-            print(f"Error creating archive package: {e}")
+            logger.exception("Error creating archive package")
             return {
                 'success': False,
                 'error': str(e)
@@ -560,19 +805,18 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error archiving memories: {e}")
+            logger.exception("Error archiving memories")
             return {'error': str(e)}
     
     def _archive_companion_conversations(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Archive conversations for a companion"""
         try:
-            messages_query = firestore_db.db.collection('messages').where(
+            messages_query = firestore_db.companion_messages(companion_id).where(
                 'user_id', '==', user_id
-            ).where('prabh_id', '==', companion_id)
-            message_docs = list(messages_query.stream())
+            ).select(['user_message', 'ai_response', 'timestamp', 'metadata'])
             
             archived_conversations = []
-            for doc in message_docs:
+            for doc in messages_query.stream():
                 message_data = doc.to_dict()
                 archived_conversations.append({
                     'id': doc.id,
@@ -589,7 +833,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error archiving conversations: {e}")
+            logger.exception("Error archiving conversations")
             return {'error': str(e)}
     
     def _archive_companion_personality(self, user_id: str, companion_id: str) -> Dict[str, Any]:
@@ -613,15 +857,13 @@ class CompanionLifecycleService:
                 return {'message': 'No personality profile found'}
                 
         except Exception as e:
-            print(f"Error archiving personality: {e}")
+            logger.exception("Error archiving personality")
             return {'error': str(e)}
     
     def _archive_companion_context(self, user_id: str, companion_id: str) -> Dict[str, Any]:
         """Archive context data for a companion"""
         try:
-            context_doc = firestore_db.db.collection('companion_contexts').document(
-                f"{user_id}_{companion_id}"
-            ).get()
+            context_doc = firestore_db.get_companion_context(user_id, companion_id)
             
             if context_doc.exists:
                 context_data = context_doc.to_dict()
@@ -633,46 +875,72 @@ class CompanionLifecycleService:
                 return {'message': 'No context data found'}
                 
         except Exception as e:
-            print(f"Error archiving context: {e}")
+            logger.exception("Error archiving context")
             return {'error': str(e)}
     
     def _cleanup_archived_companion_data(self, user_id: str, companion_id: str, 
-                                        archive_options: Dict[str, Any]) -> Dict[str, Any]:
-        """Clean up active data for archived companion based on options"""
+                                        archive_options: Dict[str, Any], batch=None,
+                                        spill_batches: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Clean up active data for archived companion based on options
+        
+        Writes are queued on batch when given and the caller commits it. Memory
+        updates beyond BATCH_WRITE_LIMIT go into further batches, which are
+        appended to spill_batches for the caller to commit after its own batch
+        succeeds, or committed here when no list is given.
+        """
         try:
             cleanup_results = {}
+            write_batch = batch if batch is not None else firestore_db.db.batch()
+            
+            def finish(full_batch):
+                if full_batch is batch:
+                    return
+                if spill_batches is not None:
+                    spill_batches.append(full_batch)
+                else:
+                    full_batch.commit()
+            
+            # Clean up context if not preserving
+            # Deletes of missing documents are no-ops, so clear both the current and
+            # legacy locations without reading either first
+            if not archive_options.get('keep_context_active', False):
+                write_batch.delete(firestore_db.companion_contexts(user_id).document(companion_id))
+                write_batch.delete(
+                    firestore_db.db.collection('companion_contexts').document(f"{user_id}_{companion_id}")
+                )
+                cleanup_results['context'] = "Context data removed"
             
             # Clean up memories if not preserving in active state
             if not archive_options.get('keep_memories_active', False):
                 memories_query = firestore_db.db.collection('memories').where(
                     'assigned_companion_id', '==', companion_id
                 )
-                memory_docs = list(memories_query.stream())
+                archived_at = datetime.now().isoformat()
                 
-                batch = firestore_db.db.batch()
-                for doc in memory_docs:
-                    batch.update(doc.reference, {
+                unassigned = 0
+                queued = 0
+                for doc in memories_query.stream():
+                    if queued == BATCH_WRITE_LIMIT:
+                        finish(write_batch)
+                        write_batch = firestore_db.db.batch()
+                        queued = 0
+                    
+                    write_batch.update(doc.reference, {
                         'assigned_companion_id': None,
                         'archived_from_companion': companion_id,
-                        'archived_at': datetime.now().isoformat()
+                        'archived_at': archived_at
                     })
-                batch.commit()
+                    queued += 1
+                    unassigned += 1
                 
-                cleanup_results['memories'] = f"Unassigned {len(memory_docs)} memories"
+                cleanup_results['memories'] = f"Unassigned {unassigned} memories"
             
-            # Clean up context if not preserving
-            if not archive_options.get('keep_context_active', False):
-                context_doc = firestore_db.db.collection('companion_contexts').document(
-                    f"{user_id}_{companion_id}"
-                )
-                if context_doc.get().exists:
-                    context_doc.delete()
-                    cleanup_results['context'] = "Context data removed"
+            finish(write_batch)
             
             return cleanup_results
             
         except Exception as e:
-            print(f"Error cleaning up archived companion data: {e}")
+            logger.exception("Error cleaning up archived companion data")
             return {'error': str(e)}
     
     def _restore_from_archive_package(self, user_id: str, new_companion_id: str, 
@@ -682,38 +950,26 @@ class CompanionLifecycleService:
         try:
             restoration_results = {}
             
-            # Restore memories if requested
-            if restore_options.get('restore_memories', True) and 'memories' in archive_package:
-                memories_result = self._restore_memories(
-                    user_id, new_companion_id, archive_package['memories']
-                )
-                restoration_results['memories'] = memories_result
-            
-            # Restore conversations if requested
-            if restore_options.get('restore_conversations', True) and 'conversations' in archive_package:
-                conversations_result = self._restore_conversations(
-                    user_id, new_companion_id, archive_package['conversations']
-                )
-                restoration_results['conversations'] = conversations_result
-            
-            # Restore personality if requested
-            if restore_options.get('restore_personality', True) and 'personality' in archive_package:
-                personality_result = self._restore_personality(
-                    user_id, new_companion_id, archive_package['personality']
-                )
-                restoration_results['personality'] = personality_result
+            # Each archived part restores into its own documents, so write them together
+            parts = {
+                'memories': ('restore_memories', self._restore_memories),
+                'conversations': ('restore_conversations', self._restore_conversations),
+                'personality': ('restore_personality', self._restore_personality),
+                'context': ('restore_context', self._restore_context)
+            }
+            futures = {
+                key: self._lifecycle_executor.submit(restore_part, user_id, new_companion_id, archive_package[key])
+                for key, (option, restore_part) in parts.items()
+                if restore_options.get(option, True) and key in archive_package
+            }
             
-            # Restore context if requested
-            if restore_options.get('restore_context', True) and 'context' in archive_package:
-                context_result = self._restore_context(
-                    user_id, new_companion_id, archive_package['context']
-                )
-                restoration_results['context'] = context_result
+            for key, future in futures.items():
+                restoration_results[key] = future.result()
             
             return restoration_results
             
         except Exception as e:
-            print(f"Error restoring from archive package: {e}")
+            logger.exception("Error restoring from archive package")
             return {'error': str(e)}
     
     def _restore_memories(self, user_id: str, companion_id: str, memories_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -723,6 +979,7 @@ class CompanionLifecycleService:
                 return {'message': 'No memories to restore'}
             
             restored_count = 0
+            restored_at = datetime.now().isoformat()
             batch = firestore_db.db.batch()
             
             for memory in memories_data['memories']:
@@ -734,7 +991,7 @@ class CompanionLifecycleService:
                     'id': new_memory_id,
                     'user_id': user_id,
                     'assigned_companion_id': companion_id,
-                    'restored_at': datetime.now().isoformat(),
+                    'restored_at': restored_at,
                     'restored_from_archive': True
                 }
                 
@@ -749,7 +1006,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error restoring memories: {e}")
+            logger.exception("Error restoring memories")
             return {'error': str(e)}
     
     def _restore_conversations(self, user_id: str, companion_id: str, conversations_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -759,18 +1016,20 @@ class CompanionLifecycleService:
                 return {'message': 'No conversations to restore'}
             
             restored_count = 0
+            restored_at = datetime.now().isoformat()
             batch = firestore_db.db.batch()
             
             for conversation in conversations_data['conversations']:
                 new_message_id = str(uuid.uuid4())
-                message_doc_ref = firestore_db.db.collection('messages').document(new_message_id)
+                message_doc_ref = firestore_db.companion_messages(companion_id).document(new_message_id)
                 
                 restored_message = {
                     **conversation,
+                    'timestamp': _parse_archived_timestamp(conversation.get('timestamp')),
                     'id': new_message_id,
                     'user_id': user_id,
                     'prabh_id': companion_id,
-                    'restored_at': datetime.now().isoformat(),
+                    'restored_at': restored_at,
                     'restored_from_archive': True
                 }
                 
@@ -785,7 +1044,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error restoring conversations: {e}")
+            logger.exception("Error restoring conversations")
             return {'error': str(e)}
     
     def _restore_personality(self, user_id: str, companion_id: str, personality_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -811,7 +1070,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error restoring personality: {e}")
+            logger.exception("Error restoring personality")
             return {'error': str(e)}
     
     def _restore_context(self, user_id: str, companion_id: str, context_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -828,9 +1087,7 @@ class CompanionLifecycleService:
                 'restored_from_archive': True
             }
             
-            firestore_db.db.collection('companion_contexts').document(
-                f"{user_id}_{companion_id}"
-            ).set(restored_context)
+            firestore_db.companion_contexts(user_id).document(companion_id).set(restored_context)
             
             return {
                 'restored_context': True,
@@ -838,30 +1095,32 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error restoring context: {e}")
+            logger.exception("Error restoring context")
             return {'error': str(e)}
     
     def _validate_modifications(self, modifications: Dict[str, Any]) -> Dict[str, Any]:
         """Validate companion modifications"""
         try:
-            valid_modification_types = ['basic_properties', 'personality', 'memory_assignment']
-            
-            for mod_type in modifications.keys():
-                if mod_type not in valid_modification_types:
+            for mod_type, changes in modifications.items():
+                if mod_type not in MODIFICATION_HANDLERS:
                     return {
                         'valid': False,
                         'error': f'Invalid modification type: {mod_type}'
                     }
-            
-            # Validate basic properties
-            if 'basic_properties' in modifications:
-                basic_props = modifications['basic_properties']
-                if 'name' in basic_props and len(basic_props['name']) > 100:
+                if not isinstance(changes, dict):
                     return {
                         'valid': False,
-                        'error': 'Companion name too long (max 100 characters)'
+                        'error': f'Modification {mod_type} must be an object'
                     }
             
+            # Validate basic properties
+            name = modifications.get('basic_properties', {}).get('name')
+            if name is not None and len(name) > MAX_COMPANION_NAME_LENGTH:
+                return {
+                    'valid': False,
+                    'error': f'Companion name too long (max {MAX_COMPANION_NAME_LENGTH} characters)'
+                }
+            
             return {'valid': True}
             
         except Exception as e:
@@ -874,8 +1133,7 @@ class CompanionLifecycleService:
         """Create backup before modifying companion"""
         try:
             # Get current companion state
-            companion_doc = firestore_db.db.collection('companions').document(companion_id).get()
-            companion_data = companion_doc.to_dict()
+            companion_data = self._get_companion_info(user_id, companion_id).get('companion')
             
             # Create backup record
             backup_id = str(uuid.uuid4())
@@ -896,7 +1154,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error creating modification backup: {e}")
+            logger.exception("Error creating modification backup")
             return {
                 'success': False,
                 'error': str(e)
@@ -921,6 +1179,7 @@ class CompanionLifecycleService:
             
             if update_data:
                 firestore_db.db.collection('companions').document(companion_id).update(update_data)
+                _forget_companion(companion_id)
             
             return {
                 'success': True,
@@ -929,7 +1188,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error modifying basic properties: {e}")
+            logger.exception("Error modifying basic properties")
             return {
                 'success': False,
                 'error': str(e)
@@ -950,7 +1209,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error modifying personality: {e}")
+            logger.exception("Error modifying personality")
             return {
                 'success': False,
                 'error': str(e)
@@ -968,7 +1227,7 @@ class CompanionLifecycleService:
             }
             
         except Exception as e:
-            print(f"Error modifying memory assignment: {e}")
+            logger.exception("Error modifying memory assignment")
             return {
                 'success': False,
                 'error': str(e)
@@ -988,4 +1247,4 @@ class CompanionLifecycleService:
             firestore_db.db.collection('companion_lifecycle_logs').add(log_entry)
             
         except Exception as e:
-            print(f"Error logging companion action: {e}")
\ No newline at end of file
+            logger.exception("Error logging companion action")
\ No newline at end of file
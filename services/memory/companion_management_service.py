@@ -489,7 +489,7 @@ class CompanionManagementService:
         """Check if companion's conversations are properly isolated"""
         try:
             # Get conversations for this companion
-            conversations_query = firestore_db.db.collection('messages').where('prabh_id', '==', companion_id)
+            conversations_query = firestore_db.companion_messages(companion_id)
             conversation_docs = list(conversations_query.stream())
             
             # Check if conversations are properly isolated (no cross-companion references)
@@ -4,6 +4,7 @@ Handles conversation context, memory retrieval, and context window optimization
 """
 
 from typing import Dict, List, Any, Optional, Tuple
+from collections import Counter
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 import json
@@ -531,7 +532,6 @@ class ContextWindowService:
         key_words = [word for word in words if word not in stop_words]
         
         # Return most frequent words
-        from collections import Counter
         word_counts = Counter(key_words)
         return [word for word, count in word_counts.most_common(5)]
     
@@ -5,6 +5,7 @@ Handles complete memory and model data export for user ownership
 
 import os
 import json
+import base64
 import zipfile
 import tempfile
 import shutil
@@ -18,6 +19,27 @@ from .personalization_engine import PersonalizationEngine
 from .lora_adapter_service import LoRAAdapterService
 from services.firestore_db import firestore_db
 from config.memory_config import MemoryConfig
+from utils.cache_utils import TTLCache
+
+# Per-user data overviews change slowly; cache them briefly and invalidate on writes
+_data_overview_cache = TTLCache(maxsize=4096, ttl=120)
+
+def invalidate_data_overview_cache(user_id: str) -> None:
+    """Drop the cached data overview for a user after their data changes"""
+    _data_overview_cache.pop(user_id)
+
+def _encode_history_cursor(audit_timestamp: str, doc_id: str) -> str:
+    """Opaque page cursor for the last audit entry returned"""
+    payload = json.dumps([audit_timestamp, doc_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    """(audit_timestamp, doc_id) from a cursor made by _encode_history_cursor"""
+    try:
+        audit_timestamp, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    return audit_timestamp, doc_id
 
 class DataExportService:
     """Service for exporting user data in portable formats"""
@@ -183,9 +205,10 @@ class DataExportService:
             conversations = []
             
             # Query conversations from Firestore
-            query = firestore_db.db.collection('messages').where('user_id', '==', user_id)
             if companion_id:
-                query = query.where('prabh_id', '==', companion_id)
+                query = firestore_db.companion_messages(companion_id).where('user_id', '==', user_id)
+            else:
+                query = firestore_db.all_messages().where('user_id', '==', user_id)
             
             docs = query.order_by('timestamp').stream()
             
@@ -210,6 +233,10 @@ class DataExportService:
     
     def get_data_overview(self, user_id: str) -> Dict[str, Any]:
         """Get overview of user's data for privacy controls"""
+        cached_overview = _data_overview_cache.get(user_id)
+        if cached_overview is not None:
+            return dict(cached_overview)
+        
         try:
             # Count memories
             memories_query = firestore_db.db.collection('memories').where('user_id', '==', user_id)
@@ -220,19 +247,21 @@ class DataExportService:
             companions_count = len(list(companions_query.stream()))
             
             # Get user info
-            user_doc = firestore_db.db.collection('users').document(user_id).get()
-            user_data = user_doc.to_dict() if user_doc.exists else {}
+            user_data = firestore_db.get_user_by_id(user_id) or {}
             
             # Estimate data size (rough calculation)
             estimated_size = (memories_count * 1024) + (companions_count * 512)  # bytes
             
-            return {
+            overview = {
                 'total_memories': memories_count,
                 'total_companions': companions_count,
                 'total_size': estimated_size,
                 'member_since': user_data.get('created_at', 'Unknown')
             }
             
+            _data_overview_cache.set(user_id, overview)
+            return dict(overview)
+            
         except Exception as e:
             print(f"Error getting data overview: {e}")
             return {
@@ -303,12 +332,10 @@ class DataExportService:
     def _export_user_profile(self, user_id: str) -> Dict[str, Any]:
         """Export user profile data"""
         try:
-            user_doc = firestore_db.db.collection('users').document(user_id).get()
-            if not user_doc.exists:
+            user_data = firestore_db.get_user_by_id(user_id)
+            if not user_data:
                 return {}
             
-            user_data = user_doc.to_dict()
-            
             # Export safe profile data only
             return {
                 'user_id': user_id,
@@ -391,6 +418,7 @@ class DataExportService:
             if count % 500 != 0:
                 batch.commit()
             
+            invalidate_data_overview_cache(user_id)
             print(f"Deleted {count} memories for user {user_id}")
             return True
             
@@ -452,6 +480,7 @@ class DataExportService:
             
             # Log deletion for audit purposes
             self._log_deletion_audit(deletion_log)
+            invalidate_data_overview_cache(user_id)
             
             return {
                 'success': True,
@@ -471,26 +500,18 @@ class DataExportService:
         """Securely delete all memories for a user"""
         try:
             memories_query = firestore_db.db.collection('memories').where('user_id', '==', user_id)
-            docs = list(memories_query.stream())
             
-            batch = firestore_db.db.batch()
             deleted_count = 0
             memory_ids = []
             
-            for doc in docs:
-                memory_data = doc.to_dict()
-                memory_ids.append(doc.id)
-                batch.delete(doc.reference)
-                deleted_count += 1
-                
-                # Commit in batches of 500
-                if deleted_count % 500 == 0:
-                    batch.commit()
-                    batch = firestore_db.db.batch()
-            
-            # Commit remaining
-            if deleted_count % 500 != 0:
+            # Delete page by page, one batch of up to 500 per page
+            for docs in firestore_db.iter_pages(memories_query):
+                batch = firestore_db.db.batch()
+                for doc in docs:
+                    memory_ids.append(doc.id)
+                    batch.delete(doc.reference)
                 batch.commit()
+                deleted_count += len(docs)
             
             return {
                 'deleted_count': deleted_count,
@@ -527,23 +548,17 @@ class DataExportService:
         """Securely delete all companions for a user"""
         try:
             companions_query = firestore_db.db.collection('companions').where('user_id', '==', user_id)
-            docs = list(companions_query.stream())
             
-            batch = firestore_db.db.batch()
             deleted_count = 0
             companion_ids = []
             
-            for doc in docs:
-                companion_ids.append(doc.id)
-                batch.delete(doc.reference)
-                deleted_count += 1
-                
-                if deleted_count % 500 == 0:
-                    batch.commit()
-                    batch = firestore_db.db.batch()
-            
-            if deleted_count % 500 != 0:
+            for docs in firestore_db.iter_pages(companions_query):
+                batch = firestore_db.db.batch()
+                for doc in docs:
+                    companion_ids.append(doc.id)
+                    batch.delete(doc.reference)
                 batch.commit()
+                deleted_count += len(docs)
             
             return {
                 'deleted_count': deleted_count,
@@ -561,24 +576,20 @@ class DataExportService:
     def _secure_delete_conversations(self, user_id: str) -> Dict[str, Any]:
         """Securely delete all conversations for a user"""
         try:
-            messages_query = firestore_db.db.collection('messages').where('user_id', '==', user_id)
-            docs = list(messages_query.stream())
+            messages_query = firestore_db.all_messages().where('user_id', '==', user_id)
             
-            batch = firestore_db.db.batch()
             deleted_count = 0
             message_ids = []
             
-            for doc in docs:
-                message_ids.append(doc.id)
-                batch.delete(doc.reference)
-                deleted_count += 1
-                
-                if deleted_count % 500 == 0:
-                    batch.commit()
-                    batch = firestore_db.db.batch()
-            
-            if deleted_count % 500 != 0:
+            for docs in firestore_db.iter_pages(messages_query):
+                batch = firestore_db.db.batch()
+                for doc in docs:
+                    message_ids.append(doc.id)
+                    batch.delete(doc.reference)
                 batch.commit()
+                deleted_count += len(docs)
+            
+            firestore_db.record_deletions('messages', deleted_count)
             
             return {
                 'deleted_count': deleted_count,
@@ -604,29 +615,29 @@ class DataExportService:
                 'privacy_settings',
                 'subscriptions',
                 'personality_profiles',
-                'lora_adapters'
+                'lora_adapters',
+                'companion_contexts'
             ]
             
             deletion_results = {}
             
             for collection_name in collections_to_delete:
                 try:
-                    query = firestore_db.db.collection(collection_name).where('user_id', '==', user_id)
-                    docs = list(query.stream())
+                    if collection_name == 'messages':
+                        collection = firestore_db.all_messages()
+                    elif collection_name == 'companion_contexts':
+                        collection = firestore_db.companion_contexts(user_id)
+                    else:
+                        collection = firestore_db.db.collection(collection_name)
+                    query = collection.where('user_id', '==', user_id)
                     
-                    batch = firestore_db.db.batch()
                     count = 0
-                    
-                    for doc in docs:
-                        batch.delete(doc.reference)
-                        count += 1
-                        
-                        if count % 500 == 0:
-                            batch.commit()
-                            batch = firestore_db.db.batch()
-                    
-                    if count % 500 != 0:
+                    for docs in firestore_db.iter_pages(query):
+                        batch = firestore_db.db.batch()
+                        for doc in docs:
+                            batch.delete(doc.reference)
                         batch.commit()
+                        count += len(docs)
                     
                     deletion_results[collection_name] = {
                         'deleted_count': count,
@@ -643,6 +654,8 @@ class DataExportService:
             # Delete user document itself
             try:
                 firestore_db.db.collection('users').document(user_id).delete()
+                firestore_db.invalidate_user(user_id)
+                firestore_db.record_deletions('users', 1)
                 deletion_results['user_document'] = {'status': 'success'}
             except Exception as e:
                 deletion_results['user_document'] = {
@@ -669,7 +682,7 @@ class DataExportService:
             if deletion_type in ['complete', 'memories']:
                 # Verify memories deletion
                 memories_query = firestore_db.db.collection('memories').where('user_id', '==', user_id)
-                remaining_memories = len(list(memories_query.stream()))
+                remaining_memories = firestore_db.count_documents(memories_query) if firestore_db.exists(memories_query) else 0
                 verification_results['memories'] = {
                     'remaining_count': remaining_memories,
                     'verified': remaining_memories == 0
@@ -678,15 +691,15 @@ class DataExportService:
             if deletion_type in ['complete', 'companions']:
                 # Verify companions deletion
                 companions_query = firestore_db.db.collection('companions').where('user_id', '==', user_id)
-                remaining_companions = len(list(companions_query.stream()))
+                remaining_companions = firestore_db.count_documents(companions_query) if firestore_db.exists(companions_query) else 0
                 verification_results['companions'] = {
                     'remaining_count': remaining_companions,
                     'verified': remaining_companions == 0
                 }
                 
                 # Verify conversations deletion
-                messages_query = firestore_db.db.collection('messages').where('user_id', '==', user_id)
-                remaining_messages = len(list(messages_query.stream()))
+                messages_query = firestore_db.all_messages().where('user_id', '==', user_id)
+                remaining_messages = firestore_db.count_documents(messages_query) if firestore_db.exists(messages_query) else 0
                 verification_results['conversations'] = {
                     'remaining_count': remaining_messages,
                     'verified': remaining_messages == 0
@@ -735,23 +748,45 @@ class DataExportService:
         except Exception as e:
             print(f"Error logging deletion audit: {e}")
     
-    def get_deletion_history(self, user_id: str) -> List[Dict[str, Any]]:
-        """Get deletion history for a user (for admin purposes)"""
+    def get_deletion_history(self, user_id: str, limit: int = 50,
+                             cursor: str = None) -> Dict[str, Any]:
+        """Get one page of deletion history for a user (for admin purposes)"""
         try:
-            audit_query = firestore_db.db.collection('deletion_audit_logs').where('user_id', '==', user_id)
-            docs = audit_query.order_by('audit_timestamp', direction='DESCENDING').stream()
-            
-            deletion_history = []
-            for doc in docs:
-                audit_data = doc.to_dict()
-                deletion_history.append(audit_data)
+            # Served by the (user_id, audit_timestamp DESC) composite index, whose implicit
+            # __name__ DESC tiebreak keeps entries with equal timestamps in a stable order
+            audit_collection = firestore_db.db.collection('deletion_audit_logs')
+            audit_query = (audit_collection
+                           .where('user_id', '==', user_id)
+                           .order_by('audit_timestamp', direction='DESCENDING')
+                           .order_by('__name__', direction='DESCENDING'))
+            if cursor:
+                try:
+                    audit_timestamp, doc_id = _decode_history_cursor(cursor)
+                except ValueError:
+                    return {'deletion_history': [], 'next_cursor': None, 'error': 'Invalid cursor'}
+                audit_query = audit_query.start_after({
+                    'audit_timestamp': audit_timestamp,
+                    '__name__': audit_collection.document(doc_id)
+                })
+            
+            # Fetch one extra entry to know whether another page exists
+            docs = list(audit_query.limit(limit + 1).stream())
+            
+            next_cursor = None
+            if len(docs) > limit:
+                docs = docs[:limit]
+                last = docs[-1]
+                next_cursor = _encode_history_cursor(last.get('audit_timestamp'), last.id)
             
-            return deletion_history
+            return {
+                'deletion_history': [doc.to_dict() for doc in docs],
+                'next_cursor': next_cursor
+            }
             
         except Exception as e:
             print(f"Error getting deletion history: {e}")
-            return []   
- 
+            return {'deletion_history': [], 'next_cursor': None}
+    
     def _save_as_json(self, export_package: Dict[str, Any], temp_dir: str, 
                      user_id: str, companion_id: str = None) -> str:
         """Save export package as JSON file"""
@@ -4,14 +4,20 @@ Handles text embedding generation for memory storage and retrieval
 """
 
 import os
+import re
+import time
 import numpy as np
 from typing import List, Dict, Any, Optional, Union
+from collections import Counter
 import hashlib
 import pickle
 from datetime import datetime
 
 from config.memory_config import MemoryConfig
 
+# Word tokenizer for the bag-of-words fallback embedding
+_WORD_RE = re.compile(r'\w+')
+
 class EmbeddingService:
     """Service for generating text embeddings"""
     
@@ -274,11 +280,8 @@ class EmbeddingService:
     def _generate_simple_embedding(self, text: str) -> np.ndarray:
         """Generate simple embedding (fallback method)"""
         try:
-            from collections import Counter
-            import re
-            
             # Simple bag-of-words embedding
-            words = re.findall(r'\w+', text.lower())
+            words = _WORD_RE.findall(text.lower())
             word_counts = Counter(words)
             
             # Create embedding vector
@@ -395,8 +398,6 @@ class EmbeddingService:
     
     def benchmark_performance(self, test_texts: List[str] = None) -> Dict[str, Any]:
         """Benchmark embedding generation performance"""
-        import time
-        
         if test_texts is None:
             test_texts = [
                 "This is a short test sentence.",
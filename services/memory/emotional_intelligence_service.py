@@ -4,6 +4,7 @@ Handles emotion detection, emotional memory prioritization, and empathetic respo
 """
 
 import re
+import random
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
@@ -12,6 +13,55 @@ import json
 
 from config.memory_config import MemoryConfig
 
+# Crisis support resources are static; built once and shared by every lookup
+CRISIS_SUPPORT_RESOURCES = {
+    'suicide': {
+        'hotlines': [
+            {'name': 'National Suicide Prevention Lifeline', 'number': '988', 'available': '24/7'},
+            {'name': 'Crisis Text Line', 'number': 'Text HOME to 741741', 'available': '24/7'}
+        ],
+        'message': 'Your life has value and meaning. Please reach out to a mental health professional or crisis hotline immediately.',
+        'immediate_action': 'Contact emergency services (911) if you are in immediate danger.'
+    },
+    'self_harm': {
+        'hotlines': [
+            {'name': 'Self-Injury Outreach & Support', 'website': 'sioutreach.org'},
+            {'name': 'Crisis Text Line', 'number': 'Text HOME to 741741', 'available': '24/7'}
+        ],
+        'message': 'You deserve care and support. Please consider reaching out to a mental health professional.',
+        'immediate_action': 'If you are in immediate danger, please contact emergency services.'
+    },
+    'severe_depression': {
+        'hotlines': [
+            {'name': 'National Suicide Prevention Lifeline', 'number': '988', 'available': '24/7'},
+            {'name': 'SAMHSA National Helpline', 'number': '1-800-662-4357', 'available': '24/7'}
+        ],
+        'message': 'Depression is treatable, and you don\'t have to go through this alone.',
+        'immediate_action': 'Consider contacting a mental health professional or your doctor.'
+    },
+    'panic': {
+        'resources': [
+            {'name': 'Anxiety and Depression Association of America', 'website': 'adaa.org'},
+            {'name': 'Crisis Text Line', 'number': 'Text HOME to 741741', 'available': '24/7'}
+        ],
+        'message': 'Panic attacks are treatable. Focus on your breathing and remember that this will pass.',
+        'immediate_action': 'Try deep breathing exercises and consider contacting a healthcare provider.'
+    },
+    'abuse': {
+        'hotlines': [
+            {'name': 'National Domestic Violence Hotline', 'number': '1-800-799-7233', 'available': '24/7'},
+            {'name': 'National Sexual Assault Hotline', 'number': '1-800-656-4673', 'available': '24/7'}
+        ],
+        'message': 'You deserve to be safe. Abuse is never your fault.',
+        'immediate_action': 'If you are in immediate danger, call 911. Consider reaching out to local authorities or support services.'
+    }
+}
+
+DEFAULT_CRISIS_SUPPORT_RESOURCE = {
+    'message': 'Please consider reaching out to a mental health professional or crisis support service.',
+    'immediate_action': 'If you are in immediate danger, contact emergency services (911).'
+}
+
 class EmotionalIntelligenceService:
     """Service for emotional intelligence and context awareness"""
     
@@ -395,7 +445,6 @@ class EmotionalIntelligenceService:
             response_templates = self.support_responses.get(dominant_emotion, [])
             
             if response_templates:
-                import random
                 base_response = random.choice(response_templates)
                 
                 # Adjust response based on intensity
@@ -853,53 +902,11 @@ class EmotionalIntelligenceService:
     
     def get_crisis_support_resources(self, crisis_type: str) -> Dict[str, Any]:
         """Get appropriate crisis support resources"""
-        resources = {
-            'suicide': {
-                'hotlines': [
-                    {'name': 'National Suicide Prevention Lifeline', 'number': '988', 'available': '24/7'},
-                    {'name': 'Crisis Text Line', 'number': 'Text HOME to 741741', 'available': '24/7'}
-                ],
-                'message': 'Your life has value and meaning. Please reach out to a mental health professional or crisis hotline immediately.',
-                'immediate_action': 'Contact emergency services (911) if you are in immediate danger.'
-            },
-            'self_harm': {
-                'hotlines': [
-                    {'name': 'Self-Injury Outreach & Support', 'website': 'sioutreach.org'},
-                    {'name': 'Crisis Text Line', 'number': 'Text HOME to 741741', 'available': '24/7'}
-                ],
-                'message': 'You deserve care and support. Please consider reaching out to a mental health professional.',
-                'immediate_action': 'If you are in immediate danger, please contact emergency services.'
-            },
-            'severe_depression': {
-                'hotlines': [
-                    {'name': 'National Suicide Prevention Lifeline', 'number': '988', 'available': '24/7'},
-                    {'name': 'SAMHSA National Helpline', 'number': '1-800-662-4357', 'available': '24/7'}
-                ],
-                'message': 'Depression is treatable, and you don\'t have to go through this alone.',
-                'immediate_action': 'Consider contacting a mental health professional or your doctor.'
-            },
-            'panic': {
-                'resources': [
-                    {'name': 'Anxiety and Depression Association of America', 'website': 'adaa.org'},
-                    {'name': 'Crisis Text Line', 'number': 'Text HOME to 741741', 'available': '24/7'}
-                ],
-                'message': 'Panic attacks are treatable. Focus on your breathing and remember that this will pass.',
-                'immediate_action': 'Try deep breathing exercises and consider contacting a healthcare provider.'
-            },
-            'abuse': {
-                'hotlines': [
-                    {'name': 'National Domestic Violence Hotline', 'number': '1-800-799-7233', 'available': '24/7'},
-                    {'name': 'National Sexual Assault Hotline', 'number': '1-800-656-4673', 'available': '24/7'}
-                ],
-                'message': 'You deserve to be safe. Abuse is never your fault.',
-                'immediate_action': 'If you are in immediate danger, call 911. Consider reaching out to local authorities or support services.'
-            }
-        }
-        
-        return resources.get(crisis_type, {
-            'message': 'Please consider reaching out to a mental health professional or crisis support service.',
-            'immediate_action': 'If you are in immediate danger, contact emergency services (911).'
-        })
+        return CRISIS_SUPPORT_RESOURCES.get(crisis_type, DEFAULT_CRISIS_SUPPORT_RESOURCE)
+    
+    def get_crisis_support_resources_for(self, crisis_types: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get support resources for each detected crisis type"""
+        return {crisis_type: self.get_crisis_support_resources(crisis_type) for crisis_type in crisis_types}
     
     def prioritize_emotional_memories(self, memories: List[Dict[str, Any]], 
                                     current_emotion: str) -> List[Dict[str, Any]]:
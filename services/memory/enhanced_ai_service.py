@@ -5,6 +5,7 @@ Extends OpenRouter AI with memory-driven personalization
 
 import os
 import json
+import random
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import numpy as np
@@ -158,7 +159,6 @@ class EnhancedAIService(OpenRouterAI):
                     response = response.replace('feel', 'completely understand you feel')
             
             # Add appropriate prefix and suffix
-            import random
             if random.random() < 0.7:  # 70% chance to add emotional elements
                 if adjustment['prefix']:
                     prefix = random.choice(adjustment['prefix'])
@@ -206,7 +206,6 @@ class EnhancedAIService(OpenRouterAI):
             }
             
             if emotion in empathy_elements and intensity > 0.5:
-                import random
                 empathy_prefix = random.choice(empathy_elements[emotion])
                 response = empathy_prefix + response
             
@@ -591,7 +590,6 @@ class EnhancedAIService(OpenRouterAI):
             f"I'm {companion_name}, and I'm genuinely interested in your experiences."
         ]
         
-        import random
         return random.choice(fallback_responses)
     
     def get_conversation_starter_with_memory(self, user_id: str, companion_id: str, 
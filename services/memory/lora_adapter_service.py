@@ -7,17 +7,29 @@ import os
 import json
 import torch
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime
 import tempfile
 import shutil
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from config.memory_config import MemoryConfig
+from services.firestore_db import firestore_db
+
+logger = logging.getLogger(__name__)
+
+# Training job state, keyed by adapter id, so any worker process can report it
+TRAINING_JOBS_COLLECTION = 'lora_adapters'
 
 class LoRAAdapterService:
     """Service for training and managing LoRA adapters for personalization"""
     
+    # Training jobs run on a shared background pool so request handlers return immediately
+    _training_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='lora_training')
+    
     def __init__(self):
         self.config = MemoryConfig()
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -33,11 +45,10 @@ class LoRAAdapterService:
             'bias': 'none',  # Bias type
             'task_type': 'CAUSAL_LM'  # Task type for language modeling
         }
-        
-        print("✅ LoRA Adapter Service initialized")
     
     def train_lora_adapter(self, user_id: str, companion_id: str, training_data: List[str],
-                          base_model_name: str = "microsoft/DialoGPT-medium") -> str:
+                          base_model_name: str = "microsoft/DialoGPT-medium",
+                          adapter_id: str = None) -> str:
         """Train LoRA adapter for user personalization"""
         try:
             # Check if user has premium access
@@ -51,7 +62,7 @@ class LoRAAdapterService:
                 raise ValueError("Insufficient training data. Need at least 10 examples.")
             
             # Create adapter ID
-            adapter_id = f"{user_id}_{companion_id}_{int(datetime.now().timestamp())}"
+            adapter_id = adapter_id or self._generate_adapter_id(user_id, companion_id)
             adapter_path = os.path.join(self.adapters_dir, adapter_id)
             os.makedirs(adapter_path, exist_ok=True)
             
@@ -79,13 +90,99 @@ class LoRAAdapterService:
             with open(os.path.join(adapter_path, 'metadata.json'), 'w') as f:
                 json.dump(metadata, f, indent=2)
             
-            print(f"✅ LoRA adapter trained successfully: {adapter_id}")
+            logger.info("LoRA adapter trained successfully: %s", adapter_id)
             return adapter_id
             
         except Exception as e:
-            print(f"Error training LoRA adapter: {e}")
+            logger.exception("Error training LoRA adapter")
             raise e
     
+    def submit_training_job(self, user_id: str, companion_id: str,
+                            load_training_data: Callable[[], List[str]],
+                            base_model_name: str = "microsoft/DialoGPT-medium") -> str:
+        """Queue LoRA adapter training in the background and return the adapter ID"""
+        adapter_id = self._generate_adapter_id(user_id, companion_id)
+        
+        self._training_job_ref(adapter_id).set({
+            'adapter_id': adapter_id,
+            'user_id': user_id,
+            'companion_id': companion_id,
+            'status': 'queued',
+            'queued_at': datetime.now().isoformat()
+        })
+        
+        self._training_executor.submit(
+            self._run_training_job, adapter_id, user_id, companion_id,
+            load_training_data, base_model_name
+        )
+        
+        return adapter_id
+    
+    def _run_training_job(self, adapter_id: str, user_id: str, companion_id: str,
+                          load_training_data: Callable[[], List[str]], base_model_name: str):
+        """Load training data and train the adapter on a background worker"""
+        self._update_training_job(adapter_id, status='running', started_at=datetime.now().isoformat())
+        
+        try:
+            training_data = load_training_data()
+            
+            self.train_lora_adapter(
+                user_id=user_id,
+                companion_id=companion_id,
+                training_data=training_data,
+                base_model_name=base_model_name,
+                adapter_id=adapter_id
+            )
+            
+            self._update_training_job(adapter_id, status='completed', completed_at=datetime.now().isoformat())
+            
+        except Exception as e:
+            logger.exception("Error in background training job %s", adapter_id)
+            self._update_training_job(adapter_id, status='failed', error=str(e),
+                                      completed_at=datetime.now().isoformat())
+    
+    def _training_job_ref(self, adapter_id: str):
+        """Firestore document tracking a training job"""
+        return firestore_db.db.collection(TRAINING_JOBS_COLLECTION).document(adapter_id)
+    
+    def _update_training_job(self, adapter_id: str, **updates):
+        """Update the tracked state of a training job"""
+        try:
+            self._training_job_ref(adapter_id).set(updates, merge=True)
+        except Exception:
+            logger.exception("Error updating training job %s", adapter_id)
+    
+    def get_training_status(self, adapter_id: str) -> Optional[Dict[str, Any]]:
+        """Get the status of a training job, falling back to saved adapter metadata"""
+        try:
+            job = self._training_job_ref(adapter_id).get()
+            if job.exists:
+                return job.to_dict()
+            
+            metadata_path = os.path.join(self.adapters_dir, adapter_id, 'metadata.json')
+            if not os.path.exists(metadata_path):
+                return None
+            
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+            
+            return {
+                'adapter_id': adapter_id,
+                'user_id': metadata.get('user_id'),
+                'companion_id': metadata.get('companion_id'),
+                'status': metadata.get('status', 'completed'),
+                'completed_at': metadata.get('created_at')
+            }
+            
+        except Exception:
+            logger.exception("Error getting training status")
+            return None
+    
+    def _generate_adapter_id(self, user_id: str, companion_id: str) -> str:
+        """Generate adapter ID for a user's companion"""
+        # The random suffix keeps jobs submitted within the same second apart
+        return f"{user_id}_{companion_id}_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8]}"
+    
     def _has_premium_access(self, user_id: str) -> bool:
         """Check if user has premium access for LoRA training"""
         try:
@@ -94,7 +191,7 @@ class LoRAAdapterService:
             return True
             
         except Exception as e:
-            print(f"Error checking premium access: {e}")
+            logger.exception("Error checking premium access")
             return False
     
     def _prepare_training_data(self, raw_data: List[str]) -> List[Dict[str, str]]:
@@ -119,7 +216,7 @@ class LoRAAdapterService:
             return formatted_data
             
         except Exception as e:
-            print(f"Error preparing training data: {e}")
+            logger.exception("Error preparing training data")
             return []
     
     def _train_adapter(self, adapter_id: str, adapter_path: str, 
@@ -129,9 +226,9 @@ class LoRAAdapterService:
             # This is a simplified implementation for demonstration
             # In production, you would use libraries like PEFT (Parameter-Efficient Fine-Tuning)
             
-            print(f"Starting LoRA adapter training for {adapter_id}")
-            print(f"Training samples: {len(training_data)}")
-            print(f"Base model: {base_model_name}")
+            logger.info("Starting LoRA adapter training for %s", adapter_id)
+            logger.info("Training samples: %s", len(training_data))
+            logger.info("Base model: %s", base_model_name)
             
             # Simulate training process
             training_steps = min(100, len(training_data) * 5)  # Simulate training steps
@@ -154,11 +251,11 @@ class LoRAAdapterService:
                 'status': 'completed'
             }
             
-            print(f"✅ LoRA adapter training completed: {adapter_id}")
+            logger.info("LoRA adapter training completed: %s", adapter_id)
             return training_result
             
         except Exception as e:
-            print(f"Error in adapter training: {e}")
+            logger.exception("Error in adapter training")
             raise e
     
     def _create_dummy_adapter_weights(self) -> Dict[str, torch.Tensor]:
@@ -180,7 +277,7 @@ class LoRAAdapterService:
             return adapter_weights
             
         except Exception as e:
-            print(f"Error creating adapter weights: {e}")
+            logger.exception("Error creating adapter weights")
             return {}
     
     def load_adapter(self, adapter_id: str) -> Optional[Dict[str, Any]]:
@@ -189,13 +286,13 @@ class LoRAAdapterService:
             adapter_path = os.path.join(self.adapters_dir, adapter_id)
             
             if not os.path.exists(adapter_path):
-                print(f"Adapter not found: {adapter_id}")
+                logger.warning("Adapter not found: %s", adapter_id)
                 return None
             
             # Load metadata
             metadata_path = os.path.join(adapter_path, 'metadata.json')
             if not os.path.exists(metadata_path):
-                print(f"Adapter metadata not found: {adapter_id}")
+                logger.warning("Adapter metadata not found: %s", adapter_id)
                 return None
             
             with open(metadata_path, 'r') as f:
@@ -214,11 +311,11 @@ class LoRAAdapterService:
                     adapter_config = json.load(f)
                 metadata['config'] = adapter_config
             
-            print(f"✅ LoRA adapter loaded: {adapter_id}")
+            logger.info("LoRA adapter loaded: %s", adapter_id)
             return metadata
             
         except Exception as e:
-            print(f"Error loading adapter: {e}")
+            logger.exception("Error loading adapter")
             return None
     
     def list_user_adapters(self, user_id: str) -> List[Dict[str, Any]]:
@@ -253,7 +350,7 @@ class LoRAAdapterService:
             return user_adapters
             
         except Exception as e:
-            print(f"Error listing user adapters: {e}")
+            logger.exception("Error listing user adapters")
             return []
     
     def delete_adapter(self, adapter_id: str, user_id: str) -> bool:
@@ -271,17 +368,17 @@ class LoRAAdapterService:
                     metadata = json.load(f)
                 
                 if metadata.get('user_id') != user_id:
-                    print(f"Access denied: User {user_id} cannot delete adapter {adapter_id}")
+                    logger.warning("Access denied: User %s cannot delete adapter %s", user_id, adapter_id)
                     return False
             
             # Delete adapter directory
             shutil.rmtree(adapter_path)
             
-            print(f"✅ LoRA adapter deleted: {adapter_id}")
+            logger.info("LoRA adapter deleted: %s", adapter_id)
             return True
             
         except Exception as e:
-            print(f"Error deleting adapter: {e}")
+            logger.exception("Error deleting adapter")
             return False
     
     def get_adapter_stats(self, adapter_id: str) -> Optional[Dict[str, Any]]:
@@ -320,7 +417,7 @@ class LoRAAdapterService:
             return stats
             
         except Exception as e:
-            print(f"Error getting adapter stats: {e}")
+            logger.exception("Error getting adapter stats")
             return None
     
     def apply_adapter_to_response(self, base_response: str, adapter_id: str) -> str:
@@ -352,7 +449,7 @@ class LoRAAdapterService:
             return personalized_response
             
         except Exception as e:
-            print(f"Error applying adapter to response: {e}")
+            logger.exception("Error applying adapter to response")
             return base_response
     
     def get_system_stats(self) -> Dict[str, Any]:
@@ -396,7 +493,7 @@ class LoRAAdapterService:
             }
             
         except Exception as e:
-            print(f"Error getting system stats: {e}")
+            logger.exception("Error getting system stats")
             return {'error': str(e)}
     
     def cleanup_old_adapters(self, max_age_days: int = 90) -> int:
@@ -421,14 +518,14 @@ class LoRAAdapterService:
                                 # Delete old adapter
                                 shutil.rmtree(adapter_path)
                                 deleted_count += 1
-                                print(f"Deleted old adapter: {adapter_dir}")
+                                logger.info("Deleted old adapter: %s", adapter_dir)
                         except ValueError:
                             pass  # Skip if date parsing fails
             
             return deleted_count
             
         except Exception as e:
-            print(f"Error cleaning up old adapters: {e}")
+            logger.exception("Error cleaning up old adapters")
             return 0
     
     def export_adapter(self, adapter_id: str, user_id: str) -> Optional[str]:
@@ -458,5 +555,5 @@ class LoRAAdapterService:
             return export_path
             
         except Exception as e:
-            print(f"Error exporting adapter: {e}")
+            logger.exception("Error exporting adapter")
             return None
\ No newline at end of file
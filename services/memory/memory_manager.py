@@ -4,10 +4,11 @@ Orchestrates memory processing, storage, and retrieval operations
 """
 
 import os
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Sequence, BinaryIO, Union, Iterator
 from datetime import datetime, timedelta
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from google.cloud import firestore
 
 from .memory_processor import MemoryProcessor
 from .vector_store import VectorMemoryStore
@@ -24,8 +25,9 @@ from utils.memory_utils import generate_memory_id, generate_session_id
 class MemoryManager:
     """Central manager for all memory operations"""
     
-    def __init__(self):
+    def __init__(self, db=None):
         self.config = MemoryConfig()
+        self._db = db
         
         # Initialize services
         self.processor = MemoryProcessor()
@@ -38,6 +40,11 @@ class MemoryManager:
         
         print("✅ Memory Manager initialized")
     
+    @property
+    def db(self):
+        """Firestore client, defaulting to the shared firestore_db client"""
+        return self._db if self._db is not None else firestore_db.db
+    
     def process_and_store_memory(self, user_id: str, companion_id: str, content: str,
                                 source_type: SourceType = SourceType.TEXT,
                                 retention_policy: RetentionPolicy = RetentionPolicy.LONG_TERM,
@@ -86,7 +93,7 @@ class MemoryManager:
             chunk_data = chunk.to_dict()
             
             # Store in memories collection
-            doc_ref = firestore_db.db.collection('memories').document(chunk.id)
+            doc_ref = self.db.collection('memories').document(chunk.id)
             doc_ref.set(chunk_data)
             
             return chunk.id
@@ -214,7 +221,7 @@ class MemoryManager:
                 memory_id = result.get('id')
                 if memory_id:
                     # Get additional data from Firestore
-                    doc = firestore_db.db.collection('memories').document(memory_id).get()
+                    doc = self.db.collection('memories').document(memory_id).get()
                     if doc.exists:
                         firestore_data = doc.to_dict()
                         
@@ -236,7 +243,7 @@ class MemoryManager:
         
         return enriched_results
     
-    def upload_and_process_file(self, user_id: str, companion_id: str, file_data: bytes,
+    def upload_and_process_file(self, user_id: str, companion_id: str, file_data: Union[bytes, BinaryIO],
                                file_type: str, filename: str = None,
                                metadata: Dict[str, Any] = None) -> str:
         """Upload file and process into memories"""
@@ -299,7 +306,7 @@ class MemoryManager:
                 'updated_at': datetime.now()
             }
             
-            firestore_db.db.collection('upload_sessions').document(session_id).set(session_data)
+            self.db.collection('upload_sessions').document(session_id).set(session_data)
             
         except Exception as e:
             print(f"Error updating session: {e}")
@@ -308,7 +315,7 @@ class MemoryManager:
         """Get specific memory by ID"""
         try:
             # Get from Firestore
-            doc = firestore_db.db.collection('memories').document(memory_id).get()
+            doc = self.db.collection('memories').document(memory_id).get()
             if doc.exists:
                 memory_data = doc.to_dict()
                 
@@ -332,7 +339,7 @@ class MemoryManager:
             
             # Update in Firestore
             updates['updated_at'] = datetime.now()
-            firestore_db.db.collection('memories').document(memory_id).update(updates)
+            self.db.collection('memories').document(memory_id).update(updates)
             
             # Update in vector store if needed
             self.vector_store.update_memory_metadata(memory_id, updates)
@@ -352,7 +359,7 @@ class MemoryManager:
                 return False
             
             # Delete from Firestore
-            firestore_db.db.collection('memories').document(memory_id).delete()
+            self.db.collection('memories').document(memory_id).delete()
             
             # Note: Vector store deletion by ID is complex and depends on the implementation
             # For now, we'll mark it as deleted in metadata
@@ -370,12 +377,12 @@ class MemoryManager:
             vector_deleted = self.vector_store.delete_user_memories(user_id, companion_id)
             
             # Delete from Firestore
-            query = firestore_db.db.collection('memories').where('user_id', '==', user_id)
+            query = self.db.collection('memories').where('user_id', '==', user_id)
             if companion_id:
                 query = query.where('companion_id', '==', companion_id)
             
             docs = query.stream()
-            batch = firestore_db.db.batch()
+            batch = self.db.batch()
             
             for doc in docs:
                 batch.delete(doc.reference)
@@ -392,7 +399,7 @@ class MemoryManager:
         """Get memory statistics for user"""
         try:
             # Query Firestore for user memories
-            query = firestore_db.db.collection('memories').where('user_id', '==', user_id)
+            query = self.db.collection('memories').where('user_id', '==', user_id)
             if companion_id:
                 query = query.where('companion_id', '==', companion_id)
             
@@ -452,7 +459,7 @@ class MemoryManager:
         """Search memories by text content (full-text search)"""
         try:
             # Query Firestore for text search
-            query = firestore_db.db.collection('memories').where('user_id', '==', user_id)
+            query = self.db.collection('memories').where('user_id', '==', user_id)
             if companion_id:
                 query = query.where('companion_id', '==', companion_id)
             
@@ -484,6 +491,33 @@ class MemoryManager:
             print(f"Error searching memories by text: {e}")
             return []
     
+    def list_memories(self, user_id: str, companion_id: str = None, limit: int = 1000,
+                      columns: Sequence[str] = ('content',)) -> List[Dict[str, Any]]:
+        """List a user's most recent memories, fetching only the requested fields"""
+        try:
+            query = self.db.collection('memories').where('user_id', '==', user_id)
+            if companion_id:
+                query = query.where('companion_id', '==', companion_id)
+            
+            # Served by the (user_id, companion_id, timestamp) composite index
+            docs = (query.order_by('timestamp', direction=firestore.Query.DESCENDING)
+                    .select(list(columns))
+                    .limit(limit)
+                    .stream())
+            
+            return [doc.to_dict() or {} for doc in docs]
+            
+        except Exception as e:
+            print(f"Error listing memories: {e}")
+            return []
+    
+    def count_memories(self, user_id: str, companion_id: str = None) -> int:
+        """Count a user's memories server-side; query errors propagate to the caller"""
+        query = self.db.collection('memories').where('user_id', '==', user_id)
+        if companion_id:
+            query = query.where('companion_id', '==', companion_id)
+        return firestore_db.count_documents(query)
+    
     def _calculate_text_match_score(self, content: str, search_terms: List[str]) -> float:
         """Calculate text match score for ranking"""
         try:
@@ -520,11 +554,11 @@ class MemoryManager:
             cutoff_date = datetime.now() - timedelta(days=max_age_days)
             
             # Query for old memories
-            query = firestore_db.db.collection('memories').where('timestamp', '<', cutoff_date)
+            query = self.db.collection('memories').where('timestamp', '<', cutoff_date)
             docs = list(query.stream())
             
             deleted_count = 0
-            batch = firestore_db.db.batch()
+            batch = self.db.batch()
             
             for doc in docs:
                 data = doc.to_dict()
@@ -555,7 +589,7 @@ class MemoryManager:
             embedding_stats = self.embedding_service.get_cache_stats()
             
             # Get Firestore stats
-            total_memories = len(list(firestore_db.db.collection('memories').stream()))
+            total_memories = len(list(self.db.collection('memories').stream()))
             
             return {
                 'vector_store': vector_stats,
@@ -572,35 +606,49 @@ class MemoryManager:
             print(f"Error getting system stats: {e}")
             return {'error': str(e)}
     
+    def iter_user_memories(self, user_id: str, companion_id: str = None,
+                           batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield a user's memories page by page so large exports never load at once"""
+        query = self.db.collection('memories').where('user_id', '==', user_id)
+        if companion_id:
+            query = query.where('companion_id', '==', companion_id)
+        query = query.order_by(firestore.FieldPath.document_id()).limit(batch_size)
+        
+        last_doc = None
+        while True:
+            page = query.start_after(last_doc) if last_doc is not None else query
+            docs = list(page.stream())
+            
+            for doc in docs:
+                yield doc.to_dict()
+            
+            if len(docs) < batch_size:
+                return
+            last_doc = docs[-1]
+    
+    def get_export_header(self, user_id: str, companion_id: str = None) -> Dict[str, Any]:
+        """Build the export package fields that describe a memory export"""
+        return {
+            'user_id': user_id,
+            'companion_id': companion_id,
+            'export_date': datetime.now().isoformat(),
+            'metadata': {
+                'export_version': '1.0',
+                'format': 'json',
+                'privacy_compliant': True
+            }
+        }
+    
     def export_user_memories(self, user_id: str, companion_id: str = None) -> Dict[str, Any]:
         """Export all user memories for data portability"""
         try:
-            # Query user memories
-            query = firestore_db.db.collection('memories').where('user_id', '==', user_id)
-            if companion_id:
-                query = query.where('companion_id', '==', companion_id)
-            
-            docs = query.stream()
-            
             # Collect all memory data
-            memories = []
-            for doc in docs:
-                memory_data = doc.to_dict()
-                memories.append(memory_data)
+            memories = list(self.iter_user_memories(user_id, companion_id))
             
             # Create export package
-            export_data = {
-                'user_id': user_id,
-                'companion_id': companion_id,
-                'export_date': datetime.now().isoformat(),
-                'total_memories': len(memories),
-                'memories': memories,
-                'metadata': {
-                    'export_version': '1.0',
-                    'format': 'json',
-                    'privacy_compliant': True
-                }
-            }
+            export_data = self.get_export_header(user_id, companion_id)
+            export_data['total_memories'] = len(memories)
+            export_data['memories'] = memories
             
             return export_data
             
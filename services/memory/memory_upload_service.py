@@ -10,7 +10,7 @@ import shutil
 import base64
 import json
 import re
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, BinaryIO, Union
 from datetime import datetime
 import mimetypes
 import hashlib
@@ -26,6 +26,20 @@ from utils.memory_utils import (
 class MemoryUploadService(MemoryUploadInterface):
     """Service for handling memory file uploads - built from scratch"""
     
+    # Uploads are read and scanned in bounded chunks instead of whole-file copies
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+    
+    # Basic malicious content patterns rejected by the security scan
+    MALICIOUS_PATTERNS = (
+        b'<script',
+        b'javascript:',
+        b'<?php',
+        b'<%',
+        b'exec(',
+        b'system(',
+        b'shell_exec('
+    )
+    
     def __init__(self):
         self.config = MemoryConfig()
         self.temp_dir = tempfile.mkdtemp(prefix="myprabh_memory_")
@@ -43,15 +57,20 @@ class MemoryUploadService(MemoryUploadInterface):
             # Generate a simple key (in production, use proper key management)
             return hashlib.sha256(b'myprabh_memory_key').hexdigest()[:32]
     
-    def upload_memory(self, user_id: str, file_data: bytes, file_type: str, 
+    def upload_memory(self, user_id: str, file_data: Union[bytes, BinaryIO], file_type: str, 
                      companion_id: str, filename: str = None, 
                      metadata: Dict[str, Any] = None) -> str:
-        """Upload and process memory file"""
+        """Upload and process memory file (raw bytes or a binary file stream)"""
         try:
             # Validate inputs
             if not user_id or not companion_id:
                 raise ValueError("User ID and Companion ID are required")
             
+            # File streams are read once, up to the size limit, and hashed
+            if hasattr(file_data, 'read'):
+                file_data, content_hash = self.read_upload_stream(file_data)
+                metadata = dict(metadata or {}, content_hash=content_hash)
+            
             if not file_data:
                 raise ValueError("File data cannot be empty")
             
@@ -100,6 +119,19 @@ class MemoryUploadService(MemoryUploadInterface):
             self._cleanup_session_files(session_id if 'session_id' in locals() else None)
             raise e
     
+    def read_upload_stream(self, file_obj: BinaryIO) -> Tuple[bytes, str]:
+        """Read an upload stream into memory with its content hash
+        
+        Validation and processing work on the whole file, so it is read in one
+        bounded call: at most one byte past the limit is buffered before an
+        oversized file is rejected.
+        """
+        file_data = file_obj.read(self.config.MAX_MEMORY_FILE_SIZE + 1)
+        if len(file_data) > self.config.MAX_MEMORY_FILE_SIZE:
+            raise ValueError("File too large")
+        
+        return file_data, hashlib.sha256(file_data).hexdigest()
+    
     def validate_upload(self, file_data: bytes, file_type: str) -> bool:
         """Validate uploaded file"""
         try:
@@ -138,21 +170,15 @@ class MemoryUploadService(MemoryUploadInterface):
     
     def _security_scan_file(self, file_data: bytes) -> bool:
         """Perform basic security scan on file"""
-        # Check for malicious patterns (basic implementation)
-        malicious_patterns = [
-            b'<script',
-            b'javascript:',
-            b'<?php',
-            b'<%',
-            b'exec(',
-            b'system(',
-            b'shell_exec('
-        ]
+        # Scan overlapping windows so no full lowercase copy of the file is made
+        overlap = max(len(pattern) for pattern in self.MALICIOUS_PATTERNS) - 1
+        view = memoryview(file_data)
         
-        file_data_lower = file_data.lower()
-        for pattern in malicious_patterns:
-            if pattern in file_data_lower:
-                return False
+        for start in range(0, len(file_data), self.UPLOAD_CHUNK_SIZE):
+            window = bytes(view[max(0, start - overlap):start + self.UPLOAD_CHUNK_SIZE]).lower()
+            for pattern in self.MALICIOUS_PATTERNS:
+                if pattern in window:
+                    return False
         
         return True
     
@@ -6,10 +6,16 @@ Handles granular privacy settings and consent management
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from enum import Enum
+import logging
 
 from services.firestore_db import firestore_db
 from config.memory_config import MemoryConfig
 
+logger = logging.getLogger(__name__)
+
+# Firestore caps a write batch at 500 operations
+BULK_BATCH_SIZE = 500
+
 class PrivacyLevel(Enum):
     """Privacy levels for memory data"""
     PUBLIC = "public"
@@ -31,7 +37,6 @@ class PrivacyControlService:
     
     def __init__(self):
         self.config = MemoryConfig()
-        print("✅ Privacy Control Service initialized")
     
     def get_user_privacy_settings(self, user_id: str) -> Dict[str, Any]:
         """Get comprehensive privacy settings for a user"""
@@ -60,7 +65,7 @@ class PrivacyControlService:
             }
             
         except Exception as e:
-            print(f"Error getting privacy settings: {e}")
+            logger.exception("Error getting privacy settings")
             return self._get_default_privacy_settings()
     
     def save_user_privacy_settings(self, user_id: str, settings: Dict[str, Any]) -> bool:
@@ -79,7 +84,7 @@ class PrivacyControlService:
             return True
             
         except Exception as e:
-            print(f"Error saving privacy settings: {e}")
+            logger.exception("Error saving privacy settings")
             return False
     
     def update_memory_privacy_level(self, user_id: str, memory_id: str, 
@@ -110,7 +115,7 @@ class PrivacyControlService:
             return True
             
         except Exception as e:
-            print(f"Error updating memory privacy level: {e}")
+            logger.exception("Error updating memory privacy level")
             return False
     
     def bulk_update_memory_privacy(self, user_id: str, memory_ids: List[str], 
@@ -118,38 +123,42 @@ class PrivacyControlService:
         """Bulk update privacy levels for multiple memories"""
         try:
             updated_count = 0
-            failed_count = 0
             failed_ids = []
+            privacy_updated_at = datetime.now().isoformat()
+            memories_collection = firestore_db.db.collection('memories')
             
-            batch = firestore_db.db.batch()
-            
-            for memory_id in memory_ids:
+            # One read and one write round-trip per 500 memories (Firestore batch limit)
+            for start in range(0, len(memory_ids), BULK_BATCH_SIZE):
+                chunk_ids = memory_ids[start:start + BULK_BATCH_SIZE]
+                memory_refs = [memories_collection.document(memory_id) for memory_id in chunk_ids]
+                
                 try:
-                    # Verify memory ownership
-                    memory_ref = firestore_db.db.collection('memories').document(memory_id)
-                    memory_doc = memory_ref.get()
+                    owned_ids = set()
+                    for memory_doc in firestore_db.db.get_all(memory_refs, field_paths=['user_id']):
+                        if memory_doc.exists and memory_doc.to_dict().get('user_id') == user_id:
+                            owned_ids.add(memory_doc.id)
                     
-                    if memory_doc.exists:
-                        memory_data = memory_doc.to_dict()
-                        if memory_data.get('user_id') == user_id:
+                    batch = firestore_db.db.batch()
+                    for memory_ref in memory_refs:
+                        if memory_ref.id in owned_ids:
                             batch.update(memory_ref, {
                                 'privacy_level': privacy_level.value,
-                                'privacy_updated_at': datetime.now().isoformat()
+                                'privacy_updated_at': privacy_updated_at
                             })
-                            updated_count += 1
-                        else:
-                            failed_count += 1
-                            failed_ids.append(memory_id)
-                    else:
-                        failed_count += 1
-                        failed_ids.append(memory_id)
-                        
-                except Exception as e:
-                    failed_count += 1
-                    failed_ids.append(memory_id)
-            
-            # Commit batch update
-            batch.commit()
+                    
+                    if owned_ids:
+                        batch.commit()
+                    updated_count += len(owned_ids)
+                    chunk_failed_ids = [memory_id for memory_id in chunk_ids if memory_id not in owned_ids]
+                    
+                except Exception:
+                    logger.exception("Error updating privacy batch")
+                    chunk_failed_ids = chunk_ids
+                
+                # Each chunk's failures are merged once, whether or not its commit succeeded
+                failed_ids.extend(chunk_failed_ids)
+            
+            failed_count = len(failed_ids)
             
             # Log bulk privacy change
             self._log_privacy_change(user_id, 'bulk_memory_privacy_update', {
@@ -166,7 +175,7 @@ class PrivacyControlService:
             }
             
         except Exception as e:
-            print(f"Error in bulk privacy update: {e}")
+            logger.exception("Error in bulk privacy update")
             return {
                 'success': False,
                 'error': str(e),
@@ -207,7 +216,7 @@ class PrivacyControlService:
             return True
             
         except Exception as e:
-            print(f"Error recording consent: {e}")
+            logger.exception("Error recording consent")
             return False
     
     def check_consent(self, user_id: str, consent_type: ConsentType) -> bool:
@@ -225,7 +234,7 @@ class PrivacyControlService:
             return consent_info.get('granted', False)
             
         except Exception as e:
-            print(f"Error checking consent: {e}")
+            logger.exception("Error checking consent")
             return False
     
     def get_memory_access_permissions(self, user_id: str, memory_id: str, 
@@ -276,7 +285,7 @@ class PrivacyControlService:
             return permissions
             
         except Exception as e:
-            print(f"Error getting memory access permissions: {e}")
+            logger.exception("Error getting memory access permissions")
             return {'read': False, 'process': False, 'share': False}
     
     def get_privacy_compliance_report(self, user_id: str) -> Dict[str, Any]:
@@ -317,7 +326,7 @@ class PrivacyControlService:
             }
             
         except Exception as e:
-            print(f"Error generating compliance report: {e}")
+            logger.exception("Error generating compliance report")
             return {
                 'error': str(e),
                 'report_date': datetime.now().isoformat()
@@ -351,7 +360,7 @@ class PrivacyControlService:
             return privacy_levels
             
         except Exception as e:
-            print(f"Error getting memory privacy settings: {e}")
+            logger.exception("Error getting memory privacy settings")
             return {}
     
     def _get_consent_history(self, user_id: str) -> List[Dict[str, Any]]:
@@ -368,7 +377,7 @@ class PrivacyControlService:
             return consent_history
             
         except Exception as e:
-            print(f"Error getting consent history: {e}")
+            logger.exception("Error getting consent history")
             return []
     
     def _get_current_consents(self, user_id: str) -> Dict[str, Any]:
@@ -382,7 +391,7 @@ class PrivacyControlService:
                 return {}
                 
         except Exception as e:
-            print(f"Error getting current consents: {e}")
+            logger.exception("Error getting current consents")
             return {}
     
     def _get_consent_summary(self, user_id: str) -> Dict[str, Any]:
@@ -401,7 +410,7 @@ class PrivacyControlService:
             return summary
             
         except Exception as e:
-            print(f"Error getting consent summary: {e}")
+            logger.exception("Error getting consent summary")
             return {}
     
     def _calculate_compliance_score(self, privacy_settings: Dict[str, Any], 
@@ -443,7 +452,7 @@ class PrivacyControlService:
             return min(max_score, score)
             
         except Exception as e:
-            print(f"Error calculating compliance score: {e}")
+            logger.exception("Error calculating compliance score")
             return 0.0
     
     def _get_privacy_recommendations(self, privacy_settings: Dict[str, Any], 
@@ -485,4 +494,4 @@ class PrivacyControlService:
             firestore_db.db.collection('privacy_audit_logs').add(log_entry)
             
         except Exception as e:
-            print(f"Error logging privacy change: {e}")
\ No newline at end of file
+            logger.exception("Error logging privacy change")
\ No newline at end of file
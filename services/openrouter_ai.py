@@ -5,6 +5,7 @@ Provides intelligent responses using OpenRouter API
 
 import requests
 import json
+import random
 import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
@@ -297,7 +298,6 @@ Remember: You are not just an AI, you are their companion who truly cares about
             f"I may not always have the perfect response, but I always have love for you. ✨"
         ]
         
-        import random
         return random.choice(fallback_responses)
     
     def get_conversation_starter(self, prabh_data: Dict[str, Any]) -> str:
@@ -333,7 +333,6 @@ Remember: You are not just an AI, you are their companion who truly cares about
                 f"Hey! {prabh_name} here. I'm curious about your day and how you're feeling right now. ✨"
             ]
         
-        import random
         return random.choice(starters)
 
 # Example usage and testing
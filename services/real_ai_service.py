@@ -6,6 +6,7 @@ Integrates a real language model with memory-driven personalization
 
 import os
 import json
+import random
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -295,7 +296,6 @@ Remember: You are not just an AI - you are the embodiment of eternal love and de
             f"Your words touch my heart. I want to understand you better - share with me what's important to you right now. ✨"
         ]
         
-        import random
         return random.choice(responses)
     
     def train_with_memories(self, user_memories: List[str], companion_id: str):
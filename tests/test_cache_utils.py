@@ -0,0 +1,60 @@
+"""
+Unit tests for cache utilities
+"""
+
+import pytest
+from unittest.mock import patch
+from utils.cache_utils import TTLCache
+
+class TestTTLCache:
+    """Test cases for TTLCache"""
+
+    def test_set_and_get(self):
+        """Test caching and reading a value"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('user_1', {'total_memories': 3})
+
+        assert cache.get('user_1') == {'total_memories': 3}
+        assert 'user_1' in cache
+        assert cache.get('missing') is None
+
+    def test_entries_expire(self):
+        """Test entries expire after their TTL"""
+        cache = TTLCache(maxsize=10, ttl=30)
+
+        with patch('utils.cache_utils.time.monotonic', return_value=100.0):
+            cache.set('user_1', 'value')
+
+        with patch('utils.cache_utils.time.monotonic', return_value=120.0):
+            assert cache.get('user_1') == 'value'
+
+        with patch('utils.cache_utils.time.monotonic', return_value=131.0):
+            assert cache.get('user_1') is None
+            assert len(cache) == 0
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used entry is evicted when full"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_pop_and_clear(self):
+        """Test explicit invalidation"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        assert cache.pop('a') == 1
+        assert cache.pop('a') is None
+
+        cache.clear()
+        assert len(cache) == 0
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -4,11 +4,11 @@ Tests companion switching and context isolation
 """
 
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, ANY
 from datetime import datetime, timedelta
 import uuid
 
-from services.memory.companion_context_service import CompanionContextService
+from services.memory.companion_context_service import CompanionContextService, invalidate_companion_context
 
 class TestCompanionContextService(unittest.TestCase):
     """Test cases for CompanionContextService"""
@@ -90,15 +90,23 @@ class TestCompanionContextService(unittest.TestCase):
         self.assertIn('switch_timestamp', result)
         
         # Verify method calls
+        batch = self.mock_firestore.db.batch.return_value
         self.service._save_companion_context.assert_called_once_with(
-            self.test_user_id, self.test_companion_id_1, session_data
+            self.test_user_id, self.test_companion_id_1, session_data, batch=batch
         )
         self.service._get_companion_info.assert_called_once_with(
             self.test_user_id, self.test_companion_id_2
         )
         self.service._load_companion_context.assert_called_once_with(
-            self.test_user_id, self.test_companion_id_2
+            self.test_user_id, self.test_companion_id_2, now_iso=result['switch_timestamp']
+        )
+        self.service._update_companion_activity.assert_called_once_with(
+            self.test_user_id, self.test_companion_id_2, batch=batch
         )
+        self.service._log_context_switch.assert_called_once_with(
+            self.test_user_id, self.test_companion_id_1, self.test_companion_id_2, batch=batch
+        )
+        batch.commit.assert_called_once()
     
     def test_switch_companion_context_save_failure(self):
         """Test companion switching with save context failure"""
@@ -207,6 +215,59 @@ class TestCompanionContextService(unittest.TestCase):
         self.assertIn('personality_context', result)
         self.assertIn('memory_context', result)
     
+    def test_get_companion_context_is_cached_until_state_saved(self):
+        """Test repeated context reads are cached and saving state invalidates them"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={
+            'success': True,
+            'companion': {'id': self.test_companion_id_1, 'name': 'Test Companion'}
+        })
+        self.service._load_companion_context = Mock(return_value={
+            'success': True,
+            'context': {'test': 'data'},
+            'conversation_history': [],
+            'personality_context': {},
+            'memory_context': {}
+        })
+        
+        # Act
+        self.service.get_companion_context(self.test_user_id, self.test_companion_id_1)
+        cached = self.service.get_companion_context(self.test_user_id, self.test_companion_id_1)
+        self.service.save_conversation_state(self.test_user_id, self.test_companion_id_1, {'conversation_turn': 1})
+        self.service.get_companion_context(self.test_user_id, self.test_companion_id_1)
+        
+        # Assert
+        self.assertEqual(cached['context'], {'test': 'data'})
+        self.assertEqual(self.service._load_companion_context.call_count, 2)
+    
+    def test_get_companion_context_cache_is_isolated_and_evicted_by_messages(self):
+        """Test callers can't mutate the cached context and new messages evict it"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={
+            'success': True,
+            'companion': {'id': self.test_companion_id_1, 'name': 'Test Companion'}
+        })
+        self.service._load_companion_context = Mock(return_value={
+            'success': True,
+            'context': {'test': 'data'},
+            'conversation_history': [{'user_message': 'hi'}],
+            'personality_context': {},
+            'memory_context': {}
+        })
+        
+        # Act
+        first = self.service.get_companion_context(self.test_user_id, self.test_companion_id_1)
+        first['conversation_history'].append({'user_message': 'mutated'})
+        first['context']['test'] = 'mutated'
+        cached = self.service.get_companion_context(self.test_user_id, self.test_companion_id_1)
+        invalidate_companion_context(self.test_user_id, self.test_companion_id_1)
+        self.service.get_companion_context(self.test_user_id, self.test_companion_id_1)
+        
+        # Assert
+        self.assertEqual(cached['conversation_history'], [{'user_message': 'hi'}])
+        self.assertEqual(cached['context'], {'test': 'data'})
+        self.assertEqual(self.service._load_companion_context.call_count, 2)
+    
     def test_save_conversation_state_success(self):
         """Test saving conversation state successfully"""
         # Arrange
@@ -226,7 +287,8 @@ class TestCompanionContextService(unittest.TestCase):
         
         # Mock Firestore set
         mock_doc_ref = Mock()
-        self.mock_firestore.db.collection.return_value.document.return_value = mock_doc_ref
+        self.mock_firestore.companion_contexts.return_value.document.return_value = mock_doc_ref
+        mock_batch = self.mock_firestore.db.batch.return_value
         
         # Act
         result = self.service.save_conversation_state(
@@ -238,8 +300,48 @@ class TestCompanionContextService(unittest.TestCase):
         self.assertEqual(result['message'], 'Conversation state saved successfully')
         
         # Verify Firestore call
-        self.mock_firestore.db.collection.assert_called_with('companion_contexts')
-        mock_doc_ref.set.assert_called_once()
+        self.mock_firestore.companion_contexts.assert_called_with(self.test_user_id)
+        self.mock_firestore.companion_contexts.return_value.document.assert_called_with(self.test_companion_id_1)
+        mock_batch.set.assert_any_call(mock_doc_ref, ANY, merge=True)
+        mock_batch.update.assert_called_once_with(ANY, {'conversation_turn': 10})
+        mock_batch.commit.assert_called_once()
+    
+    def test_save_companion_context_rejects_foreign_companion(self):
+        """Test session data is not written into a companion the user doesn't own"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={'success': False, 'error': 'Access denied'})
+        mock_batch = Mock()
+        
+        # Act
+        result = self.service._save_companion_context(
+            self.test_user_id, self.test_companion_id_1, {'conversation_turn': 3}, batch=mock_batch
+        )
+        
+        # Assert
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'Access denied')
+        mock_batch.set.assert_not_called()
+        mock_batch.update.assert_not_called()
+    
+    def test_save_companion_context_updates_owned_companion(self):
+        """Test switcher fields are updated on the verified companion rather than merge-created"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={'success': True, 'companion': {}})
+        mock_batch = Mock()
+        
+        # Act
+        result = self.service._save_companion_context(
+            self.test_user_id, self.test_companion_id_1,
+            {'conversation_turn': 3, 'last_message': 'hello'}, batch=mock_batch
+        )
+        
+        # Assert
+        self.assertTrue(result['success'])
+        mock_batch.update.assert_called_once_with(
+            ANY, {'conversation_turn': 3, 'last_message_preview': 'hello...'}
+        )
+        mock_batch.set.assert_called_once()
+        mock_batch.commit.assert_not_called()
     
     def test_get_active_companions(self):
         """Test getting list of active companions"""
@@ -280,9 +382,11 @@ class TestCompanionContextService(unittest.TestCase):
         })
         
         # Act
-        result = self.service.get_active_companions(self.test_user_id, limit=10)
+        result = self.service.get_active_companions(self.test_user_id, limit=10, include_summary=True)
         
         # Assert
+        self.assertIsNone(result['next_cursor'])
+        result = result['companions']
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0]['name'], 'Companion 1')
         self.assertEqual(result[1]['name'], 'Companion 2')
@@ -290,6 +394,54 @@ class TestCompanionContextService(unittest.TestCase):
         self.assertFalse(result[1]['memory_based'])
         self.assertIn('context_summary', result[0])
         self.assertIn('context_summary', result[1])
+        self.assertEqual(self.service._get_context_summary.call_count, 2)
+    
+    def test_get_active_companions_without_summary(self):
+        """Test the switcher list uses denormalized fields without per-companion reads"""
+        # Arrange
+        mock_doc = Mock()
+        mock_doc.id = self.test_companion_id_1
+        mock_doc.to_dict.return_value = {
+            'name': 'Companion 1',
+            'conversation_turn': 4,
+            'last_message_preview': 'See you soon...'
+        }
+        mock_query = self.mock_firestore.db.collection.return_value.where.return_value.order_by.return_value.limit.return_value
+        mock_query.stream.return_value = [mock_doc]
+        self.service._get_context_summary = Mock()
+        
+        # Act
+        result = self.service.get_active_companions(self.test_user_id, limit=5)['companions']
+        
+        # Assert
+        self.assertEqual(result[0]['conversation_turn'], 4)
+        self.assertEqual(result[0]['last_message_preview'], 'See you soon...')
+        self.assertNotIn('context_summary', result[0])
+        self.service._get_context_summary.assert_not_called()
+    
+    def test_get_active_companions_pages_with_cursor(self):
+        """Test a full page returns a cursor and the cursor resumes after that companion"""
+        # Arrange
+        mock_doc = Mock()
+        mock_doc.id = self.test_companion_id_1
+        mock_doc.to_dict.return_value = {'name': 'Companion 1'}
+        mock_query = self.mock_firestore.db.collection.return_value.where.return_value.order_by.return_value.limit.return_value
+        mock_query.stream.return_value = [mock_doc]
+        mock_cursor = self.mock_firestore.db.collection.return_value.document.return_value.get.return_value
+        mock_cursor.exists = True
+        mock_query.start_after.return_value.stream.return_value = []
+        
+        # Act
+        first_page = self.service.get_active_companions(self.test_user_id, limit=1)
+        second_page = self.service.get_active_companions(
+            self.test_user_id, limit=1, after=first_page['next_cursor']
+        )
+        
+        # Assert
+        self.assertEqual(first_page['next_cursor'], self.test_companion_id_1)
+        self.mock_firestore.db.collection.return_value.document.assert_called_with(self.test_companion_id_1)
+        mock_query.start_after.assert_called_once_with(mock_cursor)
+        self.assertEqual(second_page, {'companions': [], 'next_cursor': None})
     
     def test_get_context_isolation_status(self):
         """Test getting context isolation status"""
@@ -358,29 +510,113 @@ class TestCompanionContextService(unittest.TestCase):
         }
         mock_context_doc2.reference = Mock()
         
-        # Mock Firestore query for contexts
+        # Mock Firestore query for contexts: timestamped contexts are inactive,
+        # nothing is left with string timestamps or in the legacy collection
         mock_contexts_query = Mock()
         mock_contexts_query.stream.return_value = [mock_context_doc1, mock_context_doc2]
-        self.mock_firestore.db.collection.return_value.where.return_value.where.return_value = mock_contexts_query
+        mock_string_query = Mock()
+        mock_string_query.stream.return_value = []
+        mock_contexts = self.mock_firestore.companion_contexts.return_value
+        mock_contexts.where.side_effect = lambda field, op, value: Mock(**{
+            'order_by.return_value.limit.return_value':
+                mock_string_query if isinstance(value, str) else mock_contexts_query
+        })
+        mock_legacy = self.mock_firestore.legacy_companion_contexts.return_value
+        mock_legacy.where.return_value.where.return_value.order_by.return_value.limit.return_value = mock_string_query
         
         # Mock companion existence checks (both companions don't exist)
         mock_companion_doc = Mock()
         mock_companion_doc.exists = False
-        self.mock_firestore.db.collection.return_value.document.return_value.get.return_value = mock_companion_doc
-        
-        # Mock archived contexts collection
-        mock_archived_collection = Mock()
-        self.mock_firestore.db.collection.return_value = mock_archived_collection
+        self.mock_firestore.db.get_all.return_value = [mock_companion_doc, mock_companion_doc]
+        mock_batch = self.mock_firestore.db.batch.return_value
         
         # Act
         result = self.service.cleanup_inactive_contexts(self.test_user_id, days_inactive)
         
         # Assert
+        self.mock_firestore.db.get_all.assert_called_once()
+        self.assertEqual(mock_batch.set.call_count, 2)
+        mock_batch.delete.assert_any_call(mock_context_doc1.reference)
+        mock_batch.delete.assert_any_call(mock_context_doc2.reference)
+        mock_batch.commit.assert_called_once()
         self.assertTrue(result['success'])
         self.assertEqual(result['cleaned_count'], 2)
         self.assertEqual(len(result['archived_contexts']), 2)
         self.assertIn('old_comp_1', result['archived_contexts'])
         self.assertIn('old_comp_2', result['archived_contexts'])
+        mock_legacy.where.assert_called_once_with('user_id', '==', self.test_user_id)
+    
+    def test_cleanup_inactive_contexts_covers_legacy_contexts(self):
+        """Test top-level contexts with ISO string timestamps are cleaned as well"""
+        # Arrange
+        mock_legacy_doc = Mock()
+        mock_legacy_doc.to_dict.return_value = {'companion_id': 'legacy_comp', 'user_id': self.test_user_id}
+        mock_empty_query = Mock()
+        mock_empty_query.stream.return_value = []
+        mock_legacy_query = Mock()
+        mock_legacy_query.stream.return_value = [mock_legacy_doc]
+        self.mock_firestore.companion_contexts.return_value.where.return_value.order_by.return_value.limit.return_value = mock_empty_query
+        mock_legacy = self.mock_firestore.legacy_companion_contexts.return_value
+        mock_legacy.where.return_value.where.return_value.order_by.return_value.limit.return_value = mock_legacy_query
+        mock_missing = Mock()
+        mock_missing.exists = False
+        self.mock_firestore.db.get_all.return_value = [mock_missing]
+        mock_batch = self.mock_firestore.db.batch.return_value
+        
+        # Act
+        result = self.service.cleanup_inactive_contexts(self.test_user_id, 30)
+        
+        # Assert
+        self.assertEqual(result['archived_contexts'], ['legacy_comp'])
+        mock_batch.delete.assert_called_once_with(mock_legacy_doc.reference)
+        cutoff = mock_legacy.where.return_value.where.call_args[0][2]
+        self.assertIsInstance(cutoff, str)
+    
+    def test_get_companion_info_is_cached_across_activity_updates(self):
+        """Test companion info is served from cache and activity updates don't force a re-read"""
+        # Arrange
+        mock_companion_doc = Mock()
+        mock_companion_doc.exists = True
+        mock_companion_doc.to_dict.return_value = {'user_id': self.test_user_id, 'name': 'Test Companion'}
+        mock_doc_ref = self.mock_firestore.db.collection.return_value.document.return_value
+        mock_doc_ref.get.return_value = mock_companion_doc
+        
+        # Act
+        first = self.service._get_companion_info(self.test_user_id, self.test_companion_id_1)
+        second = self.service._get_companion_info(self.test_user_id, self.test_companion_id_1)
+        self.service._update_companion_activity(self.test_user_id, self.test_companion_id_1)
+        self.service._get_companion_info(self.test_user_id, self.test_companion_id_1)
+        
+        # Assert
+        self.assertTrue(first['success'])
+        self.assertEqual(second['companion']['name'], 'Test Companion')
+        self.assertEqual(mock_doc_ref.get.call_count, 1)
+        mock_doc_ref.update.assert_called_once()
+    
+    def test_load_companion_context(self):
+        """Test loading all parts of a companion's context together"""
+        # Arrange
+        mock_context_doc = Mock()
+        mock_context_doc.exists = True
+        mock_context_doc.to_dict.return_value = {'conversation_turn': 3}
+        self.mock_firestore.get_companion_context.return_value = mock_context_doc
+        
+        self.service._load_conversation_history = Mock(return_value=[{'user_message': 'Hello'}])
+        self.service._load_personality_context = Mock(return_value={'communication_style': 'casual'})
+        self.service._load_memory_context = Mock(return_value={'total_assigned_memories': 2})
+        
+        # Act
+        result = self.service._load_companion_context(self.test_user_id, self.test_companion_id_1)
+        
+        # Assert
+        self.assertTrue(result['success'])
+        self.assertEqual(result['context'], {'conversation_turn': 3})
+        self.assertEqual(result['conversation_history'], [{'user_message': 'Hello'}])
+        self.assertEqual(result['personality_context'], {'communication_style': 'casual'})
+        self.assertEqual(result['memory_context'], {'total_assigned_memories': 2})
+        self.mock_firestore.get_companion_context.assert_called_once_with(
+            self.test_user_id, self.test_companion_id_1
+        )
     
     def test_load_conversation_history(self):
         """Test loading conversation history for a companion"""
@@ -406,7 +642,7 @@ class TestCompanionContextService(unittest.TestCase):
         # Mock Firestore query
         mock_query = Mock()
         mock_query.stream.return_value = [mock_message2, mock_message1]  # Reversed order from DB
-        self.mock_firestore.db.collection.return_value.where.return_value.where.return_value.order_by.return_value.limit.return_value = mock_query
+        self.mock_firestore.companion_messages.return_value.where.return_value.order_by.return_value.limit.return_value = mock_query
         
         # Act
         result = self.service._load_conversation_history(self.test_user_id, self.test_companion_id_1, limit=20)
@@ -417,6 +653,45 @@ class TestCompanionContextService(unittest.TestCase):
         self.assertEqual(result[0]['user_message'], 'Hello')
         self.assertEqual(result[1]['user_message'], 'How are you?')
     
+    def test_load_conversation_history_summary_only(self):
+        """Test summary-only history requests a field mask"""
+        # Arrange
+        mock_message = Mock()
+        mock_message.id = 'msg1'
+        mock_message.to_dict.return_value = {
+            'user_message': 'Hello',
+            'ai_response': 'Hi there!',
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        mock_where = self.mock_firestore.companion_messages.return_value.where.return_value
+        mock_where.select.return_value.order_by.return_value.limit.return_value.stream.return_value = [mock_message]
+        
+        # Act
+        result = self.service._load_conversation_history(
+            self.test_user_id, self.test_companion_id_1, limit=5, summary_only=True
+        )
+        
+        # Assert
+        mock_where.select.assert_called_once_with(['user_message', 'ai_response', 'timestamp'])
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['ai_response'], 'Hi there!')
+        self.assertEqual(result[0]['metadata'], {})
+    
+    def test_load_conversation_history_reuses_built_query(self):
+        """Test repeated history loads reuse the prepared query"""
+        # Arrange
+        mock_query = self.mock_firestore.companion_messages.return_value.where.return_value.order_by.return_value.limit.return_value
+        mock_query.stream.return_value = []
+        
+        # Act
+        self.service._load_conversation_history(self.test_user_id, self.test_companion_id_1, limit=20)
+        self.service._load_conversation_history(self.test_user_id, self.test_companion_id_1, limit=20)
+        
+        # Assert
+        self.mock_firestore.companion_messages.assert_called_once_with(self.test_companion_id_1)
+        self.assertEqual(mock_query.stream.call_count, 2)
+    
     def test_load_personality_context(self):
         """Test loading personality context for a companion"""
         # Arrange
@@ -463,14 +738,18 @@ class TestCompanionContextService(unittest.TestCase):
         
         # Mock Firestore query
         mock_query = Mock()
-        mock_query.stream.return_value = [mock_memory1, mock_memory2]
+        mock_query.order_by.return_value.limit.return_value.stream.return_value = [mock_memory1, mock_memory2]
         self.mock_firestore.db.collection.return_value.where.return_value = mock_query
+        self.mock_firestore.count_documents.return_value = 7
         
         # Act
         result = self.service._load_memory_context(self.test_user_id, self.test_companion_id_1)
         
         # Assert
-        self.assertEqual(result['total_assigned_memories'], 2)
+        mock_query.order_by.assert_called_once_with('timestamp', direction='DESCENDING')
+        mock_query.order_by.return_value.limit.assert_called_once_with(5)
+        self.mock_firestore.count_documents.assert_called_once_with(mock_query)
+        self.assertEqual(result['total_assigned_memories'], 7)
         self.assertIn('recent_memories', result)
         self.assertEqual(len(result['recent_memories']), 2)
         self.assertIn('memory_assignment_type', result)
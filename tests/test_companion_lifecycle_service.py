@@ -8,8 +8,10 @@ from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, timedelta
 import uuid
 import json
+import threading
 
 from services.memory.companion_lifecycle_service import CompanionLifecycleService
+import services.memory.companion_lifecycle_service as lifecycle_module
 
 class TestCompanionLifecycleService(unittest.TestCase):
     """Test cases for CompanionLifecycleService"""
@@ -44,6 +46,7 @@ class TestCompanionLifecycleService(unittest.TestCase):
         self.memory_patcher.stop()
         self.personalization_patcher.stop()
         self.context_patcher.stop()
+        lifecycle_module._archived_companions_cache.clear()
     
     def test_archive_companion_success(self):
         """Test successful companion archiving"""
@@ -57,13 +60,15 @@ class TestCompanionLifecycleService(unittest.TestCase):
         }
         
         # Mock get companion info
+        mock_companion_ref = Mock()
         self.service._get_companion_info = Mock(return_value={
             'success': True,
             'companion': {
                 'id': self.test_companion_id,
                 'name': 'Test Companion',
                 'status': 'active'
-            }
+            },
+            'companion_ref': mock_companion_ref
         })
         
         # Mock create archive package
@@ -74,7 +79,8 @@ class TestCompanionLifecycleService(unittest.TestCase):
                 'conversations': {'total_messages': 10},
                 'personality': {'traits': ['friendly']},
                 'context': {'context_data': {}}
-            }
+            },
+            'size': 128
         })
         
         # Mock cleanup
@@ -86,6 +92,7 @@ class TestCompanionLifecycleService(unittest.TestCase):
         # Mock Firestore operations
         mock_doc_ref = Mock()
         self.mock_firestore.db.collection.return_value.document.return_value = mock_doc_ref
+        mock_batch = self.mock_firestore.db.batch.return_value
         
         # Mock logging
         self.service._log_companion_action = Mock()
@@ -98,13 +105,168 @@ class TestCompanionLifecycleService(unittest.TestCase):
         self.assertIn('archive_id', result)
         self.assertIn('companion_name', result)
         self.assertIn('archived_at', result)
-        self.assertIn('archive_package_size', result)
+        self.assertEqual(result['archive_package_size'], 128)
         
         # Verify method calls
         self.service._get_companion_info.assert_called_once_with(self.test_user_id, self.test_companion_id)
         self.service._create_archive_package.assert_called_once()
-        mock_doc_ref.set.assert_called_once()
-        mock_doc_ref.update.assert_called_once()
+        self.service._cleanup_archived_companion_data.assert_called_once_with(
+            self.test_user_id, self.test_companion_id, archive_options, batch=mock_batch, spill_batches=[]
+        )
+        self.assertEqual(mock_batch.set.call_count, 2)
+        index_entries = mock_batch.set.call_args_list[1][0][1]['entries']
+        self.assertEqual(index_entries[result['archive_id']]['name'], 'Test Companion')
+        mock_batch.update.assert_called_once()
+        self.assertIs(mock_batch.update.call_args[0][0], mock_companion_ref)
+        mock_batch.commit.assert_called_once()
+        mock_doc_ref.set.assert_not_called()
+    
+    def test_archive_companion_commits_spill_batches_only_after_archive(self):
+        """Test memory unassignment overflow is not committed when the archive batch fails"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={
+            'success': True,
+            'companion': {'id': self.test_companion_id, 'name': 'Test Companion', 'status': 'active'},
+            'companion_ref': Mock()
+        })
+        self.service._create_archive_package = Mock(return_value={
+            'success': True, 'package': {}, 'size': 2
+        })
+        spill_batch = Mock()
+        self.service._cleanup_archived_companion_data = Mock(
+            side_effect=lambda *args, **kwargs: kwargs['spill_batches'].append(spill_batch) or {}
+        )
+        self.service._log_companion_action = Mock()
+        self.mock_firestore.db.batch.return_value.commit.side_effect = Exception('commit failed')
+        
+        # Act
+        result = self.service.archive_companion(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertFalse(result['success'])
+        spill_batch.commit.assert_not_called()
+    
+    def test_archive_companion_succeeds_when_spill_commit_fails(self):
+        """Test a failed memory spill is reported without failing an archive that was recorded"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={
+            'success': True,
+            'companion': {'id': self.test_companion_id, 'name': 'Test Companion', 'status': 'active'},
+            'companion_ref': Mock()
+        })
+        self.service._create_archive_package = Mock(return_value={
+            'success': True, 'package': {}, 'size': 2
+        })
+        spill_batch = Mock()
+        spill_batch.commit.side_effect = Exception('spill failed')
+        self.service._cleanup_archived_companion_data = Mock(
+            side_effect=lambda *args, **kwargs: kwargs['spill_batches'].append(spill_batch) or {}
+        )
+        self.service._log_companion_action = Mock()
+        lifecycle_module._archived_companions_cache.set(self.test_user_id, {'archived_companions': []})
+        
+        # Act
+        result = self.service.archive_companion(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertTrue(result['success'])
+        self.assertEqual(spill_batch.commit.call_count, 2)
+        self.assertIn('memories_error', result['cleanup_result'])
+        self.assertIsNone(lifecycle_module._archived_companions_cache.get(self.test_user_id))
+    
+    def test_archive_companion_deletes_blob_when_commit_fails(self):
+        """Test an uploaded package is removed when the archive record can't be committed"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={
+            'success': True,
+            'companion': {'id': self.test_companion_id, 'name': 'Test Companion', 'status': 'active'},
+            'companion_ref': Mock()
+        })
+        self.service._create_archive_package = Mock(return_value={
+            'success': True, 'package': {}, 'payload': b'{}', 'size': 2
+        })
+        self.service._cleanup_archived_companion_data = Mock(return_value={})
+        self.mock_firestore.db.batch.return_value.commit.side_effect = Exception('commit failed')
+        
+        # Act
+        with patch('services.memory.companion_lifecycle_service._upload_archive_package',
+                   return_value='gs://bucket/companion_archives/a.json'), \
+             patch('services.memory.companion_lifecycle_service._archive_blob') as mock_archive_blob:
+            result = self.service.archive_companion(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertFalse(result['success'])
+        mock_archive_blob.assert_called_once_with('gs://bucket/companion_archives/a.json')
+        mock_archive_blob.return_value.delete.assert_called_once()
+    
+    def test_archive_companion_uploads_package_while_cleaning_up(self):
+        """Test the package upload is under way before cleanup finishes reading memories"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={
+            'success': True,
+            'companion': {'id': self.test_companion_id, 'name': 'Test Companion', 'status': 'active'},
+            'companion_ref': Mock()
+        })
+        self.service._create_archive_package = Mock(return_value={
+            'success': True, 'package': {}, 'payload': b'{}', 'size': 2
+        })
+        self.service._log_companion_action = Mock()
+        upload_started = threading.Event()
+        overlapped = []
+        
+        def upload(*args):
+            upload_started.set()
+            return 'gs://bucket/companion_archives/a.json'
+        
+        self.service._cleanup_archived_companion_data = Mock(
+            side_effect=lambda *args, **kwargs: overlapped.append(upload_started.wait(timeout=5)) or {}
+        )
+        
+        # Act
+        with patch('services.memory.companion_lifecycle_service._upload_archive_package', side_effect=upload):
+            result = self.service.archive_companion(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertTrue(result['success'])
+        self.assertEqual(overlapped, [True])
+        archive_record = self.mock_firestore.db.batch.return_value.set.call_args_list[0][0][1]
+        self.assertEqual(archive_record['archive_blob_uri'], 'gs://bucket/companion_archives/a.json')
+    
+    def test_restore_conversations_parses_serialized_timestamps(self):
+        """Test timestamps from a blob package are written back as datetimes"""
+        # Arrange
+        mock_batch = self.mock_firestore.db.batch.return_value
+        conversations_data = {'conversations': [
+            {'id': 'conv1', 'user_message': 'hi', 'timestamp': '2024-01-02T03:04:05+00:00'}
+        ]}
+        
+        # Act
+        result = self.service._restore_conversations(self.test_user_id, self.test_companion_id, conversations_data)
+        
+        # Assert
+        self.assertEqual(result['restored_conversations'], 1)
+        restored = mock_batch.set.call_args[0][1]
+        self.assertIsInstance(restored['timestamp'], datetime)
+        self.assertEqual(restored['timestamp'].isoformat(), '2024-01-02T03:04:05+00:00')
+    
+    def test_restore_memories_keeps_string_timestamps(self):
+        """Test memory timestamps stay ISO strings so they sort with live memories"""
+        # Arrange
+        mock_batch = self.mock_firestore.db.batch.return_value
+        memories_data = {'memories': [
+            {'id': 'mem1', 'content': 'first trip', 'timestamp': '2024-01-02T03:04:05.123456'}
+        ]}
+        
+        # Act
+        result = self.service._restore_memories(self.test_user_id, self.test_companion_id, memories_data)
+        
+        # Assert
+        self.assertEqual(result['restored_memories'], 1)
+        restored = mock_batch.set.call_args[0][1]
+        self.assertEqual(restored['timestamp'], '2024-01-02T03:04:05.123456')
+        self.assertEqual(restored['assigned_companion_id'], self.test_companion_id)
+        self.assertNotEqual(restored['id'], 'mem1')
+        mock_batch.commit.assert_called_once()
     
     def test_archive_companion_already_archived(self):
         """Test archiving a companion that's already archived"""
@@ -197,8 +359,74 @@ class TestCompanionLifecycleService(unittest.TestCase):
         self.assertIn('restoration_result', result)
         
         # Verify method calls
-        mock_doc_ref.set.assert_called_once()
-        mock_archive_doc.reference.update = Mock()  # This would be called in real implementation
+        mock_batch = self.mock_firestore.db.batch.return_value
+        self.assertEqual(mock_batch.set.call_count, 2)
+        index_entries = mock_batch.set.call_args_list[1][0][1]['entries']
+        self.assertEqual(index_entries[self.test_archive_id]['restored_companion_id'], result['new_companion_id'])
+        mock_batch.update.assert_called_once()
+        mock_batch.commit.assert_called_once()
+        mock_doc_ref.set.assert_not_called()
+    
+    def test_archive_companion_stores_package_in_blob(self):
+        """Test archive records keep only a blob pointer and counts when storage is configured"""
+        # Arrange
+        self.service._get_companion_info = Mock(return_value={
+            'success': True,
+            'companion': {'id': self.test_companion_id, 'name': 'Test Companion', 'status': 'active'},
+            'companion_ref': Mock()
+        })
+        self.service._create_archive_package = Mock(return_value={
+            'success': True,
+            'package': {
+                'memories': {'total_memories': 5},
+                'conversations': {'total_messages': 10}
+            },
+            'payload': b'{}',
+            'size': 2
+        })
+        self.service._cleanup_archived_companion_data = Mock(return_value={})
+        self.service._log_companion_action = Mock()
+        mock_batch = self.mock_firestore.db.batch.return_value
+        
+        # Act
+        with patch('services.memory.companion_lifecycle_service._upload_archive_package',
+                   return_value='gs://bucket/companion_archives/a.json') as mock_upload:
+            result = self.service.archive_companion(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertTrue(result['success'])
+        mock_upload.assert_called_once_with(self.test_user_id, result['archive_id'], b'{}')
+        archive_record = mock_batch.set.call_args_list[0][0][1]
+        self.assertEqual(archive_record['archive_blob_uri'], 'gs://bucket/companion_archives/a.json')
+        self.assertNotIn('archive_package', archive_record)
+        self.assertEqual(archive_record['memories_count'], 5)
+        self.assertEqual(archive_record['conversations_count'], 10)
+    
+    def test_restore_companion_reads_package_from_blob(self):
+        """Test restoring downloads the package when the archive points at a blob"""
+        # Arrange
+        mock_archive_doc = Mock()
+        mock_archive_doc.exists = True
+        mock_archive_doc.to_dict.return_value = {
+            'user_id': self.test_user_id,
+            'companion_id': self.test_companion_id,
+            'original_companion_data': {'name': 'Original Companion'},
+            'archive_blob_uri': 'gs://bucket/companion_archives/a.json'
+        }
+        self.mock_firestore.db.collection.return_value.document.return_value.get.return_value = mock_archive_doc
+        self.service._restore_from_archive_package = Mock(return_value={})
+        self.service._log_companion_action = Mock()
+        package = {'memories': {'memories': []}}
+        
+        # Act
+        with patch('services.memory.companion_lifecycle_service._download_archive_package',
+                   return_value=package) as mock_download:
+            result = self.service.restore_companion(self.test_user_id, self.test_archive_id)
+        
+        # Assert
+        self.assertTrue(result['success'])
+        mock_download.assert_called_once_with('gs://bucket/companion_archives/a.json')
+        self.assertIs(self.service._restore_from_archive_package.call_args[0][2], package)
     
     def test_restore_companion_archive_not_found(self):
         """Test restoring from non-existent archive"""
@@ -249,6 +477,7 @@ class TestCompanionLifecycleService(unittest.TestCase):
         }
         
         # Mock get companion info
+        mock_doc_ref = Mock()
         self.service._get_companion_info = Mock(return_value={
             'success': True,
             'companion': {
@@ -256,7 +485,8 @@ class TestCompanionLifecycleService(unittest.TestCase):
                 'name': 'Original Companion',
                 'status': 'active',
                 'modification_count': 0
-            }
+            },
+            'companion_ref': mock_doc_ref
         })
         
         # Mock validation
@@ -279,10 +509,6 @@ class TestCompanionLifecycleService(unittest.TestCase):
             'personality_updated': True
         })
         
-        # Mock Firestore update
-        mock_doc_ref = Mock()
-        self.mock_firestore.db.collection.return_value.document.return_value = mock_doc_ref
-        
         # Mock logging
         self.service._log_companion_action = Mock()
         
@@ -302,6 +528,8 @@ class TestCompanionLifecycleService(unittest.TestCase):
         self.service._modify_basic_properties.assert_called_once()
         self.service._modify_personality.assert_called_once()
         mock_doc_ref.update.assert_called_once()
+        update_data = mock_doc_ref.update.call_args[0][0]
+        self.assertIsInstance(update_data['modification_count'], lifecycle_module.firestore.Increment)
     
     def test_modify_companion_archived(self):
         """Test modifying an archived companion"""
@@ -380,14 +608,14 @@ class TestCompanionLifecycleService(unittest.TestCase):
         }
         
         # Mock Firestore queries
-        mock_logs_query = Mock()
-        mock_logs_query.stream.return_value = [mock_log1, mock_log2]
+        mock_backups_query = self.mock_firestore.db.collection.return_value.where.return_value
+        mock_logs_query = mock_backups_query.where.return_value
+        mock_logs_query.order_by.return_value.limit.return_value.stream.return_value = [mock_log1, mock_log2]
+        mock_backups_query.order_by.return_value.select.return_value.limit.return_value.stream.return_value = [mock_backup1]
         
-        mock_backups_query = Mock()
-        mock_backups_query.stream.return_value = [mock_backup1]
-        
-        self.mock_firestore.db.collection.return_value.where.return_value.where.return_value.order_by.return_value = mock_logs_query
-        self.mock_firestore.db.collection.return_value.where.return_value.order_by.return_value = mock_backups_query
+        # Totals cover history beyond the returned page
+        counts = {mock_logs_query: 120, mock_backups_query: 1}
+        self.mock_firestore.count_documents.side_effect = lambda query: counts[query]
         
         # Act
         result = self.service.get_companion_lifecycle_history(self.test_user_id, self.test_companion_id)
@@ -397,8 +625,9 @@ class TestCompanionLifecycleService(unittest.TestCase):
         self.assertEqual(result['companion_id'], self.test_companion_id)
         self.assertEqual(len(result['lifecycle_history']), 2)
         self.assertEqual(len(result['modification_backups']), 1)
-        self.assertEqual(result['total_actions'], 2)
+        self.assertEqual(result['total_actions'], 120)
         self.assertEqual(result['total_backups'], 1)
+        mock_logs_query.order_by.return_value.limit.assert_called_once_with(50)
     
     def test_list_archived_companions(self):
         """Test listing archived companions"""
@@ -436,10 +665,12 @@ class TestCompanionLifecycleService(unittest.TestCase):
         # Mock Firestore query
         mock_query = Mock()
         mock_query.stream.return_value = [mock_archive1, mock_archive2]
-        self.mock_firestore.db.collection.return_value.where.return_value.order_by.return_value = mock_query
+        self.mock_firestore.db.collection.return_value.where.return_value.order_by.return_value.select.return_value = mock_query
+        self.mock_firestore.archive_index.return_value.get.return_value.exists = False
         
         # Act
         result = self.service.list_archived_companions(self.test_user_id)
+        cached = self.service.list_archived_companions(self.test_user_id)
         
         # Assert
         self.assertEqual(len(result), 2)
@@ -447,6 +678,32 @@ class TestCompanionLifecycleService(unittest.TestCase):
         self.assertEqual(result[1]['name'], 'Archived Companion 2')
         self.assertIsNone(result[0]['restored_at'])
         self.assertIsNotNone(result[1]['restored_at'])
+        self.assertEqual(cached, result)
+        mock_query.stream.assert_called_once()
+        backfill = self.mock_firestore.archive_index.return_value.set.call_args[0][0]
+        self.assertTrue(backfill['complete'])
+        self.assertEqual(set(backfill['entries']), {'archive_1', 'archive_2'})
+    
+    def test_list_archived_companions_reads_complete_index(self):
+        """Test a complete archive index answers the listing in a single read"""
+        # Arrange
+        mock_index_doc = Mock()
+        mock_index_doc.exists = True
+        mock_index_doc.to_dict.return_value = {
+            'complete': True,
+            'entries': {
+                'archive_1': {'archive_id': 'archive_1', 'name': 'Older', 'archived_at': '2024-01-01T00:00:00'},
+                'archive_2': {'archive_id': 'archive_2', 'name': 'Newer', 'archived_at': '2024-02-01T00:00:00'}
+            }
+        }
+        self.mock_firestore.archive_index.return_value.get.return_value = mock_index_doc
+        
+        # Act
+        result = self.service.list_archived_companions(self.test_user_id)
+        
+        # Assert
+        self.assertEqual([entry['name'] for entry in result], ['Newer', 'Older'])
+        self.mock_firestore.db.collection.return_value.where.assert_not_called()
     
     def test_delete_archived_companion_success(self):
         """Test successful deletion of archived companion"""
@@ -482,6 +739,48 @@ class TestCompanionLifecycleService(unittest.TestCase):
         
         # Verify deletion
         mock_archive_doc.reference.delete.assert_called_once()
+        index_update = self.mock_firestore.archive_index.return_value.set.call_args
+        self.assertIn(self.test_archive_id, index_update[0][0]['entries'])
+        self.assertEqual(index_update[1], {'merge': True})
+    
+    def test_get_companion_info_is_cached_until_modified(self):
+        """Test repeated lookups in one action share a read and writes invalidate it"""
+        # Arrange
+        mock_companion_doc = Mock()
+        mock_companion_doc.exists = True
+        mock_companion_doc.to_dict.return_value = {'user_id': self.test_user_id, 'name': 'Test Companion'}
+        mock_doc_ref = self.mock_firestore.db.collection.return_value.document.return_value
+        mock_doc_ref.get.return_value = mock_companion_doc
+        
+        # Act
+        with lifecycle_module._companion_lookup_scope():
+            first = self.service._get_companion_info(self.test_user_id, self.test_companion_id)
+            denied = self.service._get_companion_info('other_user', self.test_companion_id)
+            self.service._modify_basic_properties(self.test_user_id, self.test_companion_id, {'name': 'Renamed'})
+            self.service._get_companion_info(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertTrue(first['success'])
+        self.assertEqual(denied['error'], 'Access denied')
+        self.assertEqual(mock_doc_ref.get.call_count, 2)
+    
+    def test_get_companion_info_is_not_shared_outside_an_action(self):
+        """Test lookups made outside a lifecycle action always read the companion"""
+        # Arrange
+        mock_companion_doc = Mock()
+        mock_companion_doc.exists = True
+        mock_companion_doc.to_dict.return_value = {'user_id': self.test_user_id}
+        mock_doc_ref = self.mock_firestore.db.collection.return_value.document.return_value
+        mock_doc_ref.get.return_value = mock_companion_doc
+        
+        # Act
+        with lifecycle_module._companion_lookup_scope():
+            self.service._get_companion_info(self.test_user_id, self.test_companion_id)
+        self.service._get_companion_info(self.test_user_id, self.test_companion_id)
+        self.service._get_companion_info(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertEqual(mock_doc_ref.get.call_count, 3)
     
     def test_create_archive_package(self):
         """Test creating archive package"""
@@ -526,6 +825,80 @@ class TestCompanionLifecycleService(unittest.TestCase):
         self.assertIn('context', package)
         self.assertEqual(package['companion_id'], self.test_companion_id)
         self.assertEqual(package['user_id'], self.test_user_id)
+        self.assertEqual(result['size'], len(result['payload']))
+        self.assertEqual(json.loads(result['payload'])['companion_id'], self.test_companion_id)
+    
+    def test_archive_companion_conversations_streams_selected_fields(self):
+        """Test conversations are archived from a field-masked stream"""
+        # Arrange
+        mock_doc = Mock()
+        mock_doc.id = 'msg1'
+        mock_doc.to_dict.return_value = {'user_message': 'hi', 'ai_response': 'hello', 'timestamp': 't1'}
+        mock_query = self.mock_firestore.companion_messages.return_value.where.return_value.select.return_value
+        mock_query.stream.return_value = iter([mock_doc])
+        
+        # Act
+        result = self.service._archive_companion_conversations(self.test_user_id, self.test_companion_id)
+        
+        # Assert
+        self.assertEqual(result['total_messages'], 1)
+        self.assertEqual(result['conversations'][0]['id'], 'msg1')
+        self.assertEqual(result['conversations'][0]['metadata'], {})
+        self.mock_firestore.companion_messages.return_value.where.return_value.select.assert_called_once_with(
+            ['user_message', 'ai_response', 'timestamp', 'metadata']
+        )
+    
+    def test_archive_payload_serializes_timestamps_as_iso_strings(self):
+        """Test timestamp subclasses returned by Firestore serialize like plain datetimes"""
+        class DatetimeWithNanoseconds(datetime):
+            pass
+        
+        # Act
+        payload = lifecycle_module._dumps({'timestamp': DatetimeWithNanoseconds(2024, 1, 2, 3, 4, 5)})
+        
+        # Assert
+        self.assertIsInstance(payload, bytes)
+        self.assertEqual(json.loads(payload), {'timestamp': '2024-01-02T03:04:05'})
+    
+    def test_cleanup_archived_companion_data_chunks_memory_updates(self):
+        """Test memory unassignment stays within Firestore's batch limit"""
+        # Arrange
+        memory_docs = [Mock() for _ in range(451)]
+        self.mock_firestore.db.collection.return_value.where.return_value.stream.return_value = iter(memory_docs)
+        caller_batch = Mock()
+        overflow_batch = self.mock_firestore.db.batch.return_value
+        
+        # Act
+        result = self.service._cleanup_archived_companion_data(
+            self.test_user_id, self.test_companion_id, {}, batch=caller_batch
+        )
+        
+        # Assert
+        self.assertEqual(result['memories'], 'Unassigned 451 memories')
+        self.assertEqual(caller_batch.update.call_count, 450)
+        self.assertEqual(caller_batch.delete.call_count, 2)
+        self.mock_firestore.get_companion_context.assert_not_called()
+        caller_batch.commit.assert_not_called()
+        self.assertEqual(overflow_batch.update.call_count, 1)
+        overflow_batch.commit.assert_called_once()
+    
+    def test_cleanup_archived_companion_data_defers_spill_batches(self):
+        """Test overflow batches are handed back uncommitted when the caller collects them"""
+        # Arrange
+        memory_docs = [Mock() for _ in range(451)]
+        self.mock_firestore.db.collection.return_value.where.return_value.stream.return_value = iter(memory_docs)
+        caller_batch = Mock()
+        overflow_batch = self.mock_firestore.db.batch.return_value
+        spill_batches = []
+        
+        # Act
+        self.service._cleanup_archived_companion_data(
+            self.test_user_id, self.test_companion_id, {}, batch=caller_batch, spill_batches=spill_batches
+        )
+        
+        # Assert
+        self.assertEqual(spill_batches, [overflow_batch])
+        overflow_batch.commit.assert_not_called()
     
     def test_validate_modifications_valid(self):
         """Test validation of valid modifications"""
@@ -577,6 +950,15 @@ class TestCompanionLifecycleService(unittest.TestCase):
         # Assert
         self.assertFalse(result['valid'])
         self.assertIn('name too long', result['error'])
+    
+    def test_validate_modifications_rejects_non_object_section(self):
+        """Test validation of a modification section that isn't an object"""
+        # Act
+        result = self.service._validate_modifications({'personality': 'formal'})
+        
+        # Assert
+        self.assertFalse(result['valid'])
+        self.assertIn('must be an object', result['error'])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -308,12 +308,13 @@ class TestCompanionManagementService(unittest.TestCase):
         """Test checking conversation isolation for a companion"""
         # Arrange
         mock_conversation_docs = [Mock(), Mock()]  # 2 conversations
-        self.mock_firestore.db.collection.return_value.where.return_value.stream.return_value = mock_conversation_docs
+        self.mock_firestore.companion_messages.return_value.stream.return_value = mock_conversation_docs
         
         # Act
         result = self.service._check_conversation_isolation(self.test_user_id, self.test_companion_id)
         
         # Assert
+        self.mock_firestore.companion_messages.assert_called_once_with(self.test_companion_id)
         self.assertTrue(result['isolated'])
         self.assertEqual(result['total_conversations'], 2)
         self.assertEqual(result['isolated_conversations'], 2)
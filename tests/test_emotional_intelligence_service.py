@@ -239,6 +239,14 @@ class TestEmotionalIntelligenceService:
         # Should provide general support information
         assert 'mental health professional' in resources['message']
     
+    def test_get_crisis_support_resources_for(self):
+        """Test getting support resources for several crisis types at once"""
+        resources = self.service.get_crisis_support_resources_for(['suicide', 'abuse'])
+        
+        assert set(resources) == {'suicide', 'abuse'}
+        assert resources['suicide'] is self.service.get_crisis_support_resources('suicide')
+        assert '1-800-799-7233' in str(resources['abuse']['hotlines'])
+    
     def test_prioritize_emotional_memories(self):
         """Test emotional memory prioritization"""
         memories = [
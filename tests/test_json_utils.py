@@ -0,0 +1,75 @@
+"""
+Unit tests for JSON utilities
+"""
+
+import pytest
+import json
+import orjson
+from datetime import datetime
+from unittest.mock import patch
+from flask import Flask
+from utils.json_utils import OrjsonProvider
+
+class FirestoreDatetime(datetime):
+    """Stand-in for Firestore's DatetimeWithNanoseconds subclass"""
+
+class TestOrjsonProvider:
+    """Test cases for OrjsonProvider"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.app = Flask(__name__)
+        self.app.json = OrjsonProvider(self.app)
+
+    def test_dumps_and_loads_round_trip(self):
+        """Test nested payloads survive a round trip"""
+        payload = {'emotions': {'joy': 0.8, 'sadness': 0.1}, 'memories': [1, 2, 3], 1: 'non-str key'}
+
+        result = self.app.json.loads(self.app.json.dumps(payload))
+
+        assert result['emotions'] == {'joy': 0.8, 'sadness': 0.1}
+        assert result['memories'] == [1, 2, 3]
+        assert result['1'] == 'non-str key'
+
+    def test_datetime_subclasses_serialize_as_iso(self):
+        """Test Firestore datetime subclasses serialize like plain datetimes"""
+        timestamp = datetime(2024, 1, 15, 10, 30, 0)
+        payload = {
+            'created_at': timestamp,
+            'updated_at': FirestoreDatetime(2024, 1, 15, 10, 30, 0)
+        }
+
+        result = json.loads(self.app.json.dumps(payload))
+
+        assert result['created_at'].startswith('2024-01-15T10:30:00')
+        assert result['updated_at'].startswith('2024-01-15T10:30:00')
+
+    def test_response_is_json(self):
+        """Test responses are serialized with the JSON mimetype"""
+        with self.app.app_context():
+            response = self.app.json.response({'success': True})
+
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.get_data()) == {'success': True}
+
+    def test_request_get_json_uses_provider(self):
+        """Test inbound request bodies are parsed through the orjson provider"""
+        with patch('utils.json_utils.orjson.loads', wraps=orjson.loads) as mock_loads:
+            with self.app.test_request_context('/api/emotion/analyze', method='POST',
+                                               data=b'{"text": "I feel great"}',
+                                               content_type='application/json'):
+                from flask import request
+                assert request.get_json() == {'text': 'I feel great'}
+
+        mock_loads.assert_called_once()
+
+    def test_request_get_json_silent_on_invalid_body(self):
+        """Test malformed bodies are treated as missing when parsing silently"""
+        with self.app.test_request_context('/api/emotion/analyze', method='POST',
+                                           data=b'{"text": ',
+                                           content_type='application/json'):
+            from flask import request
+            assert request.get_json(silent=True) is None
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,78 @@
+"""
+Unit tests for logging utilities
+"""
+
+import pytest
+import logging
+from logging.handlers import QueueHandler
+from unittest.mock import patch
+import utils.logging_utils as logging_utils
+
+class RecordingHandler(logging.Handler):
+    """Handler that keeps emitted records in memory"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+class TestConfigureLogging:
+    """Test cases for configure_logging"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.root = logging.getLogger()
+        self.saved_handlers = self.root.handlers[:]
+        self.saved_level = self.root.level
+        self.handler = RecordingHandler()
+        self.root.handlers = [self.handler]
+
+        self.state_patcher = patch.multiple(logging_utils, _handlers=None, _listener=None, _listener_pid=None)
+        self.state_patcher.start()
+
+    def teardown_method(self):
+        """Restore root logger"""
+        if logging_utils._listener is not None:
+            logging_utils._listener.stop()
+        self.state_patcher.stop()
+        self.root.handlers = self.saved_handlers
+        self.root.setLevel(self.saved_level)
+
+    def test_records_reach_existing_handlers_through_queue(self):
+        """Test existing handlers receive records via the listener thread"""
+        logging_utils.configure_logging()
+
+        assert len(self.root.handlers) == 1
+        assert isinstance(self.root.handlers[0], QueueHandler)
+
+        logging.getLogger('services.firestore_db').error("Error getting stats: boom")
+        logging_utils._listener.stop()
+        logging_utils._listener = None
+
+        assert [record.getMessage() for record in self.handler.records] == ["Error getting stats: boom"]
+
+    def test_configure_is_idempotent_within_process(self):
+        """Test repeated calls keep the running listener"""
+        logging_utils.configure_logging()
+        listener = logging_utils._listener
+
+        logging_utils.configure_logging()
+
+        assert logging_utils._listener is listener
+
+    def test_configure_restarts_listener_after_fork(self):
+        """Test a new process gets its own listener"""
+        logging_utils.configure_logging()
+        listener = logging_utils._listener
+
+        with patch('utils.logging_utils.os.getpid', return_value=-1):
+            logging_utils.configure_logging()
+        listener.stop()
+
+        assert logging_utils._listener is not listener
+        assert logging_utils._listener_pid == -1
+
+if __name__ == "__main__":
+    pytest.main([__file__])
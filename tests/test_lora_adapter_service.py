@@ -7,10 +7,33 @@ import os
 import tempfile
 import shutil
 import json
+from datetime import datetime
 import torch
 from unittest.mock import Mock, patch, MagicMock
 from services.memory.lora_adapter_service import LoRAAdapterService
 
+def fake_jobs_firestore(jobs):
+    """Firestore stand-in whose job documents live in the given dict"""
+    def document(adapter_id):
+        ref = Mock()
+        
+        def set_job(data, merge=False):
+            jobs[adapter_id] = {**jobs.get(adapter_id, {}), **data} if merge else dict(data)
+        
+        def get_job():
+            snapshot = Mock()
+            snapshot.exists = adapter_id in jobs
+            snapshot.to_dict.return_value = dict(jobs.get(adapter_id, {}))
+            return snapshot
+        
+        ref.set.side_effect = set_job
+        ref.get.side_effect = get_job
+        return ref
+    
+    mock_firestore = Mock()
+    mock_firestore.db.collection.return_value.document.side_effect = document
+    return mock_firestore
+
 class TestLoRAAdapterService:
     """Test cases for LoRAAdapterService"""
     
@@ -44,9 +67,16 @@ class TestLoRAAdapterService:
                 "Music and art play an important role in my life.",
                 "I believe in being kind and helping others whenever possible."
             ] * 3  # Repeat to have enough training data
+        
+        # Training job documents shared across service instances
+        self.jobs = {}
+        self.firestore_patcher = patch('services.memory.lora_adapter_service.firestore_db',
+                                       fake_jobs_firestore(self.jobs))
+        self.firestore_patcher.start()
     
     def teardown_method(self):
         """Clean up test environment"""
+        self.firestore_patcher.stop()
         if os.path.exists(self.temp_dir):
             shutil.rmtree(self.temp_dir)
     
@@ -148,6 +178,80 @@ class TestLoRAAdapterService:
                 training_data=insufficient_data
             )
     
+    @patch.object(LoRAAdapterService, '_has_premium_access', return_value=True)
+    def test_submit_training_job_completes(self, mock_premium):
+        """Test background training job runs the loader and completes"""
+        sync_executor = Mock()
+        sync_executor.submit.side_effect = lambda fn, *args: fn(*args)
+        
+        with patch.object(LoRAAdapterService, '_training_executor', sync_executor):
+            adapter_id = self.service.submit_training_job(
+                user_id=self.test_user_id,
+                companion_id=self.test_companion_id,
+                load_training_data=lambda: self.test_training_data
+            )
+        
+        status = self.service.get_training_status(adapter_id)
+        
+        assert status['status'] == 'completed'
+        assert status['user_id'] == self.test_user_id
+        assert os.path.exists(os.path.join(self.temp_dir, adapter_id, 'metadata.json'))
+    
+    def test_submit_training_job_records_failure(self):
+        """Test background training job records loader errors"""
+        sync_executor = Mock()
+        sync_executor.submit.side_effect = lambda fn, *args: fn(*args)
+        
+        def failing_loader():
+            raise ValueError("Need at least 10 memories to start training")
+        
+        with patch.object(LoRAAdapterService, '_training_executor', sync_executor):
+            adapter_id = self.service.submit_training_job(
+                user_id=self.test_user_id,
+                companion_id=self.test_companion_id,
+                load_training_data=failing_loader
+            )
+        
+        status = self.service.get_training_status(adapter_id)
+        
+        assert status['status'] == 'failed'
+        assert "at least 10 memories" in status['error']
+    
+    def test_training_status_is_visible_to_other_workers(self):
+        """Test a job queued by one service instance is reported by another"""
+        queued_executor = Mock()
+        
+        with patch.object(LoRAAdapterService, '_training_executor', queued_executor):
+            adapter_id = self.service.submit_training_job(
+                user_id=self.test_user_id,
+                companion_id=self.test_companion_id,
+                load_training_data=lambda: self.test_training_data
+            )
+        
+        with patch.object(LoRAAdapterService, '__init__', lambda x: None):
+            other_worker = LoRAAdapterService()
+            other_worker.adapters_dir = tempfile.mkdtemp()
+        status = other_worker.get_training_status(adapter_id)
+        shutil.rmtree(other_worker.adapters_dir)
+        
+        assert status['status'] == 'queued'
+        assert status['user_id'] == self.test_user_id
+        assert self.jobs[adapter_id]['companion_id'] == self.test_companion_id
+    
+    def test_generate_adapter_id_unique_within_a_second(self):
+        """Test adapter IDs generated in the same second don't collide"""
+        with patch('services.memory.lora_adapter_service.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0, 0)
+            first = self.service._generate_adapter_id(self.test_user_id, self.test_companion_id)
+            second = self.service._generate_adapter_id(self.test_user_id, self.test_companion_id)
+        
+        assert first != second
+        assert first.startswith(f"{self.test_user_id}_{self.test_companion_id}_")
+    
+    def test_get_training_status_unknown(self):
+        """Test training status for an unknown adapter"""
+        assert self.service.get_training_status("missing_adapter") is None
+    
     def test_load_adapter_success(self):
         """Test successful adapter loading"""
         # Create test adapter
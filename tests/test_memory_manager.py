@@ -351,6 +351,49 @@ class TestMemoryManager:
         very_old_score = self.manager._calculate_recency_score(very_old_metadata)
         assert very_old_score < old_score
     
+    def test_list_memories(self):
+        """Test listing recent memories with a field projection"""
+        mock_doc1 = Mock()
+        mock_doc1.to_dict.return_value = {'content': 'First memory content'}
+        mock_doc2 = Mock()
+        mock_doc2.to_dict.return_value = {'content': 'Second memory content'}
+        
+        mock_query = Mock()
+        mock_query.where.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.select.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.stream.return_value = [mock_doc1, mock_doc2]
+        
+        with patch('services.memory.memory_manager.firestore_db') as mock_firestore:
+            mock_firestore.db.collection.return_value.where.return_value = mock_query
+            
+            memories = self.manager.list_memories(
+                self.test_user_id, self.test_companion_id, limit=5
+            )
+        
+        assert [memory['content'] for memory in memories] == [
+            'First memory content', 'Second memory content'
+        ]
+        mock_query.select.assert_called_once_with(['content'])
+        mock_query.limit.assert_called_once_with(5)
+        assert mock_query.order_by.call_args[0][0] == 'timestamp'
+    
+    def test_count_memories_propagates_errors(self):
+        """Test memory counts come from a COUNT aggregation and don't hide query failures"""
+        mock_query = Mock()
+        mock_query.where.return_value = mock_query
+        
+        with patch('services.memory.memory_manager.firestore_db') as mock_firestore:
+            mock_firestore.db.collection.return_value.where.return_value = mock_query
+            mock_firestore.count_documents.return_value = 12
+            assert self.manager.count_memories(self.test_user_id, self.test_companion_id) == 12
+            mock_firestore.count_documents.assert_called_once_with(mock_query)
+            
+            mock_firestore.count_documents.side_effect = Exception('unavailable')
+            with pytest.raises(Exception, match='unavailable'):
+                self.manager.count_memories(self.test_user_id, self.test_companion_id)
+    
     def test_calculate_text_match_score(self):
         """Test text match score calculation"""
         content = "this is a test content with some important words"
@@ -428,6 +471,8 @@ class TestMemoryManager:
         mock_query = Mock()
         mock_query.stream.return_value = [mock_doc1, mock_doc2]
         mock_query.where.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.limit.return_value = mock_query
         
         self.mock_firestore.db.collection.return_value.where.return_value = mock_query
         
@@ -441,6 +486,33 @@ class TestMemoryManager:
         assert 'export_date' in result
         assert 'metadata' in result
         assert result['metadata']['privacy_compliant'] is True
+    
+    def test_iter_user_memories_pages(self):
+        """Test memories are fetched in pages continuing after the last document"""
+        docs = []
+        for i in range(3):
+            doc = Mock()
+            doc.to_dict.return_value = {'id': f'memory_{i}'}
+            docs.append(doc)
+        
+        mock_query = Mock()
+        mock_query.where.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.stream.return_value = docs[:2]
+        
+        next_page = Mock()
+        next_page.stream.return_value = docs[2:]
+        mock_query.start_after.return_value = next_page
+        
+        with patch('services.memory.memory_manager.firestore_db') as mock_firestore:
+            mock_firestore.db.collection.return_value.where.return_value = mock_query
+            
+            memories = list(self.manager.iter_user_memories(self.test_user_id, batch_size=2))
+        
+        assert [memory['id'] for memory in memories] == ['memory_0', 'memory_1', 'memory_2']
+        mock_query.limit.assert_called_once_with(2)
+        mock_query.start_after.assert_called_once_with(docs[1])
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
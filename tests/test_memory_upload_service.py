@@ -59,6 +59,33 @@ class TestMemoryUploadService:
             result = self.service.validate_upload(malicious_content, 'text/html')
             assert result == False
     
+    def test_read_upload_stream(self):
+        """Test reading an upload stream with a content hash"""
+        import io
+        import hashlib
+        content = b"A streamed memory about the first day of school."
+        
+        file_data, content_hash = self.service.read_upload_stream(io.BytesIO(content))
+        
+        assert file_data == content
+        assert content_hash == hashlib.sha256(content).hexdigest()
+    
+    def test_read_upload_stream_too_large(self):
+        """Test oversized streams are rejected while reading"""
+        import io
+        stream = io.BytesIO(b"x" * (MemoryConfig.MAX_MEMORY_FILE_SIZE + 1))
+        
+        with pytest.raises(ValueError, match="File too large"):
+            self.service.read_upload_stream(stream)
+    
+    def test_security_scan_pattern_across_chunks(self):
+        """Test malicious patterns split across scan windows are still found"""
+        content = b"a" * 6 + b"<SCRIPT>alert(1)</script>"
+        
+        with patch.object(MemoryUploadService, 'UPLOAD_CHUNK_SIZE', 8):
+            assert self.service._security_scan_file(content) == False
+            assert self.service._security_scan_file(b"a" * 40) == True
+    
     def test_process_text_file(self):
         """Test text file processing"""
         text_content = b"This is a test memory about a wonderful day at the beach."
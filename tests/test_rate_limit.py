@@ -0,0 +1,70 @@
+"""
+Unit tests for rate limiting utilities
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from utils import rate_limit
+from utils.rate_limit import rate_limit_check
+
+class TestRateLimitCheck:
+    """Test cases for rate_limit_check"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        rate_limit._local_counters.clear()
+        rate_limit._redis_retry_at = 0.0
+
+    def test_allows_requests_within_limit(self):
+        """Test requests are allowed until the limit is reached"""
+        with patch('utils.rate_limit._get_redis_client', return_value=None), \
+             patch('utils.rate_limit.time.time', return_value=1200):
+            results = [rate_limit_check('user_1', 'upload', limit=3) for _ in range(4)]
+
+        assert results == [True, True, True, False]
+
+    def test_new_window_resets_count(self):
+        """Test counts start over in the next window"""
+        with patch('utils.rate_limit._get_redis_client', return_value=None):
+            with patch('utils.rate_limit.time.time', return_value=1200):
+                assert rate_limit_check('user_1', 'upload', limit=1) == True
+                assert rate_limit_check('user_1', 'upload', limit=1) == False
+
+            with patch('utils.rate_limit.time.time', return_value=1260):
+                assert rate_limit_check('user_1', 'upload', limit=1) == True
+
+    def test_uses_redis_when_configured(self):
+        """Test Redis counters are used when a client is available"""
+        mock_pipe = Mock()
+        mock_pipe.execute.return_value = [5, True]
+        mock_client = Mock()
+        mock_client.pipeline.return_value = mock_pipe
+
+        with patch('utils.rate_limit._get_redis_client', return_value=mock_client), \
+             patch('utils.rate_limit.time.time', return_value=1200):
+            assert rate_limit_check('user_1', 'upload', limit=4) == False
+
+        mock_pipe.incr.assert_called_once_with('rl:user_1:upload:20')
+        mock_pipe.pexpire.assert_called_once_with('rl:user_1:upload:20', 60000)
+
+    def test_redis_error_backs_off_to_local_counters(self):
+        """Test a Redis failure skips Redis until the retry interval has passed"""
+        mock_pipe = Mock()
+        mock_pipe.execute.side_effect = Exception('connection refused')
+        mock_client = Mock()
+        mock_client.pipeline.return_value = mock_pipe
+
+        with patch('utils.rate_limit._get_redis_client', return_value=mock_client), \
+             patch('utils.rate_limit.time.time', return_value=1200):
+            with patch('utils.rate_limit.time.monotonic', return_value=100.0):
+                assert rate_limit_check('user_1', 'upload', limit=2) == True
+                assert rate_limit_check('user_1', 'upload', limit=2) == True
+                assert rate_limit_check('user_1', 'upload', limit=2) == False
+            assert mock_pipe.execute.call_count == 1
+
+            with patch('utils.rate_limit.time.monotonic', return_value=100.0 + rate_limit.REDIS_RETRY_AFTER):
+                rate_limit_check('user_1', 'upload', limit=2)
+            assert mock_pipe.execute.call_count == 2
+
+if __name__ == "__main__":
+    pytest.main([__file__])
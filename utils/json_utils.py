@@ -0,0 +1,47 @@
+"""
+JSON utilities for My Prabh
+Fast orjson-backed serialization for Flask responses
+"""
+
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+# Try to import orjson, but fall back to Flask's stdlib provider if not available
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson, writing bytes directly"""
+
+    def _orjson_default(self, obj):
+        # orjson only handles exact datetime types natively; Firestore returns
+        # DatetimeWithNanoseconds, which should serialize the same way
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        return self.default(obj)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not ORJSON_AVAILABLE:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self._orjson_default, option=ORJSON_OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if not ORJSON_AVAILABLE:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if not ORJSON_AVAILABLE:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self._orjson_default, option=ORJSON_OPTIONS),
+            mimetype=self.mimetype
+        )
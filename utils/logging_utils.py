@@ -0,0 +1,51 @@
+"""
+Logging utilities for My Prabh
+Non-blocking log output for request-serving processes
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Root log level, overridable per deployment
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING').upper()
+
+_handlers = None
+_listener = None
+_listener_pid = None
+
+def configure_logging():
+    """Route root logging through a queue so callers never block on stdout
+
+    Safe to call again after fork: the listener thread does not survive
+    fork, so each process starts its own.
+    """
+    global _handlers, _listener, _listener_pid
+
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    root = logging.getLogger()
+    if _handlers is None:
+        # Keep whatever output handlers are already configured, writing from the listener thread
+        _handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)] or [logging.StreamHandler()]
+        for handler in _handlers:
+            if handler.formatter is None:
+                handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+def _stop_listener():
+    """Flush queued records on interpreter exit"""
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+atexit.register(_stop_listener)
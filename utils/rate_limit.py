@@ -0,0 +1,60 @@
+"""
+Rate limiting utilities for My Prabh
+Fixed-window request counters, shared through Redis when configured
+"""
+
+import logging
+import os
+import threading
+import time
+
+from utils.cache_utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Try to import redis, but fall back to per-process counters if not available
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Per-process counters used when Redis is not configured
+_local_counters = TTLCache(maxsize=10000, ttl=3600)
+_local_lock = threading.Lock()
+_redis_client = None
+
+# Seconds to stay on local counters after a Redis error before trying Redis again
+REDIS_RETRY_AFTER = 30
+_redis_retry_at = 0.0
+
+def _get_redis_client():
+    """Get the shared Redis client if REDIS_URL is configured"""
+    global _redis_client
+    if _redis_client is None and REDIS_AVAILABLE and os.environ.get('REDIS_URL'):
+        _redis_client = redis.Redis.from_url(os.environ['REDIS_URL'])
+    return _redis_client
+
+def rate_limit_check(user_id: str, action: str, limit: int, window: int = 60) -> bool:
+    """Count one request and return True while the user is within the limit for this window"""
+    current_time = int(time.time())
+    key = f"rl:{user_id}:{action}:{current_time // window}"
+    
+    global _redis_retry_at
+    client = _get_redis_client()
+    if client is not None and time.monotonic() >= _redis_retry_at:
+        try:
+            pipe = client.pipeline()
+            pipe.incr(key)
+            pipe.pexpire(key, window * 1000)
+            count, _ = pipe.execute()
+            return count <= limit
+        except Exception as e:
+            # Back off so an outage costs one failed round-trip per interval, not one per request
+            _redis_retry_at = time.monotonic() + REDIS_RETRY_AFTER
+            logger.warning("Redis rate limit error, using local counters for %ss: %s", REDIS_RETRY_AFTER, e)
+    
+    with _local_lock:
+        count = _local_counters.get(key, 0) + 1
+        _local_counters.set(key, count, ttl=window)
+    return count <= limit